@@ -0,0 +1,170 @@
+"""
+async_fetch.py - Motor asyncio de descarga de estados financieros
+Descarga income / balance / cashflow de cientos de tickers a la vez sobre un
+único pool de conexiones keep-alive, sin crear un hilo por petición
+"""
+
+import time
+import asyncio
+
+import pandas as pd
+from yfinance import const as yf_const
+from yfinance import utils as yf_utils
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+TIMESERIES_URL = "https://query2.finance.yahoo.com/ws/fundamentals-timeseries/v1/finance/timeseries/{symbol}"
+
+# Nombre interno de Yahoo para cada estado financiero
+TIMESERIES_NAMES = {
+    'income': 'financials',
+    'balance': 'balance-sheet',
+    'cashflow': 'cash-flow'
+}
+
+# Mismo formato "pretty" que yf.Ticker.income_stmt / balance_sheet / cashflow
+PRETTY_ACRONYMS = ["EBIT", "EBITDA", "EPS", "NI"]
+
+# Yahoo devuelve como mucho 4 años de datos anuales
+PERIOD_START = int(pd.Timestamp('2016-12-31').timestamp())
+
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36',
+    'Accept': 'application/json'
+}
+
+
+def parse_timeseries(payload, kind):
+    """
+    Convierte la respuesta de fundamentals-timeseries en un DataFrame con el
+    mismo formato que yfinance (filas = campos, columnas = periodos desc.)
+    """
+    keys = yf_const.fundamentals_keys[TIMESERIES_NAMES[kind]]
+    result = (payload.get('timeseries') or {}).get('result') or []
+
+    rows = {}
+    for series in result:
+        for key, values in series.items():
+            if key in ('meta', 'timestamp'):
+                continue
+            rows[key[len('annual'):]] = {
+                pd.Timestamp(v['asOfDate']): v['reportedValue']['raw']
+                for v in values or [] if v
+            }
+
+    if not rows:
+        return pd.DataFrame()
+
+    df = pd.DataFrame.from_dict(rows, orient='index').astype('float')
+    df = df.reindex([k for k in keys if k in df.index])
+    df = df[sorted(df.columns, reverse=True)]
+    df.index = yf_utils.camel2title(df.index, sep=' ', acronyms=PRETTY_ACRONYMS)
+    return df
+
+
+class AsyncStatementFetcher:
+    """
+    Descarga estados financieros anuales con asyncio + aiohttp
+
+    Todas las peticiones comparten una sesión con TCPConnector (keep-alive),
+    con límite global de conexiones y límite por host.
+    """
+
+    def __init__(self, max_connections=200, per_host=50, max_in_flight=256, timeout=30):
+        """
+        Args:
+            max_connections: Conexiones simultáneas del pool
+            per_host: Conexiones simultáneas por host
+            max_in_flight: Peticiones en vuelo como máximo (incluye las que esperan conexión)
+            timeout: Timeout total por petición (segundos)
+        """
+        if not AIOHTTP_AVAILABLE:
+            raise RuntimeError("aiohttp no está instalado")
+        self.max_connections = max_connections
+        self.per_host = per_host
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.stats = {}
+
+    def fetch(self, jobs):
+        """
+        Args:
+            jobs: {ticker: [kinds]} estados a descargar por ticker
+
+        Returns:
+            (statements, failures):
+                statements = {ticker: {kind: DataFrame}}
+                failures = {ticker: motivo} para los tickers con algún fallo
+        """
+        return asyncio.run(self._fetch_all(jobs))
+
+    async def _fetch_all(self, jobs):
+        start = time.time()
+        self.stats = {'requests': 0, 'errors': 0, 'peak_in_flight': 0}
+        self._in_flight = 0
+
+        statements = {}
+        failures = {}
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        connector = aiohttp.TCPConnector(
+            limit=self.max_connections,
+            limit_per_host=self.per_host,
+            keepalive_timeout=30,
+            ttl_dns_cache=300
+        )
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         headers=REQUEST_HEADERS) as session:
+            tasks = [
+                self._fetch_statement(session, semaphore, ticker, kind)
+                for ticker, kinds in jobs.items() for kind in kinds
+            ]
+            for ticker, kind, df, error in await asyncio.gather(*tasks):
+                if error is not None:
+                    failures[ticker] = error
+                else:
+                    statements.setdefault(ticker, {})[kind] = df
+
+        # Un ticker con algún estado fallido se considera fallido completo
+        for ticker in failures:
+            statements.pop(ticker, None)
+
+        self.stats.update({
+            'tickers': len(jobs),
+            'failed_tickers': len(failures),
+            'max_connections': self.max_connections,
+            'per_host': self.per_host,
+            'elapsed_seconds': round(time.time() - start, 2)
+        })
+        return statements, failures
+
+    async def _fetch_statement(self, session, semaphore, ticker, kind):
+        keys = yf_const.fundamentals_keys[TIMESERIES_NAMES[kind]]
+        params = {
+            'symbol': ticker,
+            'type': ','.join('annual' + k for k in keys),
+            'period1': PERIOD_START,
+            'period2': int(time.time()) + 86400
+        }
+
+        async with semaphore:
+            self._in_flight += 1
+            self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self._in_flight)
+            self.stats['requests'] += 1
+            try:
+                async with session.get(TIMESERIES_URL.format(symbol=ticker), params=params) as resp:
+                    if resp.status != 200:
+                        self.stats['errors'] += 1
+                        return ticker, kind, None, f"HTTP {resp.status}"
+                    payload = await resp.json(content_type=None)
+                return ticker, kind, parse_timeseries(payload, kind), None
+            except Exception as e:
+                self.stats['errors'] += 1
+                return ticker, kind, None, f"{type(e).__name__}: {e}"
+            finally:
+                self._in_flight -= 1
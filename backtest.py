@@ -0,0 +1,328 @@
+"""
+backtest.py - Backtest point-in-time del screener
+Repite el filtro ROIC / Piotroski / DCF / MOS en fechas de rebalanceo
+pasadas usando solo los estados financieros que ya estaban publicados
+(cierre fiscal + plazo de publicación) y el precio de ese día, y mide la
+rentabilidad a futuro de las cestas seleccionadas frente al universo
+
+Todas las fechas y tickers se evalúan en un único lote del motor
+vectorizado (valuation_engine): (fechas × tickers) filas.
+
+Sesgo de supervivencia: el universo es el de los tickers con historia
+almacenada (hoy cotizan), no el índice de cada año.
+
+Uso:
+    python backtest.py --years 10 [--tickers tickers.txt] [--fundamentals-dir DIR]
+"""
+
+import os
+import json
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from financial_fields import FIELD_KIND, normalize_statement
+from fundamentals_store import STATEMENT_KINDS
+from valuation_engine import FIELDS, PERIODS, FundamentalsBatch, screen_quality, value_batch
+from outcomes import OK
+
+# Valores del screener (main.CONFIG); se pueden cambiar por parámetro
+DEFAULT_THRESHOLDS = {
+    'MIN_MARKET_CAP': 5_000_000_000,
+    'MIN_ROIC': 0.08,
+    'MIN_PIOTROSKI': 5,
+    'DISCOUNT_RATE': 0.09,
+    'MARGIN_OF_SAFETY_VIEW': -0.20
+}
+
+FILING_LAG_DAYS = 75    # Un 10-K se publica como mucho ~75 días tras el cierre
+HOLDING_DAYS = 365      # Periodo de tenencia de cada cesta
+REBALANCE_MONTH_DAY = (4, 1)  # 1 de abril: ya se publicaron los cierres de diciembre
+BUY_ZONE_MOS = 0.10
+
+# Campos del lote más las acciones (para la capitalización y el valor por acción)
+PANEL_FIELDS = FIELDS + ('shares',)
+
+
+class TickerPanel:
+    """
+    Historia de un ticker lista para consultas point-in-time
+
+    Attributes:
+        kinds: {kind: (fechas de cierre ascendentes datetime64[D], {campo: valores})}
+               los campos que el estado no tiene no aparecen
+    """
+
+    __slots__ = ('ticker', 'kinds')
+
+    def __init__(self, ticker, kinds):
+        self.ticker = ticker
+        self.kinds = kinds
+
+    @classmethod
+    def from_statements(cls, ticker, statements):
+        """
+        Args:
+            statements: {kind: DataFrame} con formato yfinance (filas = campos,
+                        columnas = periodos) o el de FundamentalsStore.load_history
+                        (filas = periodos)
+        """
+        kinds = {}
+        for kind, df in statements.items():
+            if df is None or df.empty:
+                continue
+            if isinstance(df.index, pd.DatetimeIndex):
+                df = df.T
+            fields = normalize_statement(df, kind)
+            if not fields:
+                continue
+            dates = pd.to_datetime(df.columns).values.astype('datetime64[D]')
+            order = np.argsort(dates)
+            kinds[kind] = (
+                dates[order],
+                {field: series.to_numpy(dtype=float)[order] for field, series in fields.items()}
+            )
+        return cls(ticker, kinds)
+
+
+def load_panels(store, tickers):
+    """TickerPanel de cada ticker con historia en el FundamentalsStore"""
+    panels = {}
+    for ticker in tickers:
+        statements = {kind: store.load_history(ticker, kind) for kind in STATEMENT_KINDS}
+        panel = TickerPanel.from_statements(ticker, statements)
+        if panel.kinds:
+            panels[ticker] = panel
+    return panels
+
+
+def close_prices(raw, tickers):
+    """Cierres ajustados (fechas × tickers) desde el formato de yf.download"""
+    data = raw['Close'] if isinstance(raw.columns, pd.MultiIndex) else raw
+    if isinstance(data, pd.Series):
+        data = data.to_frame(name=tickers[0])
+    return data.reindex(columns=list(tickers)).sort_index()
+
+
+def rebalance_dates(years, end=None, month_day=REBALANCE_MONTH_DAY):
+    """
+    Fechas de rebalanceo anuales cuya cesta ya tiene un año de rentabilidad
+
+    Returns:
+        Lista de `years` Timestamps (la más antigua primero)
+    """
+    end = pd.Timestamp(end or datetime.now())
+    candidates = [pd.Timestamp(year, *month_day) for year in range(end.year - years - 1, end.year + 1)]
+    return [d for d in candidates if d + pd.Timedelta(days=HOLDING_DAYS) <= end][-years:]
+
+
+def _prices_at(prices, dates):
+    """Último cierre disponible en cada fecha (sin mirar el futuro): (fechas, tickers)"""
+    index = prices.index.values.astype('datetime64[D]')
+    positions = np.searchsorted(index, np.asarray(dates, dtype='datetime64[D]'), side='right') - 1
+    values = prices.to_numpy(dtype=float)
+    out = np.full((len(dates), values.shape[1]), np.nan)
+    valid = positions >= 0
+    out[valid] = values[positions[valid]]
+    return out
+
+
+def point_in_time_arrays(panels, tickers, dates, lag_days=FILING_LAG_DAYS):
+    """
+    Valores de cada campo en cada fecha con los estados ya publicados
+
+    Returns:
+        values: (fechas, tickers, PANEL_FIELDS, PERIODS) NaN sin dato
+        counts: (fechas, tickers, PANEL_FIELDS) periodos publicados de cada campo
+    """
+    n_dates, n_tickers = len(dates), len(tickers)
+    values = np.full((n_dates, n_tickers, len(PANEL_FIELDS), PERIODS), np.nan)
+    counts = np.zeros((n_dates, n_tickers, len(PANEL_FIELDS)), dtype=np.int64)
+    asof = np.asarray(dates, dtype='datetime64[D]') - np.timedelta64(lag_days, 'D')
+
+    for n, ticker in enumerate(tickers):
+        panel = panels.get(ticker)
+        if panel is None:
+            continue
+        for kind, (period_ends, fields) in panel.kinds.items():
+            # Periodos publicados en cada fecha (vectorizado sobre las fechas)
+            published = np.searchsorted(period_ends, asof, side='right')
+            for f, field in enumerate(PANEL_FIELDS):
+                if FIELD_KIND[field] != kind or field not in fields:
+                    continue
+                series = fields[field]
+                counts[:, n, f] = published
+                for p in range(PERIODS):
+                    idx = published - 1 - p
+                    ok = idx >= 0
+                    values[ok, n, f, p] = series[idx[ok]]
+    return values, counts
+
+
+def run_backtest(panels, prices, dates, thresholds=None, lag_days=FILING_LAG_DAYS,
+                 holding_days=HOLDING_DAYS):
+    """
+    Backtest del screener en cada fecha de rebalanceo
+
+    Args:
+        panels: {ticker: TickerPanel}
+        prices: DataFrame de cierres ajustados (fechas × tickers)
+        dates: Fechas de rebalanceo (ver rebalance_dates)
+        thresholds: Umbrales (por defecto DEFAULT_THRESHOLDS)
+
+    Returns:
+        {'thresholds', 'periods': [por fecha], 'summary', 'selections': {fecha: [tickers]}}
+    """
+    thresholds = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+    tickers = [t for t in prices.columns if t in panels]
+    dates = [pd.Timestamp(d) for d in dates]
+    forward_dates = [d + pd.Timedelta(days=holding_days) for d in dates]
+
+    values, counts = point_in_time_arrays(panels, tickers, dates, lag_days)
+    price = _prices_at(prices[tickers], dates)
+    forward_price = _prices_at(prices[tickers], forward_dates)
+    shares_index = PANEL_FIELDS.index('shares')
+    shares = values[:, :, shares_index, 0]
+
+    # Prefiltro de capitalización en cada fecha (precio y acciones de esa fecha)
+    with np.errstate(invalid='ignore'):
+        eligible = (price * shares >= thresholds['MIN_MARKET_CAP'])
+    date_idx, ticker_idx = np.nonzero(eligible)
+
+    # Un único lote del motor con todas las (fecha, ticker) elegibles
+    batch = FundamentalsBatch(list(zip(date_idx.tolist(), ticker_idx.tolist())))
+    engine_fields = [PANEL_FIELDS.index(field) for field in FIELDS]
+    batch.values[:] = values[date_idx, ticker_idx][:, engine_fields]
+    batch.counts[:] = counts[date_idx, ticker_idx][:, engine_fields]
+    batch.price[:] = price[date_idx, ticker_idx]
+    batch.shares[:] = shares[date_idx, ticker_idx]
+    batch.cashflow_loaded[:] = True
+
+    quality = screen_quality(batch, thresholds['MIN_ROIC'], thresholds['MIN_PIOTROSKI'])
+    valuation = value_batch(batch, quality, thresholds['MIN_PIOTROSKI'],
+                            thresholds['DISCOUNT_RATE'], thresholds['MARGIN_OF_SAFETY_VIEW'])
+
+    selected = np.zeros_like(eligible)
+    buy_zone = np.zeros_like(eligible)
+    ok = valuation['status'] == OK
+    selected[date_idx[ok], ticker_idx[ok]] = True
+    buy_zone[date_idx[ok], ticker_idx[ok]] = valuation['mos'][ok] > BUY_ZONE_MOS
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = forward_price / price - 1
+    has_return = np.isfinite(returns)
+
+    def basket_return(mask):
+        """Rentabilidad equiponderada de cada fecha: (fechas,), NaN si la cesta está vacía"""
+        mask = mask & has_return
+        total = np.where(mask, returns, 0.0).sum(axis=1)
+        size = mask.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(size > 0, total / size, np.nan), size
+
+    screen_ret, screen_size = basket_return(selected)
+    buy_ret, buy_size = basket_return(buy_zone)
+    universe_ret, universe_size = basket_return(eligible)
+
+    periods = []
+    for y, date in enumerate(dates):
+        periods.append({
+            'date': date.date().isoformat(),
+            'exit_date': forward_dates[y].date().isoformat(),
+            'universe': int(universe_size[y]),
+            'selected': int(screen_size[y]),
+            'buy_zone': int(buy_size[y]),
+            'screen_return': _clean(screen_ret[y]),
+            'buy_zone_return': _clean(buy_ret[y]),
+            'universe_return': _clean(universe_ret[y]),
+            'excess_return': _clean(screen_ret[y] - universe_ret[y])
+        })
+
+    return {
+        'thresholds': thresholds,
+        'filing_lag_days': lag_days,
+        'holding_days': holding_days,
+        'tickers': len(tickers),
+        'periods': periods,
+        'summary': {
+            'screen': _summarize(screen_ret, holding_days),
+            'buy_zone': _summarize(buy_ret, holding_days),
+            'universe': _summarize(universe_ret, holding_days),
+            'hit_rate': _hit_rate(screen_ret, universe_ret)
+        },
+        'selections': {
+            dates[y].date().isoformat(): [tickers[n] for n in np.flatnonzero(selected[y])]
+            for y in range(len(dates))
+        }
+    }
+
+
+def _clean(value):
+    return round(float(value), 6) if np.isfinite(value) else None
+
+
+def _hit_rate(screen_ret, universe_ret):
+    """Fracción de fechas en que la cesta del screen batió al universo"""
+    both = np.isfinite(screen_ret) & np.isfinite(universe_ret)
+    return round(float((screen_ret[both] > universe_ret[both]).mean()), 6) if both.any() else None
+
+
+def _summarize(period_returns, holding_days):
+    """Rentabilidad acumulada y anualizada encadenando las cestas (vacías = liquidez)"""
+    chained = np.where(np.isfinite(period_returns), period_returns, 0.0)
+    total = float(np.prod(1 + chained) - 1)
+    years = len(period_returns) * holding_days / 365.25
+    return {
+        'total_return': round(total, 6),
+        'annualized': round((1 + total) ** (1 / years) - 1, 6) if years > 0 and total > -1 else None,
+        'mean_period_return': _clean(np.nanmean(period_returns)) if np.isfinite(period_returns).any() else None
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest point-in-time del screener")
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--tickers', default=None, help="Fichero con un ticker por línea (por defecto, los del almacén)")
+    parser.add_argument('--fundamentals-dir', default=os.environ.get('FUNDAMENTALS_DIR', '/tmp/warren_fundamentals'))
+    parser.add_argument('--lag-days', type=int, default=FILING_LAG_DAYS)
+    parser.add_argument('--output', default=None, help="Guardar el resultado en JSON")
+    args = parser.parse_args(argv)
+
+    from fundamentals_store import FundamentalsStore
+    from market_data import get_provider
+
+    store = FundamentalsStore(args.fundamentals_dir)
+    if args.tickers:
+        with open(args.tickers) as f:
+            tickers = [line.strip().upper() for line in f if line.strip()]
+    else:
+        tickers = sorted(os.listdir(args.fundamentals_dir))
+
+    panels = load_panels(store, tickers)
+    tickers = sorted(panels)
+    dates = rebalance_dates(args.years)
+    print(f"📚 {len(tickers)} tickers con historia, {len(dates)} fechas de rebalanceo")
+
+    start = (dates[0] - pd.Timedelta(days=10)).strftime('%Y-%m-%d')
+    end = datetime.now().strftime('%Y-%m-%d')
+    prices = close_prices(get_provider().history(tickers, start, end), tickers)
+
+    result = run_backtest(panels, prices, dates, lag_days=args.lag_days)
+    for period in result['periods']:
+        fmt = lambda v: f"{v:+.1%}" if v is not None else "   n/a"
+        print(f"  {period['date']}: {period['selected']:3d}/{period['universe']:3d} seleccionadas  "
+              f"screen {fmt(period['screen_return'])}  universo {fmt(period['universe_return'])}")
+    summary = result['summary']
+    print(f"📈 Screen anualizado: {summary['screen']['annualized']}, "
+          f"universo: {summary['universe']['annualized']}, acierto: {summary['hit_rate']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
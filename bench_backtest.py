@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark: backtest point-in-time del screener (backtest.py)
+
+Genera historia sintética (estados anuales con etiquetas de Yahoo y precios
+diarios), ejecuta el backtest vectorizado sobre todas las fechas y tickers
+y lo compara con el cálculo escalar del screener repetido fecha a fecha
+con los mismos datos publicados.
+
+Uso:
+    python bench_backtest.py [--tickers 500] [--years 10] [--seed 7]
+"""
+
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from backtest import (TickerPanel, FILING_LAG_DAYS, HOLDING_DAYS, DEFAULT_THRESHOLDS,
+                      rebalance_dates, run_backtest, _prices_at)
+from bench_valuation import scalar_reference
+
+LABELS = {
+    'income': {'net_income': 'Net Income', 'ebit': 'EBIT'},
+    'balance': {'equity': 'Stockholders Equity', 'total_debt': 'Total Debt',
+                'cash': 'Cash And Cash Equivalents', 'shares': 'Ordinary Shares Number'},
+    'cashflow': {'operating_cash_flow': 'Operating Cash Flow', 'capex': 'Capital Expenditure'},
+}
+SCALE = {'equity': 3e9, 'total_debt': 1.5e9, 'cash': 1e9, 'capex': -3e8, 'shares': 1e9}
+
+
+def make_history(n_tickers, years, seed, end):
+    """Estados anuales (formato yfinance) y cierres diarios sintéticos"""
+    rng = np.random.default_rng(seed)
+    fiscal_years = pd.to_datetime([f"{year}-12-31" for year in range(end.year - years - 3, end.year)])
+    days = pd.bdate_range(f"{end.year - years - 2}-01-01", end)
+    panels = {}
+    prices = {}
+    for t in range(n_tickers):
+        ticker = f"T{t:04d}"
+        statements = {}
+        for kind, labels in LABELS.items():
+            rows = {}
+            for field, label in labels.items():
+                if field not in ('net_income', 'equity', 'shares') and rng.random() < 0.05:
+                    continue  # fila ausente
+                scale = SCALE.get(field, 1e9)
+                rows[label] = rng.normal(scale, abs(scale) * 0.4, size=len(fiscal_years))
+            statements[kind] = pd.DataFrame(rows, index=fiscal_years).T[fiscal_years[::-1]]
+        panels[ticker] = TickerPanel.from_statements(ticker, statements)
+        drift = rng.normal(0.0003, 0.0002)
+        prices[ticker] = rng.uniform(20, 200) * np.exp(np.cumsum(rng.normal(drift, 0.02, len(days))))
+    return panels, pd.DataFrame(prices, index=days)
+
+
+def scalar_backtest(panels, prices, dates):
+    """Screener escalar (bench_valuation.scalar_reference) fecha a fecha"""
+    selections = {}
+    price_at = _prices_at(prices, dates)
+    for y, date in enumerate(dates):
+        asof = np.datetime64(date.date()) - np.timedelta64(FILING_LAG_DAYS, 'D')
+        selected = []
+        for n, ticker in enumerate(prices.columns):
+            fields = {}
+            for kind, (period_ends, values) in panels[ticker].kinds.items():
+                published = period_ends <= asof
+                for field, series in values.items():
+                    if published.any():
+                        fields[field] = pd.Series(series[published][::-1])
+            shares = fields['shares'].iloc[0] if 'shares' in fields else np.nan
+            if not price_at[y, n] * shares >= DEFAULT_THRESHOLDS['MIN_MARKET_CAP']:
+                continue
+            if 'net_income' not in fields or 'equity' not in fields:
+                continue
+            status, _ = scalar_reference({'last_price': price_at[y, n], 'shares': shares}, fields)
+            if status == 'ok':
+                selected.append(ticker)
+        selections[date.date().isoformat()] = selected
+    return selections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--tickers', type=int, default=500)
+    parser.add_argument('--years', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    end = pd.Timestamp('2026-06-30')
+    panels, prices = make_history(args.tickers, args.years, args.seed, end)
+    dates = rebalance_dates(args.years, end)
+
+    start = time.perf_counter()
+    result = run_backtest(panels, prices, dates)
+    vector_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reference = scalar_backtest(panels, prices, dates)
+    scalar_time = time.perf_counter() - start
+
+    mismatches = sum(set(result['selections'][d]) != set(reference[d]) for d in reference)
+    summary = result['summary']
+    print(f"Backtest: {args.tickers} tickers × {len(dates)} fechas ({dates[0].date()} .. {dates[-1].date()}), "
+          f"tenencia {HOLDING_DAYS} días")
+    print(f"  escalar fecha a fecha:    {scalar_time * 1e3:9.1f} ms")
+    print(f"  vectorizado:              {vector_time * 1e3:9.1f} ms")
+    print(f"  speedup:                  {scalar_time / vector_time:9.1f}x")
+    print(f"  seleccionadas por fecha:  {[p['selected'] for p in result['periods']]}")
+    print(f"  screen anualizado {summary['screen']['annualized']}, universo {summary['universe']['annualized']}")
+    print(f"  fechas con selección distinta a la escalar: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark: codificación de los objetos de caché (cache_codec.py)
+
+Construye un resultado cacheado y unas entradas del screener sintéticas del
+tamaño de un run real y compara el formato anterior (json.dumps con
+default=str + reemplazos de texto de NaN / Infinity, json.loads) con el
+formato v1 (JSON compacto saneado, gzip o zstd; descompresión en streaming,
+parseo completo): tamaño en el bucket, tiempo de codificación, tiempo de
+decodificación (y su relación con el formato anterior) y pico de memoria al
+decodificar. Comprueba además que todas las variantes
+decodifican al mismo objeto.
+
+Uso:
+    python bench_cache_codec.py [--tickers 3000] [--candidates 300] [--repeat 5]
+"""
+
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+import numpy as np
+
+import cache_codec
+from valuation_engine import FundamentalsBatch, ScreenInputs
+
+
+def make_objects(n_tickers, candidates, seed):
+    """(caché de resultados, entradas del screener) con la forma de save_to_cache / save_screen_inputs"""
+    rng = np.random.default_rng(seed)
+    tickers = [f"T{t:04d}" for t in range(n_tickers)]
+    batch = FundamentalsBatch(tickers)
+    batch.values[:] = rng.normal(1e9, 5e8, size=batch.values.shape)
+    batch.values[rng.random(batch.values.shape) < 0.1] = np.nan  # huecos de Yahoo
+    batch.counts[:] = rng.integers(3, 6, size=batch.counts.shape)
+    batch.price[:] = rng.uniform(10, 500, n_tickers)
+    batch.shares[:] = rng.uniform(2e8, 5e9, n_tickers)
+    batch.cashflow_loaded[:] = True
+    sectors = {t: random.Random(t).choice(['Technology', 'Healthcare', 'Industrials']) for t in tickers}
+    inputs = ScreenInputs(batch, sectors, {}, {t: '2025-12-31' for t in tickers})
+    payload = {'generated_at': '2026-01-01T00:00:00', 'inputs': inputs.to_dict(),
+               'survivors': n_tickers, 'total_analyzed': n_tickers}
+
+    rows = []
+    for i in range(candidates):
+        rows.append({'Ticker': tickers[i], 'Sector': sectors[tickers[i]],
+                     'Price': round(float(batch.price[i]), 2), 'Intrinsic': float(rng.uniform(10, 800)),
+                     'MOS': float(rng.uniform(-1, 0.8)), 'ROIC': float(rng.uniform(0.08, 0.5)),
+                     'Piotroski': int(rng.integers(5, 10)), 'FCF_Yield': float(rng.uniform(0, 0.1)),
+                     'Market_Cap': float(batch.price[i] * batch.shares[i])})
+    cache = {'results': {'results': rows, 'candidates_count': candidates, 'total_analyzed': n_tickers,
+                         'generated_at': '2026-01-01T00:00:00'},
+             'cached_at': '2026-01-01T00:00:00', 'expires_at': '2026-01-02T00:00:00'}
+    return cache, payload
+
+
+def legacy_encode(obj):
+    """Formato anterior de save_to_cache"""
+    text = json.dumps(obj, default=str, allow_nan=False)
+    return text.replace('NaN', 'null').replace('Infinity', 'null').replace('-Infinity', 'null').encode('utf-8')
+
+
+def measure(encode, decode, obj, repeat):
+    """(bytes, ms codificación, ms decodificación, pico MB decodificación, objeto decodificado)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        content = encode(obj)
+    encode_ms = (time.perf_counter() - start) / repeat * 1e3
+    start = time.perf_counter()
+    for _ in range(repeat):
+        decoded = decode(content)
+    decode_ms = (time.perf_counter() - start) / repeat * 1e3
+    tracemalloc.start()
+    decode(content)
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return len(content), encode_ms, decode_ms, peak, decoded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--tickers', type=int, default=3000)
+    parser.add_argument('--candidates', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    cache, payload = make_objects(args.tickers, args.candidates, args.seed)
+    variants = [('anterior (JSON + replace)', legacy_encode, json.loads),
+                ('v1 gzip', lambda o: cache_codec.encode(o, cache_codec.GZIP), cache_codec.decode)]
+    if cache_codec.ZSTD_AVAILABLE:
+        variants.append(('v1 zstd', lambda o: cache_codec.encode(o, cache_codec.ZSTD), cache_codec.decode))
+
+    mismatches = 0
+    for label, obj in (('Resultados cacheados', cache), ('Entradas del screener', payload)):
+        print(f"{label}:")
+        print(f"  {'formato':<26} {'tamaño':>10} {'codificar':>11} {'decodificar':>12} "
+              f"{'vs anterior':>12} {'pico decode':>12}")
+        reference = None
+        for name, encode, decode in variants:
+            size, encode_ms, decode_ms, peak, decoded = measure(encode, decode, obj, args.repeat)
+            if reference is None:
+                reference, legacy_decode_ms = decoded, decode_ms
+            mismatches += decoded != reference
+            print(f"  {name:<26} {size / 1024:>8.0f}KB {encode_ms:>9.1f}ms {decode_ms:>10.1f}ms "
+                  f"{decode_ms / legacy_decode_ms:>11.2f}x {peak:>10.1f}MB")
+
+    # El formato anterior no admite NaN (allow_nan=False) y sus reemplazos alteran el texto
+    sample = {'MOS': float('nan'), 'Name': 'NaN Holdings', 'Note': 'Infinity Corp'}
+    try:
+        legacy_encode(sample)
+        legacy = 'ok'
+    except ValueError:
+        legacy = 'ValueError'
+    print(f"Con NaN: anterior -> {legacy}; v1 -> {cache_codec.decode(cache_codec.encode(sample))}")
+    print(f"Texto con 'NaN'/'Infinity': anterior -> {json.loads(legacy_encode({k: v for k, v in sample.items() if k != 'MOS'}))}")
+    print(f"Decodificaciones distintas entre formatos: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark: coste de extraer los 7 campos financieros por ticker
+
+Compara la antigua búsqueda fuzzy (reescribe df.index en cada llamada y
+escanea por subcadena) con el esquema canónico de financial_fields, y
+comprueba que ambos devuelven exactamente las mismas filas.
+
+Uso:
+    python bench_fields.py [--tickers 500] [--seed 7]
+"""
+
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+from yfinance import const as yf_const
+from yfinance import utils as yf_utils
+
+from financial_fields import FIELD_SCHEMA, normalize_statement, resolve_labels
+from async_fetch import TIMESERIES_NAMES, PRETTY_ACRONYMS
+
+
+def legacy_fuzzy_series(df, keywords):
+    """Copia literal de la antigua get_fuzzy_series de main.py"""
+    if df.empty:
+        return pd.Series(dtype=float)
+
+    df.index = df.index.astype(str).str.lower().str.strip()
+
+    for key in keywords:
+        key = key.lower()
+        if key in df.index:
+            return df.loc[key]
+        matches = [idx for idx in df.index if key in idx]
+        if matches:
+            return df.loc[min(matches, key=len)]
+
+    return pd.Series(dtype=float)
+
+
+def make_statements(n_tickers, seed):
+    """Estados sintéticos con las etiquetas reales de Yahoo (subconjunto aleatorio de filas)"""
+    rng = np.random.default_rng(seed)
+    periods = pd.to_datetime(['2024-12-31', '2023-12-31', '2022-12-31', '2021-12-31'])
+    labels = {
+        kind: list(yf_utils.camel2title(yf_const.fundamentals_keys[name], sep=' ', acronyms=PRETTY_ACRONYMS))
+        for kind, name in TIMESERIES_NAMES.items()
+    }
+    tickers = []
+    for _ in range(n_tickers):
+        statements = {}
+        for kind, rows in labels.items():
+            keep = [row for row in rows if rng.random() < 0.8]
+            values = rng.normal(1e9, 5e8, size=(len(keep), len(periods)))
+            statements[kind] = pd.DataFrame(values, index=keep, columns=periods)
+        tickers.append(statements)
+    return tickers
+
+
+def run_legacy(statements):
+    out = {}
+    for kind, fields in FIELD_SCHEMA.items():
+        df = statements[kind].copy()  # la versión antigua muta el índice
+        for field, aliases in fields.items():
+            out[field] = legacy_fuzzy_series(df, list(aliases))
+    return out
+
+
+def run_canonical(statements):
+    out = {}
+    for kind, fields in FIELD_SCHEMA.items():
+        canonical = normalize_statement(statements[kind], kind)
+        for field in fields:
+            out[field] = canonical[field]
+    return out
+
+
+def timed(func, universe):
+    start = time.perf_counter()
+    results = [func(statements) for statements in universe]
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--tickers', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    universe = make_statements(args.tickers, args.seed)
+
+    # El coste de copiar los frames no es parte de la extracción antigua
+    copy_time, _ = timed(lambda s: {k: df.copy() for k, df in s.items()}, universe)
+    legacy_time, legacy = timed(run_legacy, universe)
+    legacy_time -= copy_time
+
+    resolve_labels.cache_clear()
+    cold_time, canonical = timed(run_canonical, universe)
+    warm_time, _ = timed(run_canonical, universe)
+
+    mismatches = 0
+    for old, new in zip(legacy, canonical):
+        for field in old:
+            if not np.array_equal(old[field].to_numpy(), new[field].to_numpy(), equal_nan=True):
+                mismatches += 1
+
+    per_ticker = lambda t: t / args.tickers * 1e6
+    print(f"Tickers: {args.tickers} (7 campos por ticker)")
+    print(f"  fuzzy (antes):            {per_ticker(legacy_time):8.1f} µs/ticker")
+    print(f"  canónico, caché fría:     {per_ticker(cold_time):8.1f} µs/ticker")
+    print(f"  canónico, caché caliente: {per_ticker(warm_time):8.1f} µs/ticker")
+    print(f"  speedup (frío / caliente): {legacy_time / cold_time:.1f}x / {legacy_time / warm_time:.1f}x")
+    print(f"  cache de etiquetas: {resolve_labels.cache_info()}")
+    print(f"  diferencias con la versión fuzzy: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Monte Carlo del DCF (monte_carlo.py)
+
+Simula filas sintéticas con el pool de procesos y en un solo proceso,
+comprueba que con la misma semilla el resultado es idéntico sea cual sea
+el número de procesos, y que con varianza cero coincide con el DCF
+puntual del screener.
+
+Uso:
+    python bench_monte_carlo.py [--tickers 500] [--samples 10000] [--workers 4] [--seed 7]
+"""
+
+import os
+import time
+import argparse
+
+import numpy as np
+
+from dcf import intrinsic_value
+from monte_carlo import INPUT_COLUMNS, PERCENTILES, simulate, merge_distributions
+from sensitivity import split_inputs
+
+
+def make_rows(n, seed):
+    """Filas sintéticas con precio entre 0.5x y 1.5x el DCF puntual"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for t in range(n):
+        row = {
+            'Ticker': f"T{t:04d}",
+            'FCF': float(rng.lognormal(21, 1)),
+            'Cash': float(rng.lognormal(20, 1)),
+            'Debt': float(rng.lognormal(20.5, 1)),
+            'Shares': float(rng.uniform(1e8, 5e9)),
+            'Growth_Est': float(rng.uniform(0.03, 0.14))
+        }
+        point = intrinsic_value(row['FCF'], row['Growth_Est'], 0.09, row['Cash'], row['Debt'], row['Shares'])
+        row['Price'] = float(abs(point) * rng.uniform(0.5, 1.5))
+        rows.append(row)
+    return rows
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--tickers', type=int, default=500)
+    parser.add_argument('--samples', type=int, default=10_000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    tickers, inputs, _ = split_inputs(make_rows(args.tickers, args.seed), INPUT_COLUMNS)
+
+    serial_time, serial = timed(lambda: simulate(tickers, inputs, args.samples, seed=args.seed, workers=1))
+    pool_time, pooled = timed(lambda: simulate(tickers, inputs, args.samples, seed=args.seed,
+                                               workers=args.workers))
+    _, rechunked = timed(lambda: simulate(tickers, inputs, args.samples, seed=args.seed,
+                                          workers=args.workers, chunk_tickers=7))
+    # Un subconjunto en otro orden da lo mismo para cada ticker
+    subset = np.arange(len(tickers))[::-3]
+    _, partial = timed(lambda: simulate([tickers[i] for i in subset], {k: v[subset] for k, v in inputs.items()},
+                                        args.samples, seed=args.seed, workers=1))
+    reproducible = all(
+        np.array_equal(serial[key], other[key])
+        for other in (pooled, rechunked) for key in serial
+    ) and all(np.array_equal(serial[key][subset], partial[key]) for key in serial)
+
+    # Varianza cero: todas las muestras son el DCF puntual (tasa 9%, terminal 3%)
+    point = merge_distributions({
+        'growth': {'sd': 0.0},
+        'discount_rate': {'mean': 0.09, 'sd': 0.0},
+        'terminal_growth': {'low': 0.03, 'high': 0.03}
+    })
+    degenerate = simulate(tickers, inputs, 16, seed=args.seed, distributions=point, workers=1)
+    expected = intrinsic_value(inputs['FCF'], inputs['Growth_Est'], 0.09, inputs['Cash'],
+                               inputs['Debt'], inputs['Shares'])
+    point_ok = np.allclose(degenerate['percentiles'], expected[:, None], rtol=1e-12)
+
+    median = serial['percentiles'][:, PERCENTILES.index(50)]
+    print(f"Tickers: {args.tickers} × {args.samples:,} muestras = {args.tickers * args.samples:,} DCFs")
+    print(f"  1 proceso:               {serial_time * 1e3:9.1f} ms")
+    print(f"  pool de {args.workers} procesos:      {pool_time * 1e3:9.1f} ms")
+    print(f"  speedup del pool:        {serial_time / pool_time:9.1f}x")
+    print(f"  misma semilla, distinto nº de procesos / bloques / subconjunto: "
+          f"{'idéntico' if reproducible else 'DISTINTO'}")
+    print(f"  varianza cero == DCF puntual: {'sí' if point_ok else 'NO'}")
+    print(f"  P(MOS > 0) media: {serial['prob_mos_positive'].mean():.3f}, "
+          f"mediana intrínseca / precio media: {np.mean(median / inputs['Price']):.2f}")
+    return 0 if reproducible and point_ok else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark: modo pipeline (hilos de I/O -> cola -> CPU) vs hilos
+
+Ejecuta analyze_universe de extremo a extremo contra un proveedor
+sintético con latencia de red simulada (time.sleep, libera el GIL) y
+estados financieros del tamaño de los de Yahoo, con almacén de
+fundamentales vacío en cada run, para varios números de hilos de I/O.
+Comprueba además que ambos modos devuelven las mismas filas.
+
+Uso:
+    python bench_pipeline.py [--tickers 300] [--latency-ms 50] [--workers 4,8,12,24,48]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+import pandas as pd
+
+# Índice de metadata y snapshots en temporales: el benchmark no toca los del servicio
+os.environ.setdefault('METADATA_PATH', os.path.join(tempfile.mkdtemp(), 'metadata.json'))
+os.environ.setdefault('UNIVERSE_DIR', tempfile.mkdtemp())
+os.environ.setdefault('FUNDAMENTALS_DIR', tempfile.mkdtemp())
+
+import market_data  # noqa: E402
+from market_data import MarketDataProvider  # noqa: E402
+
+# Filas reales que usa el screener; el resto son etiquetas de relleno
+# (Yahoo devuelve ~40-60 filas por estado)
+SCREENER_ROWS = {
+    'income': ('Net Income', 'EBIT', 'Total Revenue'),
+    'balance': ('Stockholders Equity', 'Total Debt', 'Cash And Cash Equivalents', 'Ordinary Shares Number'),
+    'cashflow': ('Operating Cash Flow', 'Capital Expenditure', 'Free Cash Flow'),
+}
+FILLER_ROWS = {'income': 40, 'balance': 60, 'cashflow': 45}
+PERIODS = [pd.Timestamp(f"{year}-12-31") for year in (2025, 2024, 2023, 2022, 2021)]
+
+
+class SyntheticProvider(MarketDataProvider):
+    """Estados sintéticos deterministas por ticker con latencia simulada por petición"""
+
+    name = 'synthetic'
+
+    def __init__(self, tickers, latency=0.05, seed=7):
+        self.tickers = tickers
+        self.latency = latency
+        self.seed = seed
+
+    def _rng(self, ticker, kind=''):
+        return random.Random(f"{self.seed}:{ticker}:{kind}")
+
+    def quotes(self, tickers):
+        time.sleep(self.latency)
+        result = {}
+        for ticker in tickers:
+            rng = self._rng(ticker)
+            result[ticker] = {'market_cap': rng.uniform(2, 300) * 1e9, 'last_price': rng.uniform(10, 500),
+                              'shares': rng.uniform(0.2, 5) * 1e9, 'currency': 'USD'}
+        return result
+
+    def statement(self, ticker, kind):
+        time.sleep(self.latency)
+        rng = self._rng(ticker, kind)
+        # Subconjunto variable de filas de relleno: etiquetas distintas entre tickers
+        labels = list(SCREENER_ROWS[kind]) + [
+            f"{kind.title()} Item {i}" for i in range(FILLER_ROWS[kind]) if rng.random() < 0.8
+        ]
+        rng.shuffle(labels)
+        values = [[rng.uniform(-2, 10) * 1e9 for _ in PERIODS] for _ in labels]
+        if kind == 'cashflow':
+            values[labels.index('Capital Expenditure')] = [-rng.uniform(0.1, 2) * 1e9 for _ in PERIODS]
+        return pd.DataFrame(values, index=labels, columns=PERIODS)
+
+    def info(self, ticker):
+        time.sleep(self.latency)
+        return {'sector': self._rng(ticker).choice(['Technology', 'Healthcare', 'Industrials']),
+                'currency': 'USD'}
+
+
+def run(screener, provider, tickers, mode, workers):
+    """Un run completo con concurrencia fija y almacén vacío: (segundos, filas, perfil)"""
+    screener.CONFIG.update({'MAX_WORKERS': workers, 'MIN_WORKERS': workers, 'MAX_WORKERS_CEILING': workers})
+    screener.fundamentals_store = screener.FundamentalsStore(tempfile.mkdtemp())
+    market_data.set_provider(provider)
+    start = time.perf_counter()
+    analysis = screener.analyze_universe(tickers, fetch_mode=mode)
+    elapsed = time.perf_counter() - start
+    rows = sorted(json.dumps(o.row, sort_keys=True, default=str) for o in analysis['outcomes'] if o.row)
+    return elapsed, rows, analysis['concurrency_profile']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--tickers', type=int, default=300)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--workers', default='4,8,12,24,48')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    import main as screener
+    if not screener.FUNDAMENTALS_STORE_AVAILABLE:
+        print("⚠️  Sin pyarrow: el almacén de fundamentales no está disponible")
+        return 1
+    screener.log = lambda msg: None  # Sin logs por run
+    tickers = [f"T{t:04d}" for t in range(args.tickers)]
+    provider = SyntheticProvider(tickers, latency=args.latency_ms / 1000, seed=args.seed)
+    workers = [int(w) for w in args.workers.split(',')]
+
+    print(f"Tickers: {args.tickers}, latencia {args.latency_ms:.0f} ms/petición, almacén vacío en cada run")
+    print(f"  {'hilos I/O':>9}  {'threads':>9}  {'pipeline':>9}  {'speedup':>7}  {'CPU pipeline':>12}  {'cola pico':>9}")
+    mismatches = 0
+    reference = None
+    for w in workers:
+        threads_time, threads_rows, _ = run(screener, provider, tickers, 'threads', w)
+        pipeline_time, pipeline_rows, profile = run(screener, provider, tickers, 'pipeline', w)
+        reference = reference or threads_rows
+        mismatches += (threads_rows != reference) + (pipeline_rows != reference)
+        stats = profile.get('pipeline') or {}
+        print(f"  {w:>9}  {threads_time:>8.2f}s  {pipeline_time:>8.2f}s  {threads_time / pipeline_time:>6.2f}x  "
+              f"{stats.get('cpu_seconds', 0):>11.2f}s  {stats.get('queue_peak', 0):>9}")
+    print(f"  filas distintas entre modos / hilos: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark: lectura del caché de resultados por capas (result_cache.py)
+
+Sube un resultado sintético del tamaño de un análisis real a un
+LocalBucket con latencia simulada por operación (como un round-trip a
+GCS) y mide la latencia por petición de la lectura directa
+(exists + descarga + json.loads) frente a TieredBlobCache en sus capas:
+memoria dentro de la ventana, memoria revalidada por generación, disco
+(instancia recién arrancada) y bucket (generación nueva).
+
+Uso:
+    python bench_result_cache.py [--candidates 300] [--requests 200] [--latency-ms 20]
+"""
+
+import json
+import time
+import random
+import argparse
+import tempfile
+
+from local_bucket import LocalBucket, LocalBlob
+from result_cache import TieredBlobCache
+
+NAME = "screener_results.json"
+
+
+class SlowBlob(LocalBlob):
+    """LocalBlob con la latencia de red de cada llamada a GCS"""
+
+    def exists(self):
+        time.sleep(self.bucket.latency)
+        return super().exists()
+
+    def reload(self):
+        time.sleep(self.bucket.latency)
+        return super().reload()
+
+    def download_as_bytes(self):
+        time.sleep(self.bucket.latency)
+        return super().download_as_bytes()
+
+
+class SlowBucket(LocalBucket):
+    def __init__(self, root, latency):
+        super().__init__(root)
+        self.latency = latency
+
+    def blob(self, name):
+        return SlowBlob(self, name)
+
+    def get_blob(self, name):
+        blob = SlowBlob(self, name)
+        try:
+            blob.reload()
+        except FileNotFoundError:
+            return None
+        return blob
+
+
+def make_results(candidates, seed):
+    """Resultado con la forma de save_to_cache (filas + resumen)"""
+    rng = random.Random(seed)
+    rows = [{'Ticker': f"T{i:04d}", 'Sector': rng.choice(['Technology', 'Healthcare', 'Industrials']),
+             'Price': round(rng.uniform(10, 500), 2), 'Intrinsic': rng.uniform(10, 800),
+             'MOS': rng.uniform(-1, 0.8), 'ROIC': rng.uniform(0.1, 0.5), 'Piotroski': rng.randint(5, 9),
+             'FCF_Yield': rng.uniform(0, 0.1), 'Market_Cap': rng.uniform(2, 300) * 1e9}
+            for i in range(candidates)]
+    return {'cached_at': '2026-01-01T00:00:00', 'expires_at': '2026-01-02T00:00:00',
+            'results': {'results': rows, 'candidates_count': candidates, 'total_analyzed': candidates * 10}}
+
+
+def direct_read(bucket):
+    """Camino anterior: exists + descarga + json.loads en cada petición"""
+    blob = bucket.blob(NAME)
+    if not blob.exists():
+        return None
+    return json.loads(blob.download_as_bytes())
+
+
+def timed(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--candidates', type=int, default=300)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    bucket = SlowBucket(tempfile.mkdtemp(), args.latency_ms / 1000)
+    content = json.dumps(make_results(args.candidates, args.seed))
+    bucket.blob(NAME).upload_from_string(content, content_type='application/json')
+    cache_dir = tempfile.mkdtemp()
+    n = args.requests
+
+    direct = timed(lambda: direct_read(bucket), n)
+
+    cache = TieredBlobCache(bucket, NAME, cache_dir, revalidate_seconds=3600)
+    cache.get()
+    memory = timed(cache.get, n)
+
+    cache = TieredBlobCache(bucket, NAME, cache_dir, revalidate_seconds=0)
+    cache.get()
+    revalidated = timed(cache.get, n)
+
+    # Instancia nueva en cada petición: sin memoria, con la copia en disco
+    disk = timed(lambda: TieredBlobCache(bucket, NAME, cache_dir, revalidate_seconds=0).get(), n)
+
+    def new_generation():
+        bucket.blob(NAME).upload_from_string(content, content_type='application/json')
+        return cache.get()
+    upload = timed(lambda: bucket.blob(NAME).upload_from_string(content), max(n // 10, 1))
+    from_bucket = timed(new_generation, max(n // 10, 1)) - upload
+
+    data, info = cache.get()
+    same = data == json.loads(content)
+    print(f"Resultado: {args.candidates} candidatos, {len(content) / 1024:.0f} KB, "
+          f"latencia simulada {args.latency_ms:.0f} ms/operación, {n} peticiones")
+    print(f"  lectura directa (exists + descarga + parse): {direct:8.2f} ms/petición")
+    print(f"  capa bucket (generación nueva):              {from_bucket:8.2f} ms/petición")
+    print(f"  capa disco (instancia recién arrancada):     {disk:8.2f} ms/petición")
+    print(f"  memoria revalidada (get_blob):               {revalidated:8.2f} ms/petición")
+    print(f"  memoria dentro de la ventana:                {memory:8.4f} ms/petición")
+    print(f"  speedup memoria vs directa:                  {direct / memory:8.0f}x")
+    print(f"  contenido idéntico al subido: {same} (generación {info['generation']})")
+    return 0 if same else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
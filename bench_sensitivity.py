@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark: rejilla de sensibilidad del DCF (endpoint /sensitivity)
+
+Genera filas sintéticas con las entradas del DCF, calcula la rejilla
+tasa × crecimiento × terminal con broadcasting (sensitivity.py) y la
+compara con el bucle por año original evaluado celda a celda en una
+muestra de tickers.
+
+Uso:
+    python bench_sensitivity.py [--tickers 500] [--seed 7] [--sample 20]
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from sensitivity import DEFAULT_GRID, split_inputs, sensitivity_grid, summarize_grid, to_json_lists
+
+
+def make_rows(n, seed):
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            'Ticker': f"T{t:04d}",
+            'Price': float(rng.uniform(10, 500)),
+            'FCF': float(rng.lognormal(21, 1)),
+            'Cash': float(rng.lognormal(20, 1)),
+            'Debt': float(rng.lognormal(20.5, 1)),
+            'Shares': float(rng.uniform(1e8, 5e9))
+        }
+        for t in range(n)
+    ]
+
+
+def loop_intrinsic(row, rate, growth, terminal, years=5):
+    """Bucle por año del screener original"""
+    future_cash = 0
+    for i in range(1, years + 1):
+        future_cash += row['FCF'] * ((1 + growth) ** i) / ((1 + rate) ** i)
+    terminal_fcf = row['FCF'] * ((1 + growth) ** years)
+    term_val_pv = (terminal_fcf * (1 + terminal)) / (rate - terminal) / ((1 + rate) ** years)
+    return (future_cash + term_val_pv + row['Cash'] - row['Debt']) / row['Shares']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--tickers', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--sample', type=int, default=20)
+    args = parser.parse_args()
+
+    rows = make_rows(args.tickers, args.seed)
+    grid = dict(DEFAULT_GRID)
+    points = len(grid['discount_rates']) * len(grid['growth_rates']) * len(grid['terminal_growths'])
+
+    start = time.perf_counter()
+    tickers, inputs, _ = split_inputs(rows)
+    intrinsic, mos = sensitivity_grid(inputs, **grid)
+    summarize_grid(mos)
+    grid_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    to_json_lists(intrinsic, 2)
+    to_json_lists(mos)
+    json_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    max_rel_diff = 0.0
+    mismatches = 0
+    for t in range(min(args.sample, len(rows))):
+        for a, rate in enumerate(grid['discount_rates']):
+            for b, growth in enumerate(grid['growth_rates']):
+                for c, terminal in enumerate(grid['terminal_growths']):
+                    expected = loop_intrinsic(rows[t], rate, growth, terminal)
+                    got = intrinsic[t, a, b, c]
+                    rel = abs(got - expected) / abs(expected)
+                    max_rel_diff = max(max_rel_diff, rel)
+                    mismatches += not rel <= 1e-12
+    loop_time = (time.perf_counter() - start) / max(1, min(args.sample, len(rows))) * len(rows)
+
+    print(f"Tickers: {len(tickers)} × rejilla {intrinsic.shape[1:]} = {intrinsic.size:,} valoraciones")
+    print(f"  bucle por celda (estimado):  {loop_time * 1e3:9.1f} ms")
+    print(f"  rejilla con broadcasting:    {grid_time * 1e3:9.1f} ms")
+    print(f"  conversión a listas JSON:    {json_time * 1e3:9.1f} ms")
+    print(f"  speedup del cálculo:         {loop_time / grid_time:9.1f}x")
+    print(f"  diferencias con el bucle ({args.sample} tickers × {points}): {mismatches} "
+          f"(máx. diferencia relativa {max_rel_diff:.1e})")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
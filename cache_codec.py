@@ -0,0 +1,130 @@
+"""
+cache_codec.py - Codificación versionada de los objetos de caché del bucket
+JSON compacto sin NaN/Infinity (se convierten a null recorriendo el objeto,
+sin tocar el texto) comprimido con zstd (o gzip si zstandard no está
+instalado), precedido de una cabecera con versión y compresión. La lectura
+descomprime en streaming (el parseo no es incremental) y acepta también el
+formato anterior (JSON plano)
+
+Formato v1:
+    b'WSC' | versión (1 byte) | compresión (1 byte: 1 = gzip, 2 = zstd) | cuerpo
+"""
+
+import io
+import json
+import gzip
+import math
+
+import numpy as np
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+MAGIC = b'WSC'
+VERSION = 1
+GZIP = 1
+ZSTD = 2
+COMPRESSION_NAMES = {GZIP: 'gzip', ZSTD: 'zstd'}
+DEFAULT_COMPRESSION = ZSTD if ZSTD_AVAILABLE else GZIP
+ZSTD_LEVEL = 1  # Con los floats del caché, niveles más altos no comprimen más
+GZIP_LEVEL = 6
+CONTENT_TYPE = 'application/octet-stream'
+_HEADER_SIZE = len(MAGIC) + 2
+
+
+def sanitize(obj):
+    """
+    Copia apta para JSON estricto: NaN / ±Infinity -> None, escalares y
+    arrays de numpy -> tipos de Python, fechas y desconocidos -> str (como
+    el default=str de json.dumps)
+    """
+    if isinstance(obj, dict):
+        return {k: sanitize(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [sanitize(v) for v in obj]
+    if isinstance(obj, (str, bool, int)) or obj is None:
+        return obj
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, np.ndarray):
+        return sanitize(obj.tolist())
+    if isinstance(obj, np.generic):
+        return sanitize(obj.item())
+    return str(obj)
+
+
+def dumps(obj):
+    """JSON compacto y estricto (null en lugar de NaN / Infinity)"""
+    try:
+        # Camino rápido: objetos ya limpios (p.ej. entradas del screener) sin recorrerlos
+        return json.dumps(obj, separators=(',', ':'), allow_nan=False)
+    except (ValueError, TypeError):
+        return json.dumps(sanitize(obj), separators=(',', ':'), allow_nan=False)
+
+
+def compress(text, compression=None):
+    """Texto JSON -> bytes del formato v1"""
+    compression = compression or DEFAULT_COMPRESSION
+    raw = text.encode('utf-8')
+    if compression == ZSTD:
+        if not ZSTD_AVAILABLE:
+            raise ValueError("Compresión zstd no disponible (instala zstandard)")
+        body = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    elif compression == GZIP:
+        body = gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+    else:
+        raise ValueError(f"Compresión desconocida: {compression}")
+    return MAGIC + bytes([VERSION, compression]) + body
+
+
+def encode(obj, compression=None):
+    """Objeto -> bytes del formato v1"""
+    return compress(dumps(obj), compression)
+
+
+def describe(content):
+    """Formato de unos bytes de caché ('zstd-v1', 'gzip-v1' o 'json' si es el anterior)"""
+    if content[:len(MAGIC)] != MAGIC:
+        return 'json'
+    return f"{COMPRESSION_NAMES.get(content[len(MAGIC) + 1], 'unknown')}-v{content[len(MAGIC)]}"
+
+
+def load(fileobj):
+    """
+    Decodifica desde un fichero binario
+
+    La descompresión es en streaming (no se copia el cuerpo descomprimido en
+    bytes), pero el parseo no: json.load lee el texto completo antes de
+    construir el objeto, así que el pico de memoria incluye el JSON entero
+    más el objeto, y el tiempo es el de json.loads más la descompresión
+
+    Raises:
+        ValueError si la versión o la compresión no están soportadas
+    """
+    header = fileobj.read(_HEADER_SIZE)
+    if header[:len(MAGIC)] != MAGIC:
+        # Formato anterior: JSON plano
+        return json.loads(header + fileobj.read())
+    version, compression = header[len(MAGIC)], header[len(MAGIC) + 1]
+    if version > VERSION:
+        raise ValueError(f"Versión de caché {version} no soportada (máxima {VERSION})")
+    if compression == ZSTD:
+        if not ZSTD_AVAILABLE:
+            raise ValueError("Caché comprimido con zstd: instala zstandard para leerlo")
+        stream = zstandard.ZstdDecompressor().stream_reader(fileobj)
+    elif compression == GZIP:
+        stream = gzip.GzipFile(fileobj=fileobj, mode='rb')
+    else:
+        raise ValueError(f"Compresión de caché desconocida: {compression}")
+    with io.TextIOWrapper(stream, encoding='utf-8') as text:
+        return json.load(text)
+
+
+def decode(content):
+    """Bytes de caché (v1 o JSON plano anterior) -> objeto"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return load(io.BytesIO(content))
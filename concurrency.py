@@ -0,0 +1,149 @@
+"""
+concurrency.py - Control adaptativo de concurrencia (AIMD)
+Ajusta cuántos análisis hay en vuelo según la latencia observada
+y la tasa de errores / throttling del proveedor de datos
+"""
+
+import threading
+
+
+class AdaptiveConcurrencyController:
+    """
+    Controlador AIMD (Additive Increase / Multiplicative Decrease)
+
+    - Cada `window` análisis completados sin congestión: limit += increase_step
+    - Throttling: limit *= decrease_factor inmediatamente
+    - Tasa de error > max_error_rate: limit *= decrease_factor
+    - Latencia media > target_latency: limit *= latency_decrease_factor
+
+    Tras cada reducción se ignoran las señales de las peticiones que ya
+    estaban en vuelo (enfriamiento de `limit` completados) para no
+    encadenar recortes por una misma ráfaga de throttling.
+    """
+
+    def __init__(self, initial=12, min_limit=2, max_limit=48, target_latency=4.0,
+                 window=10, increase_step=1, decrease_factor=0.5,
+                 latency_decrease_factor=0.7, max_error_rate=0.2):
+        """
+        Args:
+            initial: Concurrencia inicial
+            min_limit / max_limit: Límites de la concurrencia
+            target_latency: Latencia media aceptable por análisis (segundos)
+            window: Completados por ventana de evaluación
+            increase_step: Incremento aditivo por ventana sana
+            decrease_factor: Factor multiplicativo ante throttling / errores
+            latency_decrease_factor: Factor multiplicativo ante latencia alta
+            max_error_rate: Tasa de errores tolerada por ventana
+        """
+        self.initial = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.window = window
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.latency_decrease_factor = latency_decrease_factor
+        self.max_error_rate = max_error_rate
+
+        self._lock = threading.Lock()
+        self._limit = max(min_limit, min(initial, max_limit))
+        self._window_latencies = []
+        self._window_errors = 0
+        self._cooldown = 0
+
+        # Estadísticas para el perfil
+        self._completed = 0
+        self._errors = 0
+        self._throttles = 0
+        self._total_latency = 0.0
+        self._limit_sum = 0
+        self._increases = 0
+        self._decreases = 0
+        self._peak = self._limit
+        self._floor = self._limit
+        self._timeline = [{'completed': 0, 'limit': self._limit, 'reason': 'initial'}]
+
+    @property
+    def limit(self):
+        """Número máximo de análisis en vuelo"""
+        with self._lock:
+            return self._limit
+
+    def record(self, latency, error=False, throttled=False):
+        """Registra el resultado de un análisis completado"""
+        with self._lock:
+            self._completed += 1
+            self._total_latency += latency
+            self._limit_sum += self._limit
+            if error:
+                self._errors += 1
+            if throttled:
+                self._throttles += 1
+
+            if self._cooldown > 0:
+                self._cooldown -= 1
+                return
+
+            if throttled:
+                self._decrease(self.decrease_factor, 'throttled')
+                return
+
+            self._window_latencies.append(latency)
+            self._window_errors += 1 if error else 0
+            if len(self._window_latencies) < self.window:
+                return
+
+            avg_latency = sum(self._window_latencies) / len(self._window_latencies)
+            error_rate = self._window_errors / len(self._window_latencies)
+
+            if error_rate > self.max_error_rate:
+                self._decrease(self.decrease_factor, 'errors')
+            elif avg_latency > self.target_latency:
+                self._decrease(self.latency_decrease_factor, 'latency')
+            else:
+                self._increase()
+            self._reset_window()
+
+    def _reset_window(self):
+        self._window_latencies = []
+        self._window_errors = 0
+
+    def _increase(self):
+        new_limit = min(self.max_limit, self._limit + self.increase_step)
+        if new_limit != self._limit:
+            self._increases += 1
+            self._set_limit(new_limit, 'increase')
+
+    def _decrease(self, factor, reason):
+        new_limit = max(self.min_limit, int(self._limit * factor))
+        self._reset_window()
+        self._cooldown = self._limit
+        if new_limit != self._limit:
+            self._decreases += 1
+            self._set_limit(new_limit, reason)
+
+    def _set_limit(self, new_limit, reason):
+        self._limit = new_limit
+        self._peak = max(self._peak, new_limit)
+        self._floor = min(self._floor, new_limit)
+        self._timeline.append({'completed': self._completed, 'limit': new_limit, 'reason': reason})
+
+    def profile(self):
+        """Resumen de la concurrencia usada durante la ejecución"""
+        with self._lock:
+            completed = self._completed
+            return {
+                'initial': self.initial,
+                'final': self._limit,
+                'peak': self._peak,
+                'floor': self._floor,
+                'mean': round(self._limit_sum / completed, 2) if completed else self._limit,
+                'bounds': [self.min_limit, self.max_limit],
+                'increases': self._increases,
+                'decreases': self._decreases,
+                'completed': completed,
+                'errors': self._errors,
+                'throttled': self._throttles,
+                'avg_latency_seconds': round(self._total_latency / completed, 3) if completed else None,
+                'timeline': list(self._timeline)
+            }
@@ -0,0 +1,68 @@
+"""
+dcf.py - Núcleo DCF de 2 etapas en forma cerrada
+Stage 1 como serie geométrica y Stage 2 como valor terminal de Gordon,
+sin bucles por año: acepta escalares o arrays (broadcasting NumPy) para
+FCF, crecimiento, tasa de descuento y crecimiento terminal
+"""
+
+import numpy as np
+
+TERMINAL_GROWTH = 0.03
+STAGE1_YEARS = 5
+NO_MOS = -0.99  # MOS cuando no hay valor intrínseco positivo
+
+
+def _scalar_or_array(value):
+    return float(value) if np.ndim(value) == 0 else value
+
+
+def two_stage_multiple(growth, discount_rate, terminal_growth=TERMINAL_GROWTH, years=STAGE1_YEARS):
+    """
+    EV / FCF de un DCF de 2 etapas en forma cerrada
+
+    Con q = (1 + g) / (1 + r):
+        Stage 1 = Σ_{i=1..n} q^i = q · (q^n - 1) / (q - 1)   (n si q = 1)
+        Stage 2 = q^n · (1 + tg) / (r - tg)
+
+    q^n - 1 se calcula con expm1/log1p para no perder precisión cuando g ≈ r.
+    Donde r <= tg el valor terminal no está definido y se devuelve NaN.
+    No hay tabla de factores por año que cachear: el coste es O(1) por
+    elemento sea cual sea la tasa.
+    """
+    g = np.asarray(growth, dtype=float)
+    r = np.asarray(discount_rate, dtype=float)
+    tg = np.asarray(terminal_growth, dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        step = (g - r) / (1.0 + r)           # q - 1, sin cancelación
+        log_q = np.log1p(step)
+        growth_n = np.expm1(years * log_q)   # q^n - 1
+        stage1 = np.where(step == 0, float(years), (1.0 + step) * growth_n / step)
+        stage2 = (1.0 + growth_n) * (1.0 + tg) / (r - tg)
+        multiple = np.where(r > tg, stage1 + stage2, np.nan)
+
+    return _scalar_or_array(multiple)
+
+
+def two_stage_ev(fcf, growth, discount_rate, terminal_growth=TERMINAL_GROWTH, years=STAGE1_YEARS):
+    """Valor de empresa (EV) = FCF · two_stage_multiple"""
+    with np.errstate(invalid='ignore', over='ignore'):
+        ev = np.asarray(fcf, dtype=float) * two_stage_multiple(growth, discount_rate, terminal_growth, years)
+    return _scalar_or_array(ev)
+
+
+def intrinsic_value(fcf, growth, discount_rate, cash, debt, shares,
+                    terminal_growth=TERMINAL_GROWTH, years=STAGE1_YEARS):
+    """Valor intrínseco por acción = (EV + caja - deuda) / acciones"""
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        ev = np.asarray(two_stage_ev(fcf, growth, discount_rate, terminal_growth, years))
+        value = (ev + np.asarray(cash, dtype=float) - np.asarray(debt, dtype=float)) / np.asarray(shares, dtype=float)
+    return _scalar_or_array(value)
+
+
+def margin_of_safety(intrinsic, price):
+    """(intrínseco - precio) / intrínseco, NO_MOS si el intrínseco no es positivo"""
+    intrinsic = np.asarray(intrinsic, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mos = np.where(intrinsic > 0, (intrinsic - price) / intrinsic, NO_MOS)
+    return _scalar_or_array(mos)
@@ -26,6 +26,7 @@ print_error() { echo -e "${RED}✗ ${NC}$1"; }
 PROJECT_ID="tu-project-id"              # Tu Project ID de GCP
 REGION="us-central1"                    # Región de despliegue
 SERVICE_NAME="warren-screener"          # Nombre del servicio
+WORKER_SERVICE_NAME="$SERVICE_NAME-worker"  # Workers del modo por shards (/shard/run)
 BUCKET_NAME="warren-screener-cache"     # Nombre del bucket
 
 # ============================================================================
@@ -124,7 +125,10 @@ echo ""
 print_info "☁️  Paso 4/4: Desplegando en Cloud Run..."
 print_info "Esto puede tardar 1-2 minutos..."
 
-gcloud run deploy $SERVICE_NAME \
+# Workers de shards: una petición por instancia (--concurrency 1) para que
+# cada shard tenga su propia CPU; cada shard debe terminar antes del
+# --timeout (SHARD_TIMEOUT_SECONDS del coordinador = 540s)
+gcloud run deploy $WORKER_SERVICE_NAME \
     --image gcr.io/$PROJECT_ID/$SERVICE_NAME \
     --platform managed \
     --region $REGION \
@@ -132,12 +136,33 @@ gcloud run deploy $SERVICE_NAME \
     --memory 2Gi \
     --timeout 600s \
     --cpu 2 \
+    --concurrency 1 \
     --min-instances 0 \
     --max-instances 10 \
     --set-env-vars GCS_BUCKET_NAME=$BUCKET_NAME \
     --vpc-egress all-traffic \
     --quiet
 
+WORKER_URL=$(gcloud run services describe $WORKER_SERVICE_NAME \
+    --region=$REGION \
+    --format="get(status.url)")
+print_success "Workers de shards: $WORKER_URL"
+
+gcloud run deploy $SERVICE_NAME \
+    --image gcr.io/$PROJECT_ID/$SERVICE_NAME \
+    --platform managed \
+    --region $REGION \
+    --allow-unauthenticated \
+    --memory 2Gi \
+    --timeout 600s \
+    --cpu 2 \
+    --no-cpu-throttling \
+    --min-instances 0 \
+    --max-instances 10 \
+    --set-env-vars GCS_BUCKET_NAME=$BUCKET_NAME,SHARD_WORKER_URL=$WORKER_URL \
+    --vpc-egress all-traffic \
+    --quiet
+
 # ============================================================================
 # RESUMEN FINAL
 # ============================================================================
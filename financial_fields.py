@@ -0,0 +1,130 @@
+"""
+financial_fields.py - Esquema canónico de campos financieros
+Cada estado financiero se normaliza una sola vez a {campo canónico: fila};
+la tabla de alias se compila al importar el módulo y la resolución de
+etiquetas se cachea por conjunto de filas
+"""
+
+from functools import lru_cache
+
+import pandas as pd
+
+# Campos canónicos por estado, con sus alias en orden de preferencia
+# (mismas palabras clave que usaba get_fuzzy_series)
+FIELD_SCHEMA = {
+    'income': {
+        'net_income': ('Net Income', 'NetIncome'),
+        'ebit': ('EBIT', 'Operating Income'),
+    },
+    'balance': {
+        'equity': ('Stockholders Equity', 'Total Equity'),
+        'total_debt': ('Total Debt',),
+        'cash': ('Cash', 'Cash And Cash Equivalents'),
+        'shares': ('Ordinary Shares Number', 'Share Issued'),
+    },
+    'cashflow': {
+        'operating_cash_flow': ('Operating Cash Flow', 'Total Cash From Operating Activities'),
+        'capex': ('Capital Expenditures', 'Purchase of PPE'),
+    },
+}
+
+# Tabla de alias compilada: {kind: ((campo, (alias en minúsculas, ...)), ...)}
+ALIAS_TABLE = {
+    kind: tuple((field, tuple(a.lower().strip() for a in aliases)) for field, aliases in fields.items())
+    for kind, fields in FIELD_SCHEMA.items()
+}
+
+FIELD_KIND = {field: kind for kind, fields in FIELD_SCHEMA.items() for field in fields}
+
+
+def normalize_label(label):
+    return str(label).lower().strip()
+
+
+@lru_cache(maxsize=4096)
+def resolve_labels(kind, labels):
+    """
+    Posición de la fila de cada campo canónico dentro de `labels`
+
+    Misma semántica que la antigua búsqueda fuzzy: etiquetas en minúsculas y
+    sin espacios extremos; por cada alias, primero coincidencia exacta y si no
+    la etiqueta más corta que lo contenga (a igualdad de longitud, la
+    primera). Con etiquetas repetidas gana la primera.
+
+    Args:
+        kind: 'income', 'balance' o 'cashflow'
+        labels: Tupla con las etiquetas de las filas tal cual vienen en el estado
+
+    Returns:
+        {campo: posición}
+    """
+    first = {}
+    for position, label in enumerate(labels):
+        first.setdefault(normalize_label(label), position)
+
+    positions = {}
+    for field, aliases in ALIAS_TABLE[kind]:
+        for alias in aliases:
+            if alias in first:
+                positions[field] = first[alias]
+                break
+            matches = [label for label in first if alias in label]
+            if matches:
+                positions[field] = first[min(matches, key=len)]
+                break
+    return positions
+
+
+class CanonicalFields(dict):
+    """
+    {campo canónico: Series por periodo} de un estado financiero
+
+    Los campos del esquema que el estado no tiene devuelven una Series vacía
+    (como get_fuzzy_series), así el análisis puede seguir usando `.empty`.
+    """
+
+    def __missing__(self, field):
+        if field not in FIELD_KIND:
+            raise KeyError(field)
+        return pd.Series(dtype=float)
+
+
+def normalize_statement(df, kind):
+    """
+    Extrae los campos canónicos de un estado sin modificar el DataFrame
+
+    Args:
+        df: Estado financiero (filas = campos, columnas = periodos)
+        kind: 'income', 'balance' o 'cashflow'
+
+    Returns:
+        CanonicalFields
+    """
+    fields = CanonicalFields()
+    if df is None or df.empty:
+        return fields
+
+    # tolist() evita iterar el Index elemento a elemento (mucho más lento)
+    for field, position in resolve_labels(kind, tuple(df.index.tolist())).items():
+        fields[field] = df.iloc[position]
+    return fields
+
+
+def latest_period(fields):
+    """
+    Último periodo fiscal de unos campos canónicos
+
+    Returns:
+        'YYYY-MM-DD' o None si ningún campo tiene periodos con fecha
+    """
+    latest = None
+    for series in fields.values():
+        if not len(series):
+            continue
+        try:
+            period = pd.Timestamp(series.index.max())
+        except (TypeError, ValueError):
+            continue
+        if not pd.isna(period) and (latest is None or period > latest):
+            latest = period
+    return latest.date().isoformat() if latest is not None else None
@@ -0,0 +1,183 @@
+"""
+fundamentals_store.py - Almacén local de estados financieros
+Guarda income_stmt, balance_sheet y cashflow por ticker en Parquet
+y solo vuelve a descargarlos cuando puede existir un nuevo año fiscal
+"""
+
+import os
+import json
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (motor Parquet de pandas)
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+STATEMENT_KINDS = ('income', 'balance', 'cashflow')
+
+
+class FundamentalsStore:
+    """
+    Almacén columnar de fundamentales por ticker y periodo fiscal
+
+    Estructura en disco:
+        <base_dir>/<TICKER>/<kind>.parquet  -> una fila por periodo fiscal
+        <base_dir>/<TICKER>/meta.json       -> fecha de descarga y último periodo
+    """
+
+    def __init__(self, base_dir, fiscal_period_days=365, filing_lag_days=75, recheck_days=7):
+        """
+        Args:
+            base_dir: Directorio raíz del almacén
+            fiscal_period_days: Duración de un periodo fiscal (anual)
+            filing_lag_days: Días que tarda en publicarse un 10-K tras el cierre
+            recheck_days: Cada cuánto reintentar si el nuevo periodo aún no aparece
+        """
+        self.base_dir = base_dir
+        self.fiscal_period_days = fiscal_period_days
+        self.filing_lag_days = filing_lag_days
+        self.recheck_days = recheck_days
+        self._lock = threading.Lock()
+        os.makedirs(base_dir, exist_ok=True)
+
+    # -------- Rutas --------
+    def _ticker_dir(self, ticker):
+        return os.path.join(self.base_dir, ticker.upper())
+
+    def _statement_path(self, ticker, kind):
+        return os.path.join(self._ticker_dir(ticker), f"{kind}.parquet")
+
+    def _meta_path(self, ticker):
+        return os.path.join(self._ticker_dir(ticker), "meta.json")
+
+    # -------- Metadata --------
+    def load_meta(self, ticker):
+        """Devuelve la metadata del ticker ({kind: {fetched_at, latest_period}})"""
+        try:
+            with open(self._meta_path(ticker)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, ticker, meta):
+        path = self._meta_path(ticker)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, path)
+
+    def latest_period(self, ticker, kind='income'):
+        """Último periodo fiscal almacenado (Timestamp) o None"""
+        entry = self.load_meta(ticker).get(kind) or {}
+        if not entry.get('latest_period'):
+            return None
+        return pd.Timestamp(entry['latest_period'])
+
+    def needs_refresh(self, ticker, kind, now=None):
+        """
+        Indica si hay que volver a descargar un estado financiero
+
+        Solo se refresca si ya pasó el cierre del siguiente año fiscal más el
+        plazo de publicación, y como mucho una vez cada `recheck_days` mientras
+        el nuevo periodo no aparezca en Yahoo.
+        """
+        now = now or datetime.now()
+        entry = self.load_meta(ticker).get(kind)
+        if not entry:
+            return True
+
+        fetched_at = datetime.fromisoformat(entry['fetched_at'])
+        recently_checked = now - fetched_at < timedelta(days=self.recheck_days)
+
+        if not entry.get('latest_period'):
+            # Estado vacío: reintentar solo tras el periodo de espera
+            return not recently_checked
+
+        latest = datetime.fromisoformat(entry['latest_period'])
+        next_expected = latest + timedelta(days=self.fiscal_period_days + self.filing_lag_days)
+        if now < next_expected:
+            return False
+        return not recently_checked
+
+    # -------- Lectura / escritura --------
+    def load(self, ticker, kind):
+        """
+        Devuelve el estado financiero almacenado con el mismo formato de yfinance
+        (filas = campos, columnas = periodos) o None si hay que descargarlo
+        """
+        if self.needs_refresh(ticker, kind):
+            return None
+
+        entry = self.load_meta(ticker).get(kind) or {}
+        if not entry.get('latest_period'):
+            return pd.DataFrame()
+
+        try:
+            stored = pd.read_parquet(self._statement_path(ticker, kind))
+        except Exception:
+            return None
+
+        # En disco: filas = periodos fiscales, columnas = campos
+        return stored.T
+
+    def load_history(self, ticker, kind):
+        """
+        Todos los periodos almacenados de un estado, sin mirar si está al día
+        (backtests point-in-time)
+
+        Returns:
+            DataFrame filas = periodos fiscales (más reciente primero),
+            columnas = campos; o None si no hay nada guardado
+        """
+        try:
+            return pd.read_parquet(self._statement_path(ticker, kind))
+        except Exception:
+            return None
+
+    def save(self, ticker, kind, df):
+        """
+        Guarda un estado financiero descargado y actualiza la metadata
+
+        Los periodos antiguos que Yahoo ya no devuelve (solo da ~4 años) se
+        conservan para construir historia multi-año; solo se mantienen los
+        campos de la descarga actual y, si un periodo se repite, gana el nuevo.
+        """
+        if kind not in STATEMENT_KINDS:
+            raise ValueError(f"Tipo de estado no válido: {kind}")
+
+        latest = None
+        with self._lock:
+            os.makedirs(self._ticker_dir(ticker), exist_ok=True)
+
+            if df is not None and not df.empty:
+                by_period = df.T.copy()
+                by_period.index = pd.to_datetime(by_period.index)
+                by_period.index.name = 'period'
+                by_period.columns = [str(c) for c in by_period.columns]
+                if not (by_period.dtypes == 'float64').all():
+                    # Columna a columna solo si hace falta (yfinance suele devolver float64)
+                    by_period = by_period.apply(pd.to_numeric, errors='coerce')
+
+                previous = self.load_history(ticker, kind)
+                if previous is not None and not previous.empty:
+                    older = previous.loc[~previous.index.isin(by_period.index)]
+                    older = older.reindex(columns=by_period.columns)
+                    if not older.empty:
+                        by_period = pd.concat([by_period, older]).sort_index(ascending=False)
+
+                path = self._statement_path(ticker, kind)
+                tmp_path = f"{path}.tmp"
+                by_period.to_parquet(tmp_path)
+                os.replace(tmp_path, path)
+                latest = by_period.index.max().isoformat()
+
+            meta = self.load_meta(ticker)
+            meta[kind] = {
+                'fetched_at': datetime.now().isoformat(),
+                'latest_period': latest
+            }
+            self._write_meta(ticker, meta)
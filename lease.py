@@ -0,0 +1,140 @@
+"""
+lease.py - Lease distribuido sobre un objeto del bucket (GCS o LocalBucket)
+Exclusión mutua entre instancias con precondiciones de generación: el lease
+se crea con if_generation_match=0 (solo si no existe), se renueva con un
+heartbeat condicionado a la generación propia y caduca solo si su dueño deja
+de renovarlo (instancia muerta o bloqueada), en cuyo caso otra lo toma
+"""
+
+import os
+import json
+import uuid
+import socket
+import threading
+from datetime import datetime, timedelta
+
+from local_bucket import NotFound, PreconditionFailed
+
+
+def default_owner():
+    """Identificador de esta instancia y proceso (para logs y /cache-status)"""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class BlobLease:
+    """
+    Lease con caducidad sobre el objeto `name`
+
+    acquire() -> bool; mientras se tiene, heartbeat() lo renueva en un hilo
+    de fondo; release() lo borra solo si sigue siendo nuestro. Si otra
+    instancia lo toma (porque el nuestro caducó), `lost` pasa a True.
+
+    Args:
+        bucket: Bucket de GCS o LocalBucket
+        name: Objeto del lease
+        ttl_seconds: Caducidad sin renovar
+        heartbeat_seconds: Intervalo de renovación (bastante menor que el TTL)
+        owner: Identificador del dueño (por defecto host-pid-aleatorio)
+    """
+
+    def __init__(self, bucket, name, ttl_seconds=300, heartbeat_seconds=60, owner=None):
+        self.bucket = bucket
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.owner = owner or default_owner()
+        self.generation = None
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _body(self, now):
+        return json.dumps({
+            'owner': self.owner,
+            'acquired_at': now.isoformat(),
+            'expires_at': (now + timedelta(seconds=self.ttl_seconds)).isoformat()
+        })
+
+    def _write(self, if_generation_match):
+        blob = self.bucket.blob(self.name)
+        blob.upload_from_string(self._body(datetime.now()), content_type='application/json',
+                                if_generation_match=if_generation_match)
+        self.generation = blob.generation
+
+    def holder(self):
+        """Contenido del lease vigente ({'owner', 'acquired_at', 'expires_at', 'generation'}) o None"""
+        blob = self.bucket.get_blob(self.name)
+        if blob is None:
+            return None
+        try:
+            info = json.loads(blob.download_as_bytes())
+        except NotFound:
+            return None
+        except ValueError:
+            info = {}  # Ilegible: se trata como caducado
+        info['generation'] = blob.generation
+        return info
+
+    def acquire(self):
+        """
+        Intenta tomar el lease
+
+        Returns:
+            True si ahora es nuestro, False si otra instancia lo tiene vigente
+        """
+        try:
+            self._write(if_generation_match=0)
+        except PreconditionFailed:
+            current = self.holder()
+            if current is None:
+                return self.acquire()  # Se liberó entre medias
+            expires_at = current.get('expires_at')
+            if expires_at and datetime.fromisoformat(expires_at) > datetime.now():
+                return False
+            try:
+                # Caducado: se toma solo si nadie lo ha renovado o tomado desde que se leyó
+                self._write(if_generation_match=current['generation'])
+            except (PreconditionFailed, NotFound):
+                return False
+        self.lost = False
+        return True
+
+    def renew(self):
+        """Renueva el lease; False (y lost=True) si ya no es nuestro"""
+        try:
+            self._write(if_generation_match=self.generation)
+            return True
+        except (PreconditionFailed, NotFound):
+            self.lost = True
+            return False
+
+    def _beat(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            if not self.renew():
+                return
+
+    def start_heartbeat(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._beat, name=f"lease-{self.name}", daemon=True)
+        self._thread.start()
+
+    def release(self):
+        """Detiene el heartbeat y borra el lease si sigue siendo nuestro"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.lost or self.generation is None:
+            return
+        try:
+            self.bucket.blob(self.name).delete(if_generation_match=self.generation)
+        except (PreconditionFailed, NotFound):
+            pass
+        self.generation = None
+
+    def __enter__(self):
+        self.start_heartbeat()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
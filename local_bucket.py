@@ -0,0 +1,200 @@
+"""
+local_bucket.py - Sustituto en disco de un bucket de Cloud Storage
+Implementa el subconjunto de la API de google.cloud.storage que usa el
+screener (bucket.blob / get_blob, blob.exists / upload / download / delete,
+generation, metadata, precondiciones if_generation_match) para ejecutar en
+local el caché, el modo por shards y el lease de refresco sin GCS. La
+metadata de cada objeto vive en <base_dir>/.metadata/<name>.json
+"""
+
+import os
+import json
+import time
+import fcntl
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    from google.api_core.exceptions import NotFound, PreconditionFailed
+except ImportError:  # Sin google-cloud-storage: mismas excepciones para los llamantes
+    class NotFound(Exception):
+        pass
+
+    class PreconditionFailed(Exception):
+        pass
+
+METADATA_DIR = '.metadata'
+
+
+class ObjectNotFound(NotFound, FileNotFoundError):
+    """Objeto inexistente: NotFound como en GCS y FileNotFoundError para el código local"""
+
+
+class LocalBlob:
+    """Objeto del bucket local: un fichero bajo <base_dir>/<name>"""
+
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.content_type = None
+        self.generation = None  # Como en GCS: se rellena con reload / get_blob / upload
+        self.metadata = None    # Metadata personalizada: se asigna antes de subir
+
+    @property
+    def path(self):
+        return os.path.join(self.bucket.base_dir, self.name)
+
+    @property
+    def metadata_path(self):
+        return os.path.join(self.bucket.base_dir, METADATA_DIR, f"{self.name}.json")
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def reload(self):
+        try:
+            self.generation = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            raise ObjectNotFound(f"No existe el objeto {self.name}")
+        self.metadata = self._read_metadata()
+
+    def _read_metadata(self):
+        """Metadata de la generación actual (None si es de otra escritura)"""
+        try:
+            with open(self.metadata_path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry['metadata'] if entry.get('generation') == self.generation else None
+
+    @property
+    def size(self):
+        return os.path.getsize(self.path) if self.exists() else None
+
+    @property
+    def updated(self):
+        if not self.exists():
+            return None
+        return datetime.fromtimestamp(os.path.getmtime(self.path), tz=timezone.utc)
+
+    def _current_generation(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    @contextmanager
+    def _precondition(self, if_generation_match):
+        """
+        Comprueba if_generation_match (0 = el objeto no debe existir) y retiene
+        un flock sobre el objeto hasta terminar la escritura, como la
+        comparación y escritura atómicas de GCS. Sin precondición no bloquea.
+        """
+        if if_generation_match is None:
+            yield self._current_generation()
+            return
+        lock_path = os.path.join(self.bucket.base_dir, METADATA_DIR, f"{self.name}.lock")
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        with open(lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                current = self._current_generation()
+                if current != if_generation_match:
+                    raise PreconditionFailed(
+                        f"{self.name}: generación {current}, se esperaba {if_generation_match}")
+                yield current
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def upload_from_string(self, data, content_type=None, if_generation_match=None):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._precondition(if_generation_match) as previous:
+            # Generación = mtime en ns, estrictamente creciente aunque el reloj del
+            # sistema de ficheros sea grueso y dos escrituras caigan en el mismo tick
+            generation = max(time.time_ns(), previous + 1)
+            # Escritura atómica: un lector nunca ve un objeto a medias
+            tmp_path = f"{self.path}.tmp-{os.getpid()}-{threading.get_ident()}"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.utime(tmp_path, ns=(generation, generation))
+            if self.metadata is not None:
+                # Ligada a la generación: un lector que vea el contenido anterior la ignora
+                self._write_metadata(generation)
+            os.replace(tmp_path, self.path)
+        self.generation = generation
+        self.content_type = content_type
+
+    def _write_metadata(self, generation):
+        os.makedirs(os.path.dirname(self.metadata_path), exist_ok=True)
+        tmp_path = f"{self.metadata_path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp_path, 'w') as f:
+            json.dump({'generation': generation,
+                       'metadata': {k: str(v) for k, v in self.metadata.items()}}, f)
+        os.replace(tmp_path, self.metadata_path)
+
+    def download_as_bytes(self):
+        try:
+            with open(self.path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            raise ObjectNotFound(f"No existe el objeto {self.name}")
+
+    def download_as_string(self):
+        return self.download_as_bytes()
+
+    def download_as_text(self, encoding='utf-8'):
+        return self.download_as_bytes().decode(encoding)
+
+    def delete(self, if_generation_match=None):
+        if if_generation_match is not None and not self.exists():
+            raise ObjectNotFound(f"No existe el objeto {self.name}")
+        with self._precondition(if_generation_match):
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                raise ObjectNotFound(f"No existe el objeto {self.name}")
+        try:
+            os.remove(self.metadata_path)
+        except FileNotFoundError:
+            pass
+
+
+class LocalBucket:
+    """
+    Bucket en el sistema de ficheros (varios procesos pueden compartirlo)
+    """
+
+    def __init__(self, base_dir):
+        self.base_dir = base_dir
+        self.name = f"local:{base_dir}"
+        os.makedirs(base_dir, exist_ok=True)
+
+    def blob(self, name):
+        return LocalBlob(self, name)
+
+    def get_blob(self, name):
+        """Objeto con su generación actual, o None si no existe (como Bucket.get_blob)"""
+        blob = LocalBlob(self, name)
+        try:
+            blob.reload()
+        except FileNotFoundError:
+            return None
+        return blob
+
+    def list_blobs(self, prefix=''):
+        """Objetos cuyo nombre empieza por `prefix`, en orden alfabético"""
+        names = []
+        for root, dirs, files in os.walk(self.base_dir):
+            if root == self.base_dir and METADATA_DIR in dirs:
+                dirs.remove(METADATA_DIR)
+            for filename in files:
+                if '.tmp-' in filename:
+                    continue
+                name = os.path.relpath(os.path.join(root, filename), self.base_dir)
+                name = name.replace(os.sep, '/')
+                if name.startswith(prefix):
+                    names.append(name)
+        return [LocalBlob(self, name) for name in sorted(names)]
@@ -6,8 +6,6 @@
 
 import pandas as pd
 import numpy as np
-import yfinance as yf
-import requests
 import io
 import sys
 import time
@@ -18,7 +16,30 @@ from datetime import datetime, timedelta
 from tqdm.auto import tqdm
 from flask import Flask, jsonify, request
 from google.cloud import storage
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from market_data import get_provider
+from concurrency import AdaptiveConcurrencyController
+from ticker_metadata import get_metadata_index
+from local_bucket import LocalBucket, PreconditionFailed
+from result_cache import TieredBlobCache
+import cache_codec
+from refresh import SingleFlight
+from lease import BlobLease
+from sharding import ShardStore, split_shards, merge_partials, dispatch_in_background
+from universe_snapshot import (UniverseSnapshotStore, fetch_source, build_ticker_list,
+                               snapshot_hash, snapshot_summary, UNIVERSE_DIR,
+                               UNIVERSE_MAX_TICKERS, BACKUP, FAILED)
+from ticker_data import (LazyTickerData, StatementDeferred, merge_calls, summarize_calls,
+                         NETWORK, ASYNC)
+from pipeline import PipelineExecutor
+from financial_fields import latest_period
+from valuation_engine import FundamentalsBatch, ScreenInputs, screen_quality, value_batch, records, PENDING
+from sensitivity import (DEFAULT_GRID, MAX_GRID_POINTS, parse_axis, split_inputs,
+                         sensitivity_grid, summarize_grid, to_json_lists)
+import monte_carlo
+from dcf import margin_of_safety, TERMINAL_GROWTH
+from outcomes import (AnalysisOutcome, run_with_retries, STATUSES, OK, NO_DATA,
+                      TRANSIENT_ERROR, THROTTLED)
 
 # Post-processor
 try:
@@ -44,6 +65,22 @@ except ImportError:
     PORTFOLIO_TRACKER_AVAILABLE = False
     print("⚠️  Portfolio Tracker no disponible")
 
+# Almacén local de fundamentales
+try:
+    from fundamentals_store import FundamentalsStore, PARQUET_AVAILABLE
+    FUNDAMENTALS_STORE_AVAILABLE = PARQUET_AVAILABLE
+except ImportError:
+    FUNDAMENTALS_STORE_AVAILABLE = False
+if not FUNDAMENTALS_STORE_AVAILABLE:
+    print("⚠️  Almacén de fundamentales no disponible (requiere pyarrow)")
+
+# Motor asyncio de descarga
+try:
+    from async_fetch import AsyncStatementFetcher, AIOHTTP_AVAILABLE
+    ASYNC_FETCH_AVAILABLE = AIOHTTP_AVAILABLE
+except ImportError:
+    ASYNC_FETCH_AVAILABLE = False
+
 # Silencio de logs ruidosos
 logging.getLogger("yfinance").setLevel(logging.CRITICAL)
 logging.getLogger("urllib3").setLevel(logging.WARNING)
@@ -51,12 +88,20 @@ logging.getLogger("urllib3").setLevel(logging.WARNING)
 # -------- Configuración de Cloud Storage --------
 GCS_BUCKET_NAME = os.environ.get("GCS_BUCKET_NAME", "warren-screener-cache")
 CACHE_FILE_NAME = "screener_results.json"
+SCREEN_INPUTS_FILE_NAME = "screener_inputs.json"  # Entradas del motor previas a los filtros
 CACHE_TTL_HOURS = 24
 
+# Bucket en disco para ejecutar caché y shards en local (sustituye a GCS)
+LOCAL_BUCKET_DIR = os.environ.get("LOCAL_BUCKET_DIR")
+
 # Inicializar cliente de Cloud Storage
 try:
-    storage_client = storage.Client()
-    bucket = storage_client.bucket(GCS_BUCKET_NAME)
+    if LOCAL_BUCKET_DIR:
+        bucket = LocalBucket(LOCAL_BUCKET_DIR)
+        GCS_BUCKET_NAME = bucket.name
+    else:
+        storage_client = storage.Client()
+        bucket = storage_client.bucket(GCS_BUCKET_NAME)
     GCS_AVAILABLE = True
     print(f"✓ Cloud Storage conectado al bucket: {GCS_BUCKET_NAME}")
 except Exception as e:
@@ -64,17 +109,82 @@ except Exception as e:
     GCS_AVAILABLE = False
     bucket = None
 
+# -------- Caché de lectura por capas (memoria -> disco -> bucket) --------
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", "/tmp/warren_result_cache")
+RESULT_CACHE_REVALIDATE_SECONDS = 5  # Memoria sin consultar la generación del blob
+
+def _tiered_cache(name):
+    return TieredBlobCache(bucket, name, RESULT_CACHE_DIR, RESULT_CACHE_REVALIDATE_SECONDS,
+                           decode=cache_codec.decode)
+
+results_cache = _tiered_cache(CACHE_FILE_NAME) if GCS_AVAILABLE else None
+inputs_cache = _tiered_cache(SCREEN_INPUTS_FILE_NAME) if GCS_AVAILABLE else None
+
+# -------- Almacén local de fundamentales --------
+FUNDAMENTALS_DIR = os.environ.get("FUNDAMENTALS_DIR", "/tmp/warren_fundamentals")
+FISCAL_PERIOD_DAYS = 365  # Ejercicio anual
+FILING_LAG_DAYS = 75      # Plazo de publicación del 10-K tras el cierre
+
+try:
+    fundamentals_store = FundamentalsStore(
+        FUNDAMENTALS_DIR, fiscal_period_days=FISCAL_PERIOD_DAYS, filing_lag_days=FILING_LAG_DAYS
+    ) if FUNDAMENTALS_STORE_AVAILABLE else None
+except Exception as e:
+    print(f"⚠ Almacén de fundamentales no disponible: {e}")
+    fundamentals_store = None
+
+# -------- Snapshots del universo --------
+universe_store = UniverseSnapshotStore(UNIVERSE_DIR, bucket=bucket if GCS_AVAILABLE else None)
+
+# -------- Modo por shards --------
+# URL base de los workers (el propio servicio en Cloud Run); sin ella el
+# coordinador solo publica el plan y los shards se lanzan desde fuera
+SHARD_WORKER_URL = os.environ.get("SHARD_WORKER_URL")
+shard_store = ShardStore(bucket) if GCS_AVAILABLE else None
+
 # ==========================================
 # ⚙️ PARÁMETROS DE CAZA (AJUSTADOS)
 # ==========================================
 CONFIG = {
-    'MAX_WORKERS': 12,
+    'MAX_WORKERS': 12,                # Concurrencia inicial (se adapta con AIMD)
+    'MIN_WORKERS': 2,
+    'MAX_WORKERS_CEILING': 48,
+    'TARGET_LATENCY_SECONDS': 4.0,    # Latencia media aceptable por análisis
+    'FETCH_MODE': 'threads',          # 'threads', 'async' (aiohttp) o 'pipeline' (I/O -> cola -> CPU)
+    'PIPELINE_QUEUE_SIZE': 64,        # Descargas en espera de la etapa de CPU (modo pipeline)
+    'ASYNC_MAX_CONNECTIONS': 200,     # Pool keep-alive compartido
+    'ASYNC_CONNECTIONS_PER_HOST': 50,
+    'MAX_RETRIES': 2,                 # Reintentos por error transitorio
+    'RETRY_BACKOFF_SECONDS': 1.0,     # Base del backoff exponencial con jitter
+    'THROTTLE_SWEEP_DELAY': 15,       # Espera antes del barrido de tickers throttled
+    'MAX_UNRESOLVED_RATIO': 0.05,     # Por encima de esto el run no se cachea
+    'SHARDS': 8,                      # Shards por defecto del modo distribuido
+    'SHARD_TIMEOUT_SECONDS': 540,     # Timeout de cada shard (< --timeout 600s de los workers)
+    'INCREMENTAL': False,             # Reutilizar del run anterior los tickers sin cambios
+    'INCREMENTAL_MAX_AGE_HOURS': 7 * 24,  # Antigüedad máxima de las entradas reutilizables
+    'STALE_WHILE_REVALIDATE': True,   # Servir el caché expirado mientras se refresca en segundo plano
+    'STALE_MAX_AGE_HOURS': 7 * 24,    # Más antiguo que esto no se sirve: análisis en primer plano
+    'REFRESH_LEASE_SECONDS': 300,     # Caducidad del lease de análisis entre instancias sin heartbeat
+    'REFRESH_LEASE_HEARTBEAT_SECONDS': 60,
+    'REFRESH_LEASE_POLL_SECONDS': 5,  # Espera entre comprobaciones mientras analiza otra instancia
+    'MONTE_CARLO_SAMPLES': 10_000,    # Muestras por ticker de /monte-carlo
+    'MONTE_CARLO_MAX_SAMPLES': 100_000,
+    'MIN_MARKET_CAP': 5_000_000_000,  # Solo > 5B Cap
     'MIN_ROIC': 0.08,           # 8% mínimo
     'MIN_PIOTROSKI': 5,         # Calidad mínima
     'DISCOUNT_RATE': 0.09,      # Tasa exigida del 9%
     'MARGIN_OF_SAFETY_VIEW': -0.20  # Watchlist hasta -20%
 }
 
+FETCH_MODES = ('threads', 'async', 'pipeline')
+
+# Un único análisis completo en curso por proceso: las peticiones concurrentes
+# (y el refresco en segundo plano del caché caducado) comparten el mismo
+ANALYSIS_FLIGHT = 'analysis'
+refresher = SingleFlight()
+# Entre instancias: lease en el bucket (ver _leased_analysis)
+REFRESH_LEASE_NAME = "locks/screener_analysis.lease"
+
 def log(msg):
     print(msg)
     sys.stdout.flush()
@@ -85,382 +195,1013 @@ def get_cached_results():
     if not GCS_AVAILABLE:
         log("⚠ Cloud Storage no disponible, ejecutando sin caché")
         return None
-    
-    try:
-        blob = bucket.blob(CACHE_FILE_NAME)
-        
-        if not blob.exists():
-            log("⚠ No hay datos en caché, ejecutando análisis completo")
-            return None
-        
-        cache_content = blob.download_as_string()
-        data = json.loads(cache_content)
-        
-        if "results" not in data or "cached_at" not in data:
-            log("⚠ Caché corrupto, regenerando datos...")
-            blob.delete()
-            return None
-        
-        cache_time = datetime.fromisoformat(data.get("cached_at", ""))
-        time_diff = datetime.now() - cache_time
-        
-        if time_diff < timedelta(hours=CACHE_TTL_HOURS):
-            hours_ago = round(time_diff.total_seconds() / 3600, 1)
-            log(f"✓ Usando datos del caché (generados hace {hours_ago} horas)")
-            return data["results"]
-        else:
-            log(f"⚠ Caché expirado (más de {CACHE_TTL_HOURS}h), regenerando datos...")
-            blob.delete()
-            return None
-            
-    except Exception as e:
-        log(f"⚠ Error leyendo caché: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
+    return _read_cached_results(log)
 
-def get_full_cached_data():
+def get_full_cached_data(source=None):
     """
     Obtiene el objeto completo del caché (no solo results)
     Usado por /refine para tener acceso a todos los datos del análisis
+
+    Args:
+        source: Dict opcional que recibe la generación leída ('generation'),
+                para escribir después con if_generation_match
     """
     if not GCS_AVAILABLE:
         return None
-    
+    return _read_cached_results(lambda msg: None, source)
+
+def _read_cached_results(say, source=None):
+    """
+    Resultado cacheado (copia superficial) o None
+
+    Dentro del TTL se sirve tal cual. Expirado, con STALE_WHILE_REVALIDATE y
+    sin superar STALE_MAX_AGE_HOURS, se sirve marcado como `stale` y se lanza
+    un único refresco en segundo plano por proceso; si no, se borra.
+
+    Args:
+        say: Función de log (get_full_cached_data es silencioso)
+        source: Dict opcional que recibe la generación del objeto leído
+    """
     try:
-        blob = bucket.blob(CACHE_FILE_NAME)
+        try:
+            manifest = get_cache_manifest()
+        except (KeyError, ValueError, TypeError):
+            manifest = {}
         
-        if not blob.exists():
+        if manifest is None:
+            say("⚠ No hay datos en caché, ejecutando análisis completo")
             return None
         
-        cache_content = blob.download_as_string()
-        data = json.loads(cache_content)
+        if not manifest:
+            say("⚠ Caché corrupto, regenerando datos...")
+            _delete_cached_results()
+            return None
         
-        if "results" not in data or "cached_at" not in data:
-            blob.delete()
+        # El TTL se decide con el manifest: un caché expirado no se descarga
+        age = datetime.now() - manifest['cached_at']
+        stale = age >= timedelta(hours=CACHE_TTL_HOURS)
+        if stale and not (CONFIG['STALE_WHILE_REVALIDATE']
+                          and age < timedelta(hours=CONFIG['STALE_MAX_AGE_HOURS'])):
+            say(f"⚠ Caché expirado (más de {CACHE_TTL_HOURS}h), regenerando datos...")
+            _delete_cached_results()
             return None
         
-        cache_time = datetime.fromisoformat(data.get("cached_at", ""))
-        time_diff = datetime.now() - cache_time
+        data, info = results_cache.get()
+        if data is None or "results" not in data:
+            say("⚠ Caché corrupto, regenerando datos...")
+            _delete_cached_results()
+            return None
         
-        if time_diff < timedelta(hours=CACHE_TTL_HOURS):
-            # Retornar el objeto completo con metadata
-            return data["results"]
+        # Copia superficial: el objeto en memoria se comparte entre peticiones
+        results = dict(data["results"])
+        if source is not None:
+            source['generation'] = info['generation']
+        hours_ago = round(age.total_seconds() / 3600, 1)
+        if stale:
+            started = start_background_refresh()
+            say(f"⏳ Caché expirado (generado hace {hours_ago} horas): se sirve caducado, "
+                f"refresco en segundo plano {'iniciado' if started else 'ya en curso'}")
+            results['stale'] = True
+            results['refresh'] = refresher.status(ANALYSIS_FLIGHT)
         else:
-            blob.delete()
-            return None
+            say(f"✓ Usando datos del caché (generados hace {hours_ago} horas, desde {info['tier']})")
+        return results
             
     except Exception as e:
+        say(f"⚠ Error leyendo caché: {e}")
+        return None
+
+def cache_manifest(cache_data):
+    """
+    Manifest del caché de resultados: lo que necesitan el TTL, /cache-status
+    y /health. Se sube como metadata del propio objeto (misma escritura
+    atómica que el contenido), así que leerlo no descarga el JSON
+    """
+    results = cache_data["results"]
+    return {
+        "cached_at": cache_data["cached_at"],
+        "expires_at": cache_data["expires_at"],
+        "generated_at": str(results.get("generated_at", "")),
+        "total_analyzed": str(results.get("total_analyzed", 0)),
+        "candidates_count": str(results.get("candidates_count", 0))
+    }
+
+def get_cache_manifest():
+    """
+    Manifest del caché de resultados sin descargar el contenido
+
+    Returns:
+        Dict con cached_at / expires_at (datetime), generated_at,
+        total_analyzed, candidates_count, codec, generation y size; None
+        si no hay caché
+
+    Raises:
+        KeyError / ValueError si el objeto está corrupto
+    """
+    metadata, info = results_cache.head()
+    if metadata is None:
         return None
+    if "expires_at" not in metadata:
+        # Objeto escrito sin manifest (versiones anteriores): se lee el contenido
+        data, info = results_cache.get()
+        if data is None:
+            return None
+        metadata = cache_manifest(data)
+    return {
+        "cached_at": datetime.fromisoformat(metadata["cached_at"]),
+        "expires_at": datetime.fromisoformat(metadata["expires_at"]),
+        "generated_at": metadata.get("generated_at") or None,
+        "total_analyzed": int(metadata.get("total_analyzed", 0)),
+        "candidates_count": int(metadata.get("candidates_count", 0)),
+        "codec": metadata.get("codec", "json"),
+        "generation": info["generation"],
+        "size": info["size"]
+    }
+
+def _delete_cached_results():
+    """Borra el blob de resultados y sus copias locales"""
+    blob = bucket.blob(CACHE_FILE_NAME)
+    if blob.exists():
+        blob.delete()
+    results_cache.invalidate()
+
+def save_to_cache(results, cached_at=None, if_generation_match=None):
+    """
+    Guarda resultados en Cloud Storage
 
-def save_to_cache(results):
-    """Guarda resultados en Cloud Storage"""
+    Args:
+        cached_at: Inicio del TTL (por defecto ahora); /revalue conserva el del
+                   análisis completo para no retrasar su renovación diaria
+        if_generation_match: Escribir solo si el objeto sigue en esa
+                             generación (/revalue: la que leyó)
+
+    Raises:
+        PreconditionFailed si se pasó if_generation_match y el objeto cambió
+    """
     if not GCS_AVAILABLE:
         log("⚠ Cloud Storage no disponible, no se guardará caché")
         return False
     
     try:
+        cached_at = cached_at or datetime.now()
         cache_data = {
             "results": results,
-            "cached_at": datetime.now().isoformat(),
-            "expires_at": (datetime.now() + timedelta(hours=CACHE_TTL_HOURS)).isoformat()
+            "cached_at": cached_at.isoformat(),
+            "expires_at": (cached_at + timedelta(hours=CACHE_TTL_HOURS)).isoformat()
         }
         
         blob = bucket.blob(CACHE_FILE_NAME)
-        json_string = json.dumps(cache_data, default=str, allow_nan=False)
-        json_string = json_string.replace('NaN', 'null').replace('Infinity', 'null').replace('-Infinity', 'null')
+        # JSON compacto (NaN / Infinity -> null) comprimido y versionado
+        json_string = cache_codec.dumps(cache_data)
+        content = cache_codec.compress(json_string)
         
-        blob.upload_from_string(json_string, content_type='application/json')
-        log(f"✓ Resultados guardados en caché por {CACHE_TTL_HOURS} horas")
+        blob.metadata = dict(cache_manifest(cache_data), codec=cache_codec.describe(content))
+        blob.upload_from_string(content, content_type=cache_codec.CONTENT_TYPE,
+                                if_generation_match=if_generation_match)
+        # Lo que leerá cualquier instancia: el JSON ya serializado (default=str incluido)
+        results_cache.put(json.loads(json_string), content, blob.generation, blob.metadata)
+        log(f"✓ Resultados guardados en caché por {CACHE_TTL_HOURS} horas "
+            f"({len(content) / 1024:.0f} KB {blob.metadata['codec']})")
         return True
         
+    except PreconditionFailed:
+        log("⚠ El caché cambió desde que se leyó: no se sobrescribe")
+        raise
     except Exception as e:
         log(f"⚠ Error guardando en caché: {e}")
         import traceback
         traceback.print_exc()
         return False
 
+def save_screen_inputs(payload):
+    """Guarda en Cloud Storage las entradas del motor (ver screen_inputs_payload)"""
+    if not GCS_AVAILABLE:
+        return False
+    
+    try:
+        blob = bucket.blob(SCREEN_INPUTS_FILE_NAME)
+        json_string = cache_codec.dumps(payload)
+        content = cache_codec.compress(json_string)
+        blob.metadata = {"generated_at": payload["generated_at"], "codec": cache_codec.describe(content)}
+        blob.upload_from_string(content, content_type=cache_codec.CONTENT_TYPE)
+        inputs_cache.put(json.loads(json_string), content, blob.generation, blob.metadata)
+        log(f"✓ Entradas del screener guardadas ({len(payload['inputs']['batch']['tickers'])} tickers)")
+        return True
+    except Exception as e:
+        log(f"⚠ Error guardando entradas del screener: {e}")
+        return False
+
+def get_cached_screen_inputs(max_age_hours=CACHE_TTL_HOURS):
+    """
+    Entradas del motor del último run cacheado, o None si no hay o caducaron
+
+    Args:
+        max_age_hours: Antigüedad máxima (los runs incrementales aceptan
+                       entradas de más de un día)
+    """
+    if not GCS_AVAILABLE:
+        return None
+    
+    try:
+        metadata, _ = inputs_cache.head()
+        if metadata is None:
+            return None
+        # La caducidad se decide con la metadata del objeto, antes de descargarlo
+        payload = None
+        generated_at = metadata.get('generated_at')
+        if not generated_at:
+            # Objeto escrito sin metadata (versiones anteriores)
+            payload, _ = inputs_cache.get()
+            if payload is None:
+                return None
+            generated_at = payload['generated_at']
+        age = datetime.now() - datetime.fromisoformat(generated_at)
+        if age >= timedelta(hours=max_age_hours):
+            log(f"⚠ Entradas del screener caducadas (más de {max_age_hours}h)")
+            return None
+        if payload is None:
+            payload, _ = inputs_cache.get()
+        return payload
+    except Exception as e:
+        log(f"⚠ Error leyendo entradas del screener: {e}")
+        return None
+
 # ==========================================
 # 1. UNIVERSO INDESTRUCTIBLE (CSV + HARDCODE)
 # ==========================================
-def get_bulletproof_universe():
-    tickers = set()
+# Lista de Respaldo MANUAL COMPLETA
+# Lista actualizada con TODOS los tickers que aparecen en Colab
+BACKUP_LIST = [
+    # Originales (90 tickers)
+    'AAPL', 'MSFT', 'GOOGL', 'AMZN', 'NVDA', 'META', 'TSLA', 'BRK-B', 'LLY', 'V',
+    'TSM', 'UNH', 'AVGO', 'JPM', 'NVO', 'WMT', 'XOM', 'MA', 'JNJ', 'PG',
+    'HD', 'MRK', 'COST', 'ABBV', 'ORCL', 'ASML', 'CVX', 'ADBE', 'AMD', 'KO',
+    'PEP', 'CRM', 'BAC', 'ACN', 'CSCO', 'NFLX', 'MCD', 'LIN', 'AZN', 'NKE',
+    'DIS', 'TMUS', 'ABT', 'DHR', 'WFC', 'INTC', 'INTU', 'QCOM', 'CMCSA', 'TXN',
+    'VZ', 'UPS', 'PM', 'NEE', 'RTX', 'MS', 'HON', 'AMGN', 'UNP', 'PFE',
+    'LOW', 'SPGI', 'CAT', 'IBM', 'AMAT', 'DE', 'GS', 'GE', 'LMT', 'PLD',
+    'BLK', 'SYK', 'T', 'ISRG', 'BKNG', 'ELV', 'MDT', 'TJX', 'ADI', 'NOW',
+    'MMC', 'CVS', 'ADP', 'VRTX', 'LRCX', 'UBER', 'REGN', 'PYPL', 'ZTS', 'CI',
+    # Agregados - Los que salen en Colab pero faltaban
+    'MET', 'AMP', 'KMB', 'FCX', 'CLX', 'IT', 'BIIB', 'CL', 'ZBRA', 'WSM',
+    'MKTX', 'LII', 'FDS', 'RL', 'HAS',
+    # Más del S&P 500 para completar
+    'GOOG', 'BRK-A', 'AVGO', 'TSLA', 'JPM', 'UNH', 'LLY', 'XOM', 'V', 'PG',
+    'JNJ', 'MA', 'NVDA', 'HD', 'ABBV', 'MRK', 'COST', 'CVX', 'ADBE', 'PEP',
+    'KO', 'TMO', 'CSCO', 'ACN', 'MCD', 'ABT', 'NFLX', 'WFC', 'ORCL', 'CRM',
+    'DHR', 'TXN', 'AMD', 'CMCSA', 'QCOM', 'INTU', 'NKE', 'VZ', 'PM', 'UPS',
+    'NEE', 'RTX', 'HON', 'AMGN', 'LOW', 'SPGI', 'BMY', 'SBUX', 'BA', 'CAT',
+    'GS', 'IBM', 'AXP', 'ISRG', 'GILD', 'BLK', 'DE', 'ELV', 'MDT', 'SCHW',
+    'AMAT', 'SYK', 'PLD', 'LMT', 'ADI', 'BKNG', 'VRTX', 'TJX', 'REGN', 'ADP',
+    'MDLZ', 'CB', 'NOW', 'LRCX', 'MO', 'AMT', 'MMC', 'PYPL', 'PGR', 'SO',
+    'CI', 'DUK', 'ETN', 'BSX', 'SLB', 'ZTS', 'GE', 'EQIX', 'PNC', 'NOC',
+    'USB', 'TGT', 'ITW', 'REGN', 'BDX', 'MU', 'HCA', 'MS', 'WELL', 'KLAC',
+    'EOG', 'C', 'MMM', 'APH', 'FI', 'MCK', 'WM', 'PH', 'SNPS', 'CDNS',
+    'SHW', 'CMG', 'MAR', 'TDG', 'EMR', 'NSC', 'APD', 'MSI', 'NXPI', 'CARR',
+    'PSX', 'ADSK', 'CSX', 'CME', 'COP', 'MPC', 'TT', 'AJG', 'MCO', 'GM',
+    'AFL', 'ROP', 'PCAR', 'O', 'MCHP', 'SRE', 'HUM', 'ORLY', 'AZO', 'PAYX',
+    'D', 'ICE', 'MSCI', 'FTNT', 'KMB', 'ROST', 'ECL', 'AIG', 'TRV', 'CCI',
+    'JCI', 'TEL', 'CPRT', 'AEP', 'CL', 'HSY', 'GWW', 'PSA', 'MNST', 'KMI',
+    'EW', 'FAST', 'BK', 'CTAS', 'FCX', 'NEM', 'ALL', 'ODFL', 'DLR', 'EXC',
+    'SPG', 'CMI', 'IQV', 'KHC', 'CTVA', 'YUM', 'EA', 'XEL', 'GIS', 'VRSK',
+    'AME', 'DXCM', 'HLT', 'KVUE', 'PCG', 'DD', 'OTIS', 'RSG', 'IDXX', 'A',
+    'ANSS', 'VICI', 'VMC', 'MLM', 'BKR', 'KEYS', 'CTSH', 'IT', 'WMB', 'ROK',
+    'EXR', 'OKE', 'RMD', 'PPG', 'DOV', 'GEHC', 'AVB', 'BIIB', 'FICO', 'SYY',
+    'EIX', 'ED', 'CBRE', 'TROW', 'MTD', 'IRM', 'DAL', 'ALNY', 'HAL', 'ACGL',
+    'MPWR', 'WEC', 'WSM', 'XYL', 'FTV', 'GLW', 'WBD', 'FITB', 'IR', 'CHTR',
+    'CDW', 'HPQ', 'TSCO', 'AWK', 'DTE', 'ES', 'CAH', 'PPL', 'FDS', 'ETR',
+    'LH', 'GPN', 'CHD', 'EBAY', 'KEYS', 'RF', 'MTB', 'HPE', 'RL', 'ZBRA',
+    'TTWO', 'NTAP', 'STT', 'BALL', 'CLX', 'HAS', 'LUV', 'UAL', 'MKTX',
+    'LII', 'AMP', 'MET', 'ULTA', 'APTV', 'STE', 'DFS', 'CFG', 'INVH', 'HBAN'
+]
+
+GITHUB_RAW_HEADERS = {'Accept': 'application/vnd.github.v3.raw'}
+
+
+def _parse_sp500(text):
+    return pd.read_csv(io.StringIO(text))['Symbol'].tolist()
+
+
+def _parse_nasdaq(text):
+    return [x.split(',')[0].strip() for x in text.split('\n') if x and 'Symbol' not in x]
+
+
+# Fuentes por orden de prioridad: (nombre, [(url, cabeceras)], parser)
+UNIVERSE_SOURCES = [
+    ('sp500', [
+        # GitHub API (más confiable que raw), con raw.githubusercontent.com como fallback
+        ("https://api.github.com/repos/datasets/s-and-p-500-companies/contents/data/constituents.csv", GITHUB_RAW_HEADERS),
+        ("https://raw.githubusercontent.com/datasets/s-and-p-500-companies/master/data/constituents.csv", {}),
+    ], _parse_sp500),
+    ('nasdaq100', [
+        ("https://api.github.com/repos/nasdaq-100/nasdaq-100-symbols/contents/nasdaq-100-symbols.csv", GITHUB_RAW_HEADERS),
+    ], _parse_nasdaq),
+]
+
+
+def get_universe_snapshot(force_refresh=False):
+    """
+    Snapshot vigente del universo, refrescándolo si está caducado
+
+    El refresco usa peticiones condicionales: si GitHub responde 304 se
+    reutilizan los símbolos guardados. La versión solo cambia cuando cambia
+    el contenido (hash), así dos runs con la misma versión analizan
+    exactamente los mismos tickers en el mismo orden.
+    """
+    previous = universe_store.current()
+    if previous and not force_refresh and universe_store.is_fresh(previous):
+        print(f"🌍 Universo v{previous['version']} ({previous['count']} tickers, {previous['hash']}) reutilizado")
+        return previous
+
+    provider = get_provider()
+    previous_sources = (previous or {}).get('sources') or {}
     print("🌍 Generando Universo...")
 
-    # Intento 1: GitHub API (más confiable que raw)
-    try:
-        # Usando GitHub API en lugar de raw.githubusercontent.com
-        url_sp500 = "https://api.github.com/repos/datasets/s-and-p-500-companies/contents/data/constituents.csv"
-        headers = {'Accept': 'application/vnd.github.v3.raw'}
-        r = requests.get(url_sp500, headers=headers, timeout=30)
-        r.raise_for_status()
-        from io import StringIO
-        df = pd.read_csv(StringIO(r.text))
-        tickers.update(df['Symbol'].tolist())
-        print(f"   -> S&P 500 cargado desde GitHub API ({len(tickers)})")
-    except Exception as e:
-        print(f"   ⚠️ Fallo GitHub S&P 500: {str(e)}")
-        
-        # Fallback: Intentar con raw.githubusercontent.com
-        try:
-            url_sp500 = "https://raw.githubusercontent.com/datasets/s-and-p-500-companies/master/data/constituents.csv"
-            df = pd.read_csv(url_sp500, timeout=30)
-            tickers.update(df['Symbol'].tolist())
-            print(f"   -> S&P 500 cargado desde GitHub raw ({len(tickers)})")
-        except Exception as e2:
-            print(f"   ⚠️ Fallo GitHub raw: {str(e2)}")
-
-    # Intento 2: Nasdaq 100
+    sources = {}
+    for name, urls, parser in UNIVERSE_SOURCES:
+        entry = fetch_source(provider, urls, parser, previous_sources.get(name))
+        sources[name] = entry
+        print(f"   -> {name}: {len(entry['symbols'])} símbolos ({entry['status']})")
+
+    available = sum(len(e['symbols']) for e in sources.values() if e['status'] != FAILED)
+    if available < 50:
+        print(f"   ⚠️ Fallaron descargas externas. Usando Lista de Respaldo Manual ({len(BACKUP_LIST)} tickers).")
+        sources['backup'] = {'status': BACKUP, 'url': None, 'etag': None,
+                             'last_modified': None, 'symbols': list(BACKUP_LIST)}
+
+    union = build_ticker_list([e['symbols'] for e in sources.values()], limit=None)
+    tickers = union[:UNIVERSE_MAX_TICKERS]
+    if len(union) > len(tickers):
+        print(f"   ⚠️ Unión de fuentes de {len(union)} símbolos recortada a UNIVERSE_MAX_TICKERS={UNIVERSE_MAX_TICKERS}")
     try:
-        url_ndx = "https://api.github.com/repos/nasdaq-100/nasdaq-100-symbols/contents/nasdaq-100-symbols.csv"
-        headers = {'Accept': 'application/vnd.github.v3.raw'}
-        r = requests.get(url_ndx, headers=headers, timeout=30)
-        if r.status_code == 200:
-            text = r.text
-            lines = text.split('\n')
-            nasdaq_ticks = [x.split(',')[0].strip() for x in lines if x and 'Symbol' not in x]
-            tickers.update(nasdaq_ticks)
-            print(f"   -> Nasdaq cargado ({len(nasdaq_ticks)})")
+        snapshot, changed = universe_store.commit(tickers, sources, previous)
     except Exception as e:
-        print(f"   ⚠️ Fallo GitHub Nasdaq: {str(e)}")
-
-    # Intento 3: Lista de Respaldo MANUAL COMPLETA
-    # Lista actualizada con TODOS los tickers que aparecen en Colab
-    BACKUP_LIST = [
-        # Originales (90 tickers)
-        'AAPL', 'MSFT', 'GOOGL', 'AMZN', 'NVDA', 'META', 'TSLA', 'BRK-B', 'LLY', 'V',
-        'TSM', 'UNH', 'AVGO', 'JPM', 'NVO', 'WMT', 'XOM', 'MA', 'JNJ', 'PG',
-        'HD', 'MRK', 'COST', 'ABBV', 'ORCL', 'ASML', 'CVX', 'ADBE', 'AMD', 'KO',
-        'PEP', 'CRM', 'BAC', 'ACN', 'CSCO', 'NFLX', 'MCD', 'LIN', 'AZN', 'NKE',
-        'DIS', 'TMUS', 'ABT', 'DHR', 'WFC', 'INTC', 'INTU', 'QCOM', 'CMCSA', 'TXN',
-        'VZ', 'UPS', 'PM', 'NEE', 'RTX', 'MS', 'HON', 'AMGN', 'UNP', 'PFE',
-        'LOW', 'SPGI', 'CAT', 'IBM', 'AMAT', 'DE', 'GS', 'GE', 'LMT', 'PLD',
-        'BLK', 'SYK', 'T', 'ISRG', 'BKNG', 'ELV', 'MDT', 'TJX', 'ADI', 'NOW',
-        'MMC', 'CVS', 'ADP', 'VRTX', 'LRCX', 'UBER', 'REGN', 'PYPL', 'ZTS', 'CI',
-        # Agregados - Los que salen en Colab pero faltaban
-        'MET', 'AMP', 'KMB', 'FCX', 'CLX', 'IT', 'BIIB', 'CL', 'ZBRA', 'WSM',
-        'MKTX', 'LII', 'FDS', 'RL', 'HAS',
-        # Más del S&P 500 para completar
-        'GOOG', 'BRK-A', 'AVGO', 'TSLA', 'JPM', 'UNH', 'LLY', 'XOM', 'V', 'PG',
-        'JNJ', 'MA', 'NVDA', 'HD', 'ABBV', 'MRK', 'COST', 'CVX', 'ADBE', 'PEP',
-        'KO', 'TMO', 'CSCO', 'ACN', 'MCD', 'ABT', 'NFLX', 'WFC', 'ORCL', 'CRM',
-        'DHR', 'TXN', 'AMD', 'CMCSA', 'QCOM', 'INTU', 'NKE', 'VZ', 'PM', 'UPS',
-        'NEE', 'RTX', 'HON', 'AMGN', 'LOW', 'SPGI', 'BMY', 'SBUX', 'BA', 'CAT',
-        'GS', 'IBM', 'AXP', 'ISRG', 'GILD', 'BLK', 'DE', 'ELV', 'MDT', 'SCHW',
-        'AMAT', 'SYK', 'PLD', 'LMT', 'ADI', 'BKNG', 'VRTX', 'TJX', 'REGN', 'ADP',
-        'MDLZ', 'CB', 'NOW', 'LRCX', 'MO', 'AMT', 'MMC', 'PYPL', 'PGR', 'SO',
-        'CI', 'DUK', 'ETN', 'BSX', 'SLB', 'ZTS', 'GE', 'EQIX', 'PNC', 'NOC',
-        'USB', 'TGT', 'ITW', 'REGN', 'BDX', 'MU', 'HCA', 'MS', 'WELL', 'KLAC',
-        'EOG', 'C', 'MMM', 'APH', 'FI', 'MCK', 'WM', 'PH', 'SNPS', 'CDNS',
-        'SHW', 'CMG', 'MAR', 'TDG', 'EMR', 'NSC', 'APD', 'MSI', 'NXPI', 'CARR',
-        'PSX', 'ADSK', 'CSX', 'CME', 'COP', 'MPC', 'TT', 'AJG', 'MCO', 'GM',
-        'AFL', 'ROP', 'PCAR', 'O', 'MCHP', 'SRE', 'HUM', 'ORLY', 'AZO', 'PAYX',
-        'D', 'ICE', 'MSCI', 'FTNT', 'KMB', 'ROST', 'ECL', 'AIG', 'TRV', 'CCI',
-        'JCI', 'TEL', 'CPRT', 'AEP', 'CL', 'HSY', 'GWW', 'PSA', 'MNST', 'KMI',
-        'EW', 'FAST', 'BK', 'CTAS', 'FCX', 'NEM', 'ALL', 'ODFL', 'DLR', 'EXC',
-        'SPG', 'CMI', 'IQV', 'KHC', 'CTVA', 'YUM', 'EA', 'XEL', 'GIS', 'VRSK',
-        'AME', 'DXCM', 'HLT', 'KVUE', 'PCG', 'DD', 'OTIS', 'RSG', 'IDXX', 'A',
-        'ANSS', 'VICI', 'VMC', 'MLM', 'BKR', 'KEYS', 'CTSH', 'IT', 'WMB', 'ROK',
-        'EXR', 'OKE', 'RMD', 'PPG', 'DOV', 'GEHC', 'AVB', 'BIIB', 'FICO', 'SYY',
-        'EIX', 'ED', 'CBRE', 'TROW', 'MTD', 'IRM', 'DAL', 'ALNY', 'HAL', 'ACGL',
-        'MPWR', 'WEC', 'WSM', 'XYL', 'FTV', 'GLW', 'WBD', 'FITB', 'IR', 'CHTR',
-        'CDW', 'HPQ', 'TSCO', 'AWK', 'DTE', 'ES', 'CAH', 'PPL', 'FDS', 'ETR',
-        'LH', 'GPN', 'CHD', 'EBAY', 'KEYS', 'RF', 'MTB', 'HPE', 'RL', 'ZBRA',
-        'TTWO', 'NTAP', 'STT', 'BALL', 'CLX', 'HAS', 'LUV', 'UAL', 'MKTX',
-        'LII', 'AMP', 'MET', 'ULTA', 'APTV', 'STE', 'DFS', 'CFG', 'INVH', 'HBAN'
-    ]
-
-    if len(tickers) < 50:
-        print(f"   ⚠️ Fallaron descargas externas. Usando Lista de Respaldo Manual ({len(BACKUP_LIST)} tickers).")
-        tickers.update(BACKUP_LIST)
+        # Sin persistencia el run sigue siendo válido, solo no queda versionado
+        print(f"   ⚠️ No se pudo guardar el snapshot del universo: {e}")
+        changed = True
+        snapshot = {'version': None, 'hash': snapshot_hash(tickers), 'count': len(tickers),
+                    'created_at': None, 'checked_at': None, 'tickers': tickers, 'sources': sources}
 
-    final_list = list(set([t.replace('.', '-') for t in tickers]))
-    final_count = min(500, len(final_list))
-    print(f"   ✅ Total final: {final_count} tickers para analizar")
-    return final_list[:500] # Limitamos a 500 para velocidad
+    state = "nueva versión" if changed else "sin cambios"
+    print(f"   ✅ Universo v{snapshot['version']} ({state}, hash {snapshot['hash']}): "
+          f"{snapshot['count']} tickers para analizar")
+    return snapshot
 
-# ==========================================
-# 2. MOTOR DE BÚSQUEDA FUZZY (V5 Core)
-# ==========================================
-def get_fuzzy_series(df, keywords):
-    """Búsqueda fuzzy de campos en DataFrames financieros"""
-    if df.empty: 
-        return pd.Series(dtype=float)
-    
-    df.index = df.index.astype(str).str.lower().str.strip()
-    
-    for key in keywords:
-        key = key.lower()
-        if key in df.index: 
-            return df.loc[key]
-        matches = [idx for idx in df.index if key in idx]
-        if matches: 
-            return df.loc[min(matches, key=len)]
-    
-    return pd.Series(dtype=float)
+
+def get_bulletproof_universe():
+    """Lista de tickers del snapshot vigente (orden estable, máximo UNIVERSE_MAX_TICKERS)"""
+    return get_universe_snapshot()['tickers']
 
 # ==========================================
-# 3. ANÁLISIS FINANCIERO (DCF 2-STAGE + CALIDAD)
+# 2. ANÁLISIS FINANCIERO (DCF 2-STAGE + CALIDAD)
 # ==========================================
-def analyze_stock_v7(ticker):
-    """Analiza una acción individual con metodología Warren Buffett + DCF"""
+def with_cached_shares(ticker, quote):
+    """Completa las acciones en circulación desde el índice de metadata si faltan"""
+    if quote and not quote.get('shares'):
+        shares = get_metadata_index().get_shares(ticker)
+        if shares:
+            quote = dict(quote, shares=shares)
+    return quote
+
+def passes_market_cap(quote):
+    """Filtro rápido de liquidez: capitalización mínima"""
     try:
-        t = yf.Ticker(ticker)
+        return quote['market_cap'] >= CONFIG['MIN_MARKET_CAP'] and quote['shares'] > 0
+    except (KeyError, TypeError):
+        return False
 
-        # Filtro rápido de liquidez/precio
-        try:
-            fast = t.fast_info
-            if fast.market_cap < 5_000_000_000: 
-                return None  # Solo > 5B Cap
-        except: 
-            return None
+def prefilter_universe(tickers):
+    """
+    Fase 1: cotizaciones de todo el universo en pocas peticiones en lote
+    Retorna {ticker: quote} solo con los que superan el filtro de capitalización
+    """
+    quotes = get_provider().quotes(tickers)
+    quotes = {t: with_cached_shares(t, q) for t, q in quotes.items()}
+    return {t: quotes[t] for t in tickers if t in quotes and passes_market_cap(quotes[t])}
 
-        inc = t.income_stmt
-        bal = t.balance_sheet
-        cf = t.cashflow
+def analyze_stock_v7(ticker, quote=None):
+    """
+    Analiza una acción individual con metodología Warren Buffett + DCF
 
-        if inc.empty or bal.empty or cf.empty: 
-            return None
+    Args:
+        ticker: Símbolo a analizar
+        quote: Cotización ya obtenida en la fase 1 (si es None se descarga aquí)
 
-        # Ordenar cronológicamente
-        inc = inc[sorted(inc.columns, reverse=True)]
-        bal = bal[sorted(bal.columns, reverse=True)]
-        cf = cf[sorted(cf.columns, reverse=True)]
-
-        # Extracción Fuzzy
-        ni = get_fuzzy_series(inc, ['Net Income', 'NetIncome'])
-        ebit = get_fuzzy_series(inc, ['EBIT', 'Operating Income'])
-        ocf = get_fuzzy_series(cf, ['Operating Cash Flow', 'Total Cash From Operating Activities'])
-        capex = get_fuzzy_series(cf, ['Capital Expenditures', 'Purchase of PPE'])
-        equity = get_fuzzy_series(bal, ['Stockholders Equity', 'Total Equity'])
-        debt = get_fuzzy_series(bal, ['Total Debt'])
-        cash = get_fuzzy_series(bal, ['Cash', 'Cash And Cash Equivalents'])
-
-        if ni.empty or ocf.empty or equity.empty: 
-            return None
+    Returns:
+        Dict con la fila del resultado o None (ver analyze_ticker para el motivo)
+    """
+    return analyze_ticker(ticker, quote).row
 
-        # --- A. CALIDAD (ROIC & PIOTROSKI) ---
-        # ROIC
-        curr_ebit = ebit.iloc[0] if not ebit.empty else ni.iloc[0]
-        curr_eq = equity.iloc[0]
-        curr_debt = debt.iloc[0] if not debt.empty else 0
-        curr_cash = cash.iloc[0] if not cash.empty else 0
+def analyze_ticker(ticker, quote=None):
+    """Analiza un ticker con reintentos y devuelve un AnalysisOutcome tipado"""
+    def run_stage(tasks, gather):
+        return [_gather_with_retries(t, q, gather) for t, q in tasks.items()]
+    return evaluate_survivors({ticker: quote}, run_stage)[0]
 
-        invested_cap = curr_eq + curr_debt - curr_cash
-        roic = (curr_ebit * 0.79) / invested_cap if invested_cap > 0 else 0
+def _gather_with_retries(ticker, quote, gather):
+    return run_with_retries(
+        ticker,
+        lambda: gather(ticker, quote),
+        max_retries=CONFIG['MAX_RETRIES'],
+        backoff_base=CONFIG['RETRY_BACKOFF_SECONDS']
+    )
 
-        if roic < CONFIG['MIN_ROIC']: 
-            return None
+def _save_error(ticker, kind, e):
+    log(f"⚠ Error guardando fundamentales de {ticker}: {e}")
 
-        # Piotroski Rápido
-        piotroski = 0
-        try:
-            if len(ni) > 1:
-                piotroski += 1 if ni.iloc[0] > 0 else 0
-                piotroski += 1 if ocf.iloc[0] > 0 else 0
-                piotroski += 1 if ni.iloc[0] > ni.iloc[1] else 0
-                piotroski += 1 if ocf.iloc[0] > ni.iloc[0] else 0
-                piotroski += 1 if (not debt.empty and len(debt)>1 and curr_debt <= debt.iloc[1]) else 0
-            else: 
-                piotroski = 5  # Beneficio de la duda
-        except: 
-            piotroski = 5
-
-        if piotroski < CONFIG['MIN_PIOTROSKI']: 
-            return None
+def _lazy_data(ticker, statements=None, defer_missing=False):
+    return LazyTickerData(
+        ticker, get_provider(), store=fundamentals_store, prefetched=statements,
+        defer_missing=defer_missing, on_save_error=_save_error
+    )
 
-        # --- B. VALORACIÓN (DCF 2-Etapas) ---
-        price = fast.last_price
-        cpx_val = abs(capex.iloc[0]) if not capex.empty else 0
-        fcf = ocf.iloc[0] - cpx_val
+def _gather_quality(ticker, quote=None, statements=None, defer_missing=False):
+    """
+    Etapa de I/O 1: cotización + income + balance (suficiente para ROIC)
 
-        intrinsic = 0
-        mos = -0.99
+    Devuelve un outcome OK con la cotización y los campos canónicos en
+    `inputs` (todavía sin fila) o el motivo por el que el ticker no sigue.
+    Deja propagar los errores de red para que se clasifiquen y reintenten.
 
-        if fcf > 0:
-            # Tasa de crecimiento: Proxy basado en ROIC y Reinvestment
-            growth_proxy = min(roic * 0.5, 0.14)  # Max 14%
-            growth_proxy = max(growth_proxy, 0.03)  # Min 3%
+    Args:
+        statements: {kind: DataFrame} ya descargados (modo async); el resto
+                    se lee del almacén o del proveedor
+        defer_missing: Si True lanza StatementDeferred en vez de descargar
+    """
+    data = _lazy_data(ticker, statements, defer_missing)
+    outcome = _collect_quality(ticker, data, quote)
+    outcome.calls = data.calls
+    return outcome
 
-            # Stage 1: 5 años
-            future_cash = 0
-            for i in range(1, 6):
-                val = fcf * ((1 + growth_proxy) ** i)
-                future_cash += val / ((1 + CONFIG['DISCOUNT_RATE']) ** i)
+def _collect_quality(ticker, data, quote):
+    metadata = get_metadata_index()
 
-            # Stage 2: Terminal
-            terminal_fcf = fcf * ((1 + growth_proxy) ** 5)
-            term_val = (terminal_fcf * 1.03) / (CONFIG['DISCOUNT_RATE'] - 0.03)
-            term_val_pv = term_val / ((1 + CONFIG['DISCOUNT_RATE']) ** 5)
+    # Filtro rápido de liquidez/precio
+    if quote is None:
+        quote = with_cached_shares(ticker, data.quote())
+    if not quote or quote.get('market_cap') is None:
+        return AnalysisOutcome.no_data(ticker, 'sin cotización')
+    metadata.update(ticker, shares=quote.get('shares'), currency=quote.get('currency'))
+    if not passes_market_cap(quote): 
+        return AnalysisOutcome.filtered(ticker, 'market_cap')
 
-            ev = future_cash + term_val_pv
-            equity_val = ev + curr_cash - curr_debt
-            intrinsic = equity_val / fast.shares
+    data.require('income', 'balance')
+    if data.income.empty or data.balance.empty: 
+        return AnalysisOutcome.no_data(ticker, 'estados financieros vacíos')
 
-            if intrinsic > 0:
-                mos = (intrinsic - price) / intrinsic
+    # Campos canónicos (ver financial_fields.FIELD_SCHEMA)
+    fields = dict(data.fields('income'))
+    fields.update(data.fields('balance'))
+    return AnalysisOutcome.gathered(ticker, {'quote': quote, 'fields': fields})
 
-        # FILTRO DE SALIDA
-        if mos < CONFIG['MARGIN_OF_SAFETY_VIEW'] and piotroski < 7:
-            return None
+def _gather_cashflow(ticker, quote=None, statements=None, defer_missing=False):
+    """Etapa de I/O 2: cashflow, solo de los que superan ROIC y la cota de Piotroski"""
+    data = _lazy_data(ticker, statements, defer_missing)
+    data.require('cashflow')
+    if data.cashflow.empty:
+        outcome = AnalysisOutcome.no_data(ticker, 'cashflow vacío')
+    else:
+        outcome = AnalysisOutcome.gathered(ticker, {'fields': dict(data.fields('cashflow'))})
+    outcome.calls = data.calls
+    return outcome
 
-        # Obtener sector
-        try:
-            sector = t.info.get('sector', 'N/A')
-        except:
-            sector = 'N/A'
-
-        return {
-            'Ticker': ticker,
-            'Price': round(price, 2),
-            'Sector': sector,
-            'ROIC': roic,
-            'Piotroski': piotroski,
-            'Growth_Est': growth_proxy,
-            'Intrinsic': intrinsic,
-            'MOS': mos
-        }
+# Estados que descargan los hilos de I/O del modo pipeline para cada etapa
+STAGE_STATEMENTS = {
+    _gather_quality: ('income', 'balance'),
+    _gather_cashflow: ('cashflow',)
+}
 
-    except Exception as e:
-        # Log silencioso de errores individuales
+def _fetch_statements(ticker, kinds):
+    """
+    Hilo de I/O del modo pipeline: solo descarga, sin ordenar, normalizar ni
+    guardar, los estados que el almacén no tiene al día (con reintentos)
+
+    Returns:
+        AnalysisOutcome OK con {kind: DataFrame} en `inputs` o el error clasificado
+    """
+    provider = get_provider()
+    frames = {}
+
+    def fetch():
+        for kind in kinds:
+            if kind in frames:
+                continue
+            if fundamentals_store is not None and not fundamentals_store.needs_refresh(ticker, kind):
+                continue
+            frames[kind] = provider.statement(ticker, kind)
+        return AnalysisOutcome.gathered(ticker, frames)
+
+    return run_with_retries(ticker, fetch, max_retries=CONFIG['MAX_RETRIES'],
+                            backoff_base=CONFIG['RETRY_BACKOFF_SECONDS'])
+
+def _evaluate_fetched(ticker, quote, fetched, gather):
+    """
+    Etapa de CPU del modo pipeline: guarda lo descargado en el almacén y
+    evalúa `gather` sin red
+
+    Returns:
+        AnalysisOutcome, o None si falta algún estado o la evaluación falla
+        (el ticker pasa por el pool de hilos, como en modo async)
+    """
+    if fetched.status != OK:
+        return fetched
+    frames = fetched.inputs
+    if fundamentals_store is not None:
+        for kind, df in frames.items():
+            try:
+                fundamentals_store.save(ticker, kind, df)
+            except Exception as e:
+                _save_error(ticker, kind, e)
+    try:
+        outcome = gather(ticker, quote, statements=frames, defer_missing=True)
+    except Exception:
         return None
 
+    # Lo descargado por los hilos de I/O cuenta como llamada de red
+    calls = dict(outcome.calls)
+    prefetched = calls.pop(ASYNC, {})
+    outcome.calls = merge_calls(calls, {NETWORK: prefetched})
+    outcome.attempts = fetched.attempts
+    return outcome
+
+def _lookup_sector(ticker):
+    """Sector desde el índice local; info (la llamada más pesada) solo si no lo conocemos"""
+    metadata = get_metadata_index()
+    sector = metadata.get_sector(ticker)
+    if sector is not None:
+        return sector, {}
+
+    data = _lazy_data(ticker)
+    try:
+        info = data.info()
+        sector = info.get('sector', 'N/A')
+        metadata.update(ticker, sector=sector, currency=info.get('currency'))
+    except Exception:
+        sector = 'N/A'
+    return sector, data.calls
+
+def evaluate_survivors(survivors, run_stage, capture=None, reuse=None):
+    """
+    Evalúa {ticker: quote} separando la descarga del cálculo:
+
+        1. run_stage(survivors, _gather_quality)    income + balance (I/O)
+        2. valuation_engine.screen_quality          ROIC + cota de Piotroski (vectorizado)
+        3. run_stage(pendientes, _gather_cashflow)  cashflow solo de los que siguen (I/O)
+        4. valuation_engine.value_batch             Piotroski, FCF, DCF y MOS (vectorizado)
+        5. sector de las filas finales              índice local o info (I/O)
+
+    Args:
+        run_stage: Función (tasks {ticker: quote}, gather) -> lista de AnalysisOutcome
+                   (hilos AIMD, async o secuencial)
+        capture: Dict opcional donde se deja 'screen_inputs' (ScreenInputs)
+                 para re-evaluar después con otros umbrales
+        reuse: ScreenInputs de tickers del run anterior que no hay que volver a
+               reunir (run incremental): entran al lote con la cotización
+               actual y solo pasan por la etapa de cashflow si les falta
+
+    Returns:
+        Lista de AnalysisOutcome (uno por ticker, en el orden de survivors)
+    """
+    final = {}
+    gathered = {}
+    periods = {}
+    reused = reuse.batch.tickers if reuse is not None else []
+    skip = set(reused)
+    tasks = {ticker: quote for ticker, quote in survivors.items() if ticker not in skip}
+    for outcome in run_stage(tasks, _gather_quality):
+        if outcome.status == OK:
+            gathered[outcome.ticker] = outcome
+            periods[outcome.ticker] = latest_period(outcome.inputs['fields'])
+        else:
+            final[outcome.ticker] = outcome
+
+    batch = FundamentalsBatch(gathered)
+    for ticker, outcome in gathered.items():
+        batch.set_quote(ticker, outcome.inputs['quote'])
+        batch.set_fields(ticker, outcome.inputs['fields'])
+    if reuse is not None:
+        for ticker in reused:
+            reuse.batch.set_quote(ticker, survivors[ticker])
+            gathered[ticker] = AnalysisOutcome.gathered(ticker, {'quote': survivors[ticker]})
+        periods.update(reuse.periods)
+        batch = FundamentalsBatch.concat([batch, reuse.batch])
+    quality = screen_quality(batch, CONFIG['MIN_ROIC'], CONFIG['MIN_PIOTROSKI'])
+
+    pending = {
+        ticker: gathered[ticker].inputs['quote']
+        for ticker, status, loaded in zip(batch.tickers, quality['status'], batch.cashflow_loaded)
+        if status == PENDING and not loaded
+    }
+    cashflow_failures = {}
+    for outcome in run_stage(pending, _gather_cashflow):
+        first = gathered[outcome.ticker]
+        outcome.calls = merge_calls(first.calls, outcome.calls)
+        outcome.attempts = max(first.attempts, outcome.attempts)
+        if outcome.status == OK:
+            batch.set_fields(outcome.ticker, outcome.inputs['fields'])
+            batch.cashflow_loaded[batch.index[outcome.ticker]] = True
+        else:
+            # Sin cashflow el ticker sale del lote con el motivo de la etapa
+            quality['status'][batch.index[outcome.ticker]] = outcome.status
+            final[outcome.ticker] = outcome
+            cashflow_failures[outcome.ticker] = outcome
+        gathered[outcome.ticker] = outcome
+
+    valuation = value_batch(batch, quality, CONFIG['MIN_PIOTROSKI'],
+                            CONFIG['DISCOUNT_RATE'], CONFIG['MARGIN_OF_SAFETY_VIEW'])
+    rows = records(batch, valuation)
+
+    known = reuse.sectors if reuse is not None else {}
+    sectors = {ticker: (known[ticker], {}) for ticker in rows if known.get(ticker, 'N/A') != 'N/A'}
+    lookups = [ticker for ticker in rows if ticker not in sectors]
+    if len(lookups) > 1:
+        with ThreadPoolExecutor(max_workers=CONFIG['MAX_WORKERS']) as executor:
+            sectors.update(zip(lookups, executor.map(_lookup_sector, lookups)))
+    else:
+        sectors.update((ticker, _lookup_sector(ticker)) for ticker in lookups)
+
+    for i, ticker in enumerate(batch.tickers):
+        if ticker in final:
+            continue
+        stage = gathered[ticker]
+        if ticker in rows:
+            sector, sector_calls = sectors[ticker]
+            outcome = AnalysisOutcome.ok(ticker, dict(rows[ticker], Sector=sector))
+            outcome.calls = merge_calls(stage.calls, sector_calls)
+        else:
+            outcome = AnalysisOutcome(ticker, valuation['status'][i], reason=valuation['reason'][i])
+            outcome.calls = stage.calls
+        outcome.attempts = stage.attempts
+        final[ticker] = outcome
+
+    if capture is not None:
+        capture['screen_inputs'] = ScreenInputs(
+            batch, {ticker: sectors[ticker][0] for ticker in rows}, cashflow_failures, periods
+        )
+    return [final[ticker] for ticker in survivors]
+
+def _timed_analysis(ticker, quote, gather):
+    """Ejecuta una etapa de I/O con reintentos y devuelve (outcome, latencia)"""
+    start = time.time()
+    outcome = _gather_with_retries(ticker, quote, gather)
+    return outcome, time.time() - start
+
+def analyze_adaptive(survivors, controller, gather=_gather_quality):
+    """
+    Ejecuta `gather` sobre {ticker: quote} manteniendo en vuelo tantas
+    peticiones como permita el controlador AIMD en cada momento
+
+    Returns:
+        Lista de AnalysisOutcome (uno por ticker)
+    """
+    outcomes = []
+    pending = set()
+    queue = iter(survivors.items())
+    exhausted = False
+
+    with ThreadPoolExecutor(max_workers=controller.max_limit) as executor:
+        while True:
+            while not exhausted and len(pending) < controller.limit:
+                try:
+                    ticker, quote = next(queue)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(executor.submit(_timed_analysis, ticker, quote, gather))
+
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                outcome, latency = future.result()
+                controller.record(
+                    latency,
+                    error=outcome.status == TRANSIENT_ERROR,
+                    throttled=outcome.status == THROTTLED
+                )
+                outcomes.append(outcome)
+
+    return outcomes
+
+def summarize_outcomes(outcomes):
+    """Cuenta los outcomes por estado"""
+    counts = {status: 0 for status in STATUSES}
+    for outcome in outcomes:
+        counts[outcome.status] += 1
+    return counts
+
+def async_mode_supported():
+    """El motor async habla directamente con Yahoo: solo aplica al proveedor real"""
+    return ASYNC_FETCH_AVAILABLE and get_provider().name == 'yahoo'
+
+def analyze_async(survivors, gather=_gather_quality, stats=None):
+    """
+    Descarga con asyncio los estados que `gather` necesita para cada ticker
+    y ejecuta la etapa sin red sobre los datos descargados
+
+    Args:
+        stats: Dict donde acumular las estadísticas (se comparte entre etapas)
+
+    Returns:
+        (outcomes, fallback, stats): fallback = {ticker: quote} que no se pudieron
+        descargar o evaluar en modo async y deben ir por el pool de hilos
+    """
+    fetcher = AsyncStatementFetcher(
+        max_connections=CONFIG['ASYNC_MAX_CONNECTIONS'],
+        per_host=CONFIG['ASYNC_CONNECTIONS_PER_HOST']
+    )
+    if stats is None:
+        stats = {}
+    for key in ('rounds', 'requests', 'errors', 'elapsed_seconds'):
+        stats.setdefault(key, 0)
+    statements = {ticker: {} for ticker in survivors}
+    outcomes = []
+    fallback = {}
+    pending = list(survivors)
+
+    while pending:
+        # Evaluar sin red: lo que falte se pide en la siguiente ronda
+        jobs = {}
+        for ticker in pending:
+            quote = survivors[ticker]
+            try:
+                outcome = gather(ticker, quote, statements=statements[ticker], defer_missing=True)
+            except StatementDeferred as d:
+                jobs[ticker] = d.kinds
+                continue
+            except Exception:
+                fallback[ticker] = quote
+                continue
+            outcomes.append(outcome)
+
+        if not jobs:
+            break
+
+        fetched, failures = fetcher.fetch(jobs)
+        stats['rounds'] += 1
+        for key in ('requests', 'errors', 'elapsed_seconds'):
+            stats[key] += fetcher.stats.get(key, 0)
+        log(f"⚡ Async ronda {stats['rounds']}: {fetcher.stats.get('requests', 0)} peticiones, "
+            f"{len(failures)} tickers fallidos, {fetcher.stats.get('elapsed_seconds', 0)}s")
+
+        for ticker, frames in fetched.items():
+            statements[ticker].update(frames)
+            if fundamentals_store is not None:
+                for kind, df in frames.items():
+                    try:
+                        fundamentals_store.save(ticker, kind, df)
+                    except Exception as e:
+                        _save_error(ticker, kind, e)
+
+        for ticker in failures:
+            fallback[ticker] = survivors[ticker]
+        pending = list(fetched)
+
+    stats.update({
+        'max_connections': fetcher.max_connections,
+        'per_host': fetcher.per_host,
+        'elapsed_seconds': round(stats['elapsed_seconds'], 2)
+    })
+    return outcomes, fallback, stats
+
+def analyze_pipeline(survivors, controller, gather=_gather_quality, stats=None):
+    """
+    Modo pipeline: los hilos de I/O (concurrencia AIMD) solo descargan; una
+    cola acotada alimenta un único hilo que parsea, guarda y evalúa `gather`
+
+    Args:
+        stats: Dict donde acumular las estadísticas (se comparte entre etapas)
+
+    Returns:
+        (outcomes, fallback): fallback = {ticker: quote} a reintentar por el pool de hilos
+    """
+    kinds = STAGE_STATEMENTS[gather]
+
+    def observe(fetched, latency):
+        controller.record(
+            latency,
+            error=fetched.status == TRANSIENT_ERROR,
+            throttled=fetched.status == THROTTLED
+        )
+
+    executor = PipelineExecutor(
+        fetch=lambda ticker, quote: _fetch_statements(ticker, kinds),
+        process=lambda ticker, quote, fetched: (ticker, _evaluate_fetched(ticker, quote, fetched, gather)),
+        controller=controller,
+        queue_size=CONFIG['PIPELINE_QUEUE_SIZE'],
+        observe=observe
+    )
+    outcomes = []
+    fallback = {}
+    for ticker, outcome in executor.run(survivors):
+        if outcome is None:
+            fallback[ticker] = survivors[ticker]
+        else:
+            outcomes.append(outcome)
+
+    if stats is not None:
+        for key in ('fetched', 'elapsed_seconds', 'io_blocked_seconds', 'cpu_seconds', 'cpu_idle_seconds'):
+            stats[key] = round(stats.get(key, 0) + executor.stats[key], 2)
+        stats['queue_peak'] = max(stats.get('queue_peak', 0), executor.stats['queue_peak'])
+        stats['queue_size'] = executor.queue_size
+    log(f"🔀 Pipeline: {executor.stats['fetched']} descargas, cola pico {executor.stats['queue_peak']}/"
+        f"{executor.queue_size}, CPU {executor.stats['cpu_seconds']}s en {executor.stats['elapsed_seconds']}s")
+    return outcomes, fallback
+
+def run_io_stage(tasks, gather, controller, fetch_mode='threads', async_stats=None, pipeline_stats=None):
+    """
+    Ejecuta una etapa de I/O sobre {ticker: quote} (hilos AIMD, async o
+    pipeline) con barrido final de los tickers throttled
+
+    Returns:
+        Lista de AnalysisOutcome (uno por ticker)
+    """
+    if not tasks:
+        return []
+    if fetch_mode in ('async', 'pipeline'):
+        if fetch_mode == 'async':
+            outcomes, fallback, _ = analyze_async(tasks, gather, stats=async_stats)
+        else:
+            outcomes, fallback = analyze_pipeline(tasks, controller, gather, stats=pipeline_stats)
+        if fallback:
+            log(f"↩️  {len(fallback)} tickers reintentados por el pool de hilos")
+            outcomes += analyze_adaptive(fallback, controller, gather)
+    else:
+        outcomes = analyze_adaptive(tasks, controller, gather)
+
+    # Barrido final: los throttled se reintentan al terminar, con concurrencia mínima
+    throttled = {o.ticker: tasks[o.ticker] for o in outcomes if o.status == THROTTLED}
+    if throttled:
+        log(f"⏳ {len(throttled)} tickers throttled, barrido final en {CONFIG['THROTTLE_SWEEP_DELAY']}s...")
+        time.sleep(CONFIG['THROTTLE_SWEEP_DELAY'])
+        sweep_controller = AdaptiveConcurrencyController(
+            initial=CONFIG['MIN_WORKERS'],
+            min_limit=1,
+            max_limit=CONFIG['MAX_WORKERS'],
+            target_latency=CONFIG['TARGET_LATENCY_SECONDS']
+        )
+        swept = {o.ticker: o for o in analyze_adaptive(throttled, sweep_controller, gather)}
+        outcomes = [swept.get(o.ticker, o) for o in outcomes]
+    return outcomes
+
+def _filings_changed(ticker, period):
+    """
+    El ticker puede tener estados anuales distintos de los del run anterior
+
+    Con almacén: hay que refrescar income/balance (ya pudo publicarse un
+    ejercicio nuevo) o el almacén tiene otro último periodo (lo descargó
+    otro run). Sin almacén: ya pasó el cierre siguiente más el plazo del 10-K.
+    """
+    if period is None:
+        return True
+    if fundamentals_store is None:
+        next_filing = datetime.fromisoformat(period) + timedelta(
+            days=FISCAL_PERIOD_DAYS + FILING_LAG_DAYS)
+        return datetime.now() >= next_filing
+    kinds = ('income', 'balance')
+    if any(fundamentals_store.needs_refresh(ticker, kind) for kind in kinds):
+        return True
+    stored = [fundamentals_store.latest_period(ticker, kind) for kind in kinds]
+    stored = [p for p in stored if p is not None]
+    return not stored or max(stored).date().isoformat() != period
+
+def plan_incremental(survivors, payload):
+    """
+    Separa los supervivientes que se reutilizan del run anterior de los que
+    hay que volver a analizar: nuevos (no estaban en el motor), con estados
+    nuevos o con error / sin datos la última vez
+
+    Args:
+        payload: Entradas del run anterior (screen_inputs_payload)
+
+    Returns:
+        (ScreenInputs de los reutilizables, resumen para el resultado)
+    """
+    previous = ScreenInputs.from_dict(payload['inputs'])
+    errored = {o['ticker'] for o in payload['outcomes']} | set(previous.cashflow_failures)
+    reasons = {'new': 0, 'new_filings': 0, 'errored': 0}
+    keep = []
+    for ticker in survivors:
+        if ticker in errored:
+            reasons['errored'] += 1
+        elif ticker not in previous.batch.index:
+            reasons['new'] += 1
+        elif _filings_changed(ticker, previous.periods.get(ticker)):
+            reasons['new_filings'] += 1
+        else:
+            keep.append(ticker)
+    summary = {
+        'base_generated_at': payload['generated_at'],
+        'reused': len(keep),
+        'recomputed': len(survivors) - len(keep),
+        'recomputed_reasons': reasons
+    }
+    log(f"♻️  Incremental: {summary['reused']} reutilizados, {summary['recomputed']} a recalcular {reasons}")
+    return previous.subset(keep), summary
+
 # ==========================================
-# 4. FUNCIÓN PRINCIPAL DE ANÁLISIS
+# 3. FUNCIÓN PRINCIPAL DE ANÁLISIS
 # ==========================================
-def run_analysis():
-    """Ejecuta el análisis completo con caché"""
-    
-    # Verificar caché primero
-    cached = get_cached_results()
-    if cached is not None:
-        cached['from_cache'] = True
-        return cached
-    
-    # Si no hay caché, ejecutar análisis
-    start_time = time.time()
-    
-    log("🎯 Iniciando Warren Screener v8")
-    log("="*60)
+def analyze_universe(tickers, fetch_mode=None, previous=None):
+    """
+    Prefiltro + etapas de I/O + motor de valoración sobre una lista de tickers
+    (el run completo o un shard)
+
+    Args:
+        previous: Entradas del run anterior (screen_inputs_payload) para un run
+                  incremental: solo se reúnen los tickers que cambiaron
+
+    Returns:
+        {'survivors', 'outcomes', 'concurrency_profile', 'async_stats', 'fetch_mode',
+         'screen_inputs', 'incremental'}
+    """
+    # Fase 1: prefiltro de capitalización con cotizaciones en lote
+    survivors = prefilter_universe(tickers)
+    log(f"💵 Prefiltro de capitalización: {len(survivors)}/{len(tickers)} superan {CONFIG['MIN_MARKET_CAP']/1e9:.0f}B")
     
-    # 1. Obtener universo
-    tickers = get_bulletproof_universe()
-    log(f"🎯 Objetivo Real: Analizar {len(tickers)} empresas.")
+    # Fase 2: análisis completo en paralelo solo de los supervivientes
+    fetch_mode = fetch_mode or CONFIG['FETCH_MODE']
+    if fetch_mode == 'async' and not async_mode_supported():
+        log("⚠️  Modo async no disponible (requiere aiohttp y proveedor yahoo), usando hilos")
+        fetch_mode = 'threads'
+
+    controller = AdaptiveConcurrencyController(
+        initial=CONFIG['MAX_WORKERS'],
+        min_limit=CONFIG['MIN_WORKERS'],
+        max_limit=CONFIG['MAX_WORKERS_CEILING'],
+        target_latency=CONFIG['TARGET_LATENCY_SECONDS']
+    )
+    async_stats = {} if fetch_mode == 'async' else None
+    pipeline_stats = {} if fetch_mode == 'pipeline' else None
+
+    def run_stage(tasks, gather):
+        return run_io_stage(tasks, gather, controller, fetch_mode, async_stats, pipeline_stats)
+
+    reuse, incremental = plan_incremental(survivors, previous) if previous else (None, None)
+    capture = {}
+    outcomes = evaluate_survivors(survivors, run_stage, capture, reuse=reuse)
     
-    # 2. Análisis paralelo
-    results = []
-    with ThreadPoolExecutor(max_workers=CONFIG['MAX_WORKERS']) as executor:
-        futures = {executor.submit(analyze_stock_v7, t): t for t in tickers}
-        for future in as_completed(futures):
-            r = future.result()
-            if r: results.append(r)
+    concurrency_profile = controller.profile()
+    if pipeline_stats is not None:
+        concurrency_profile['pipeline'] = pipeline_stats
+    try:
+        get_metadata_index().flush()
+    except Exception as e:
+        log(f"⚠ Error guardando índice de metadata: {e}")
+    log(f"🎚️  Concurrencia: inicial {concurrency_profile['initial']}, final {concurrency_profile['final']}, "
+        f"pico {concurrency_profile['peak']}, media {concurrency_profile['mean']} "
+        f"({concurrency_profile['throttled']} throttled, {concurrency_profile['errors']} errores)")
+
+    return {
+        'survivors': len(survivors),
+        'outcomes': outcomes,
+        'concurrency_profile': concurrency_profile,
+        'async_stats': async_stats,
+        'fetch_mode': fetch_mode,
+        'screen_inputs': capture['screen_inputs'],
+        'incremental': incremental
+    }
+
+
+def build_result(total_analyzed, analysis, start_time, universe=None):
+    """
+    Construye el objeto de resultado habitual a partir de los outcomes
+
+    Args:
+        total_analyzed: Tickers del universo analizado
+        analysis: Dict de analyze_universe (o la fusión de los shards)
+        start_time: time.time() del inicio del run
+        universe: Resumen del snapshot del universo (snapshot_summary) o None
+    """
+    outcomes = analysis['outcomes']
+    survivors = analysis['survivors']
+    outcome_counts = summarize_outcomes(outcomes)
+    unresolved = sorted(o.ticker for o in outcomes if o.unresolved)
+    results = [o.row for o in outcomes if o.status == OK]
+    fetch_stats = summarize_calls([o.calls for o in outcomes])
+    log(f"🧾 Outcomes: {outcome_counts}")
+    log(f"📞 Llamadas de red: {fetch_stats['network']} ({fetch_stats['network_per_ticker']}/ticker), "
+        f"almacén: {fetch_stats['store']}")
     
-    # 3. Procesar resultados
+    # Procesar resultados
     if not results:
+        if outcome_counts[THROTTLED] or outcome_counts[TRANSIENT_ERROR]:
+            reason = f"rate-limit/errores de red en {len(unresolved)} tickers"
+        else:
+            reason = "filtros muy estrictos"
         error_result = {
-            "error": "Sin resultados (posible rate-limit o filtros muy estrictos)",
-            "total_analyzed": len(tickers),
+            "error": f"Sin resultados ({reason})",
+            "total_analyzed": total_analyzed,
+            "market_cap_survivors": survivors,
             "candidates_count": 0,
+            "outcomes": outcome_counts,
+            "unresolved_tickers": unresolved,
+            "fetch_stats": fetch_stats,
+            "concurrency_profile": analysis['concurrency_profile'],
+            "fetch_mode": analysis['fetch_mode'],
+            "incremental": analysis.get('incremental'),
+            "universe": universe,
             "from_cache": False,
             "generated_at": datetime.now().isoformat()
         }
@@ -470,20 +1211,21 @@ def run_analysis():
     df = pd.DataFrame(results)
     df = df.sort_values(by='MOS', ascending=False, na_position='last')
     
-    # 4. Clasificación
+    # Clasificación
     buy_candidates = df[df['MOS'] > 0.10].copy() if 'MOS' in df.columns else pd.DataFrame()
     fair_value = df[(df['MOS'] > 0) & (df['MOS'] <= 0.10)].copy() if 'MOS' in df.columns else pd.DataFrame()
     watchlist = df[df['MOS'] <= 0].copy() if 'MOS' in df.columns else pd.DataFrame()
     
-    # 5. Resultado final
+    # Resultado final
     execution_time = round(time.time() - start_time, 2)
     
     # Convertir TODOS los resultados a diccionarios (ordenados por MOS)
     all_results = df.replace({np.nan: None}).to_dict('records')
     
     result = {
-        "total_analyzed": len(tickers),
+        "total_analyzed": total_analyzed,
         "candidates_count": len(df),
+        "market_cap_survivors": survivors,
         "results": all_results,  # TODOS los resultados, ordenados por MOS descendente
         "summary": {
             "buy_zone_count": len(buy_candidates),      # MOS > 10%
@@ -493,22 +1235,469 @@ def run_analysis():
         "generated_at": datetime.now().isoformat(),
         "cache_enabled": GCS_AVAILABLE,
         "from_cache": False,
-        "execution_time_seconds": execution_time
+        "execution_time_seconds": execution_time,
+        "concurrency_profile": analysis['concurrency_profile'],
+        "fetch_mode": analysis['fetch_mode'],
+        "async_fetch": analysis['async_stats'],
+        "outcomes": outcome_counts,
+        "unresolved_tickers": unresolved,
+        "fetch_stats": fetch_stats,
+        "incremental": analysis.get('incremental'),
+        "universe": universe
     }
     
     log("="*60)
     log(f"💎 RESULTADOS FINALES ({len(df)} encontrados):")
-    log(f"📊 Total analizados: {len(tickers)}")
+    log(f"📊 Total analizados: {total_analyzed}")
+    log(f"💵 Superan capitalización: {survivors}")
     log(f"⭐ Candidatos finales: {len(df)}")
     log(f"   🟢 Zona de Compra (MOS > 10%): {len(buy_candidates)}")
     log(f"   🟡 Valor Justo (MOS 0-10%): {len(fair_value)}")
     log(f"   🔴 Watchlist (MOS < 0%): {len(watchlist)}")
     log(f"⏱️  Tiempo de ejecución: {execution_time}s")
     log("="*60)
+    return result
+
+
+def cache_if_resolved(result):
+    """Guarda en caché salvo que el run esté degradado por rate-limit"""
+    if 'error' in result:
+        return False
+    survivors = result.get('market_cap_survivors') or 0
+    unresolved = result.get('unresolved_tickers') or []
+    unresolved_ratio = len(unresolved) / survivors if survivors else 0
+    if unresolved_ratio > CONFIG['MAX_UNRESOLVED_RATIO']:
+        log(f"⚠️  {len(unresolved)} tickers sin resolver ({unresolved_ratio:.0%}), el resultado no se cachea")
+        return False
+    return save_to_cache(result)
+
+
+# Umbrales que /analyze acepta como query params: {param: (clave de CONFIG, tipo)}
+THRESHOLD_PARAMS = {
+    'min_roic': ('MIN_ROIC', float),
+    'min_piotroski': ('MIN_PIOTROSKI', int),
+    'discount_rate': ('DISCOUNT_RATE', float),
+    'mos_view': ('MARGIN_OF_SAFETY_VIEW', float)
+}
+
+
+def parse_threshold_overrides(args):
+    """
+    Umbrales pedidos en la query (el resto, los de CONFIG)
+
+    Returns:
+        {clave de CONFIG: valor} o None si la query no cambia ningún umbral
+
+    Raises:
+        ValueError: Si algún valor no es numérico, no es finito (nan / inf) o
+                    discount_rate no supera TERMINAL_GROWTH (el valor terminal
+                    de Gordon no está definido y el DCF daría NaN)
+    """
+    overrides = {}
+    for param, (key, cast) in THRESHOLD_PARAMS.items():
+        value = args.get(param)
+        if value is None or value == '':
+            continue
+        try:
+            overrides[key] = cast(value)
+        except ValueError:
+            raise ValueError(f"{param} must be {cast.__name__}")
+        if not np.isfinite(overrides[key]):
+            raise ValueError(f"{param} must be a finite number")
+    if overrides.get('DISCOUNT_RATE', np.inf) <= TERMINAL_GROWTH:
+        raise ValueError(f"discount_rate must be greater than the terminal growth rate ({TERMINAL_GROWTH})")
+    if not overrides:
+        return None
+    return dict({key: CONFIG[key] for key, _ in THRESHOLD_PARAMS.values()}, **overrides)
+
+
+def screen_inputs_payload(total_analyzed, analysis, universe=None):
+    """
+    Entradas del motor de un run, serializables, para re-evaluar sin red
+
+    Incluye los outcomes de los tickers que no llegaron al motor (sin
+    cotización, sin income/balance, throttled...): no dependen de los umbrales.
+    """
+    screen_inputs = analysis['screen_inputs']
+    engine_tickers = screen_inputs.batch.index
+    return {
+        'generated_at': datetime.now().isoformat(),
+        'total_analyzed': total_analyzed,
+        'survivors': analysis['survivors'],
+        'universe': universe,
+        'thresholds': {key: CONFIG[key] for key, _ in THRESHOLD_PARAMS.values()},
+        'inputs': screen_inputs.to_dict(),
+        'outcomes': [o.to_dict() for o in analysis['outcomes'] if o.ticker not in engine_tickers]
+    }
+
+
+def rescreen(payload, thresholds):
+    """
+    Re-evalúa ROIC, Piotroski, DCF y MOS con otros umbrales sobre las
+    entradas cacheadas (sin red)
+
+    El cashflow solo se descargó para los tickers que superaron los umbrales
+    del run original: si con los nuevos alguno más lo necesita, queda como
+    NO_DATA y se lista en screen.cashflow_not_cached.
+    """
+    start_time = time.time()
+    log(f"♻️  Re-evaluando entradas cacheadas ({payload['generated_at']}) con {thresholds}")
+    screen_inputs = ScreenInputs.from_dict(payload['inputs'])
+    batch = screen_inputs.batch
+
+    quality = screen_quality(batch, thresholds['MIN_ROIC'], thresholds['MIN_PIOTROSKI'])
+    needs_cashflow = (quality['status'] == PENDING) & ~batch.cashflow_loaded
+    not_cached = []
+    for i in np.flatnonzero(needs_cashflow):
+        ticker = batch.tickers[i]
+        failure = screen_inputs.cashflow_failures.get(ticker)
+        quality['status'][i] = failure.status if failure else NO_DATA
+        quality['reason'][i] = failure.reason if failure else 'cashflow no cacheado'
+        if not failure:
+            not_cached.append(ticker)
+
+    valuation = value_batch(batch, quality, thresholds['MIN_PIOTROSKI'],
+                            thresholds['DISCOUNT_RATE'], thresholds['MARGIN_OF_SAFETY_VIEW'])
+    rows = records(batch, valuation, screen_inputs.sectors)
+
+    metadata = get_metadata_index()
+    outcomes = [AnalysisOutcome.from_dict(o) for o in payload['outcomes']]
+    for i, ticker in enumerate(batch.tickers):
+        if ticker in rows:
+            row = rows[ticker]
+            if row['Sector'] == 'N/A':
+                row['Sector'] = metadata.get_sector(ticker) or 'N/A'
+            outcomes.append(AnalysisOutcome.ok(ticker, row))
+        else:
+            outcomes.append(AnalysisOutcome(ticker, valuation['status'][i], reason=valuation['reason'][i]))
+
+    analysis = {
+        'survivors': payload['survivors'],
+        'outcomes': outcomes,
+        'concurrency_profile': None,
+        'async_stats': None,
+        'fetch_mode': 'cached_inputs'
+    }
+    result = build_result(payload['total_analyzed'], analysis, start_time, payload.get('universe'))
+    result['screen'] = {
+        'thresholds': thresholds,
+        'inputs_generated_at': payload['generated_at'],
+        'inputs_thresholds': payload['thresholds'],
+        'cashflow_not_cached': not_cached
+    }
+    if not_cached:
+        log(f"⚠️  {len(not_cached)} tickers superan los nuevos umbrales pero su cashflow no está cacheado")
+    return result
+
+
+def summarize_zones(mos):
+    """Filas por zona de MOS (misma clasificación que build_result)"""
+    mos = np.asarray(mos, dtype=float)
+    return {
+        "buy_zone_count": int((mos > 0.10).sum()),                   # MOS > 10%
+        "fair_zone_count": int(((mos > 0) & (mos <= 0.10)).sum()),   # MOS 0-10%
+        "watch_zone_count": int((mos <= 0).sum())                    # MOS < 0%
+    }
+
+def revalue_results(cached):
+    """
+    Revaloración intradía: solo cambian Price y MOS
+
+    Intrinsic, ROIC y Piotroski dependen de los estados anuales, así que se
+    reutilizan los del resultado cacheado; se piden las cotizaciones de todos
+    los candidatos en lote y se recalculan MOS y zonas. Los candidatos son los
+    del último análisis completo (no entran ni salen tickers).
+
+    Args:
+        cached: Resultado cacheado (get_full_cached_data)
+
+    Returns:
+        Nuevo resultado, o None si el proveedor no devolvió ninguna cotización
+    """
+    start_time = time.time()
+    rows = [dict(row) for row in cached.get('results') or []]
+    tickers = [row['Ticker'] for row in rows]
+    quotes = get_provider().quotes(tickers) if tickers else {}
+    if tickers and not quotes:
+        return None
+
+    stale = []
+    prices = []
+    for row in rows:
+        price = (quotes.get(row['Ticker']) or {}).get('last_price')
+        if not (isinstance(price, (int, float)) and price > 0):
+            stale.append(row['Ticker'])
+            price = row.get('Price')
+        prices.append(np.nan if price is None else price)
+
+    intrinsic = np.array([np.nan if row.get('Intrinsic') is None else row['Intrinsic'] for row in rows], dtype=float)
+    mos = np.atleast_1d(margin_of_safety(intrinsic, np.asarray(prices, dtype=float)))
+    for row, price, value in zip(rows, prices, mos):
+        row['Price'] = round(float(price), 2) if np.isfinite(price) else None
+        row['MOS'] = float(value)
+    order = np.argsort(-mos, kind='stable')
+    rows = [rows[i] for i in order]
+
+    previous = cached.get('revaluation') or {}
+    result = dict(cached, results=rows, summary=summarize_zones(mos), from_cache=False)
+    for key in ('post_processed', 'stale', 'refresh'):
+        result.pop(key, None)
+    result['revaluation'] = {
+        'revalued_at': datetime.now().isoformat(),
+        'base_generated_at': previous.get('base_generated_at', cached.get('generated_at')),
+        'count': previous.get('count', 0) + 1,
+        'quotes': len(quotes),
+        'stale_prices': stale,
+        'seconds': round(time.time() - start_time, 2)
+    }
+    log(f"💱 Revaloración: {len(rows) - len(stale)}/{len(rows)} precios actualizados, "
+        f"zonas {result['summary']} ({result['revaluation']['seconds']}s)")
+    return result
+
+
+def run_analysis(fetch_mode=None, thresholds=None, incremental=None):
+    """
+    Ejecuta el análisis completo con caché
+
+    Args:
+        fetch_mode: 'threads', 'async' o 'pipeline' (por defecto CONFIG['FETCH_MODE'])
+        thresholds: Umbrales distintos de CONFIG (ver parse_threshold_overrides):
+                    se re-evalúan las entradas cacheadas sin volver a descargar
+        incremental: Reutilizar del run anterior los tickers sin cambios
+                     (por defecto CONFIG['INCREMENTAL'])
+    """
+    
+    if thresholds is not None:
+        payload = get_cached_screen_inputs()
+        if payload is not None:
+            return rescreen(payload, thresholds)
+        log("⚠️  No hay entradas cacheadas: análisis completo antes de re-evaluar")
+    else:
+        # Verificar caché primero (caducado: se sirve y se refresca en segundo plano)
+        cached = get_cached_results()
+        if cached is not None:
+            cached['from_cache'] = True
+            return cached
+    
+    # Si no hay caché, ejecutar análisis (o unirse al que ya está en curso)
+    outcome = None
+    while outcome is None:  # None: se unió a un refresco de fondo que cedió a otra instancia
+        outcome = refresher.do(ANALYSIS_FLIGHT, lambda: _leased_analysis(fetch_mode, incremental))
+    result, payload = outcome
+    if thresholds is not None:
+        return rescreen(payload, thresholds)
+    # Copia superficial: el resultado se comparte con las peticiones que se unieron
+    return dict(result)
+
+
+def start_background_refresh():
+    """
+    Lanza el análisis completo en segundo plano si no hay otro en curso
+
+    Returns:
+        True si se lanzó, False si ya había uno en curso en este proceso
+    """
+    return refresher.start(ANALYSIS_FLIGHT, _background_refresh)
+
+
+def _background_refresh():
+    try:
+        return _leased_analysis(wait=False)
+    except Exception as e:
+        log(f"❌ Error en el refresco en segundo plano: {e}")
+        raise
+
+
+def refresh_lease():
+    """Lease del análisis completo entre instancias (None sin bucket)"""
+    if not GCS_AVAILABLE:
+        return None
+    return BlobLease(bucket, REFRESH_LEASE_NAME, CONFIG['REFRESH_LEASE_SECONDS'],
+                     CONFIG['REFRESH_LEASE_HEARTBEAT_SECONDS'])
+
+
+def _fresh_analysis():
+    """(resultado, entradas del screener) del caché si está dentro del TTL, o None"""
+    try:
+        manifest = get_cache_manifest()
+    except (KeyError, ValueError, TypeError):
+        return None
+    if not manifest or datetime.now() - manifest['cached_at'] >= timedelta(hours=CACHE_TTL_HOURS):
+        return None
+    data, _ = results_cache.get()
+    payload = get_cached_screen_inputs()
+    if data is None or "results" not in data or payload is None:
+        return None
+    return dict(data["results"], from_cache=True), payload
+
+
+def _leased_analysis(fetch_mode=None, incremental=None, wait=True):
+    """
+    Análisis completo coordinado entre instancias
+
+    Solo analiza la instancia que tiene el lease del bucket (creado con
+    if_generation_match=0 y renovado por heartbeat). Si al tomarlo el caché
+    ya está vigente, otra instancia acaba de refrescarlo y se usa ese: un
+    único análisis por ventana de expiración. Las demás esperan al resultado
+    de la que lo tiene (wait=True) o desisten y siguen sirviendo el caché
+    caducado (wait=False, refresco en segundo plano).
+
+    Returns:
+        (resultado, entradas del screener), o None si wait=False y otra
+        instancia está analizando
+    """
+    lease = refresh_lease()
+    if lease is None:
+        return _full_analysis(fetch_mode, incremental)
+
+    waiting = False
+    while True:
+        if lease.acquire():
+            with lease:
+                fresh = _fresh_analysis()
+                if fresh is not None:
+                    log("✓ Otra instancia acaba de refrescar el caché: se usa su resultado")
+                    return fresh
+                log(f"🔒 Lease de análisis tomado ({lease.owner})")
+                result = _full_analysis(fetch_mode, incremental)
+            if lease.lost:
+                log("⚠️  El lease caducó durante el análisis (otra instancia pudo repetirlo)")
+            return result
+
+        holder = lease.holder() or {}
+        if not wait:
+            log(f"⏳ La instancia {holder.get('owner')} ya está analizando: se sigue sirviendo el caché")
+            return None
+        if not waiting:
+            log(f"⏳ Esperando al análisis de la instancia {holder.get('owner')}...")
+            waiting = True
+        time.sleep(CONFIG['REFRESH_LEASE_POLL_SECONDS'])
+        fresh = _fresh_analysis()
+        if fresh is not None:
+            return fresh
+
+
+def _full_analysis(fetch_mode=None, incremental=None):
+    """
+    Análisis completo del universo; cachea resultado y entradas del screener
+
+    Returns:
+        (resultado, entradas del screener)
+    """
+    start_time = time.time()
+    
+    log("🎯 Iniciando Warren Screener v8")
+    log("="*60)
+    
+    # 1. Obtener universo (snapshot versionado)
+    universe = get_universe_snapshot()
+    tickers = universe['tickers']
+    log(f"🎯 Objetivo Real: Analizar {len(tickers)} empresas.")
     
-    # Guardar en caché
-    save_to_cache(result)
+    # 2-3. Prefiltro y análisis (completo, o incremental sobre el run anterior)
+    previous = None
+    if CONFIG['INCREMENTAL'] if incremental is None else incremental:
+        previous = get_cached_screen_inputs(CONFIG['INCREMENTAL_MAX_AGE_HOURS'])
+        if previous is None:
+            log("⚠️  Sin entradas del run anterior: análisis completo")
+    analysis = analyze_universe(tickers, fetch_mode=fetch_mode, previous=previous)
     
+    # 4. Resultado
+    result = build_result(len(tickers), analysis, start_time, snapshot_summary(universe))
+    payload = screen_inputs_payload(len(tickers), analysis, snapshot_summary(universe))
+    if cache_if_resolved(result):
+        save_screen_inputs(payload)
+    return result, payload
+
+# ==========================================
+# 4. MODO POR SHARDS (VARIAS INSTANCIAS)
+# ==========================================
+def _require_shard_store():
+    if shard_store is None:
+        raise RuntimeError("El modo por shards requiere un bucket (GCS o LOCAL_BUCKET_DIR)")
+    return shard_store
+
+
+def plan_sharded_run(num_shards, tickers=None):
+    """
+    Coordinador: reparte el universo en shards y publica el plan en el bucket
+
+    Args:
+        num_shards: Número de shards
+        tickers: Lista explícita de tickers (por defecto el snapshot vigente)
+
+    Returns:
+        Plan {'run_id', 'shards': [[tickers]], 'universe', ...}
+    """
+    store = _require_shard_store()
+    universe = None
+    if tickers is None:
+        universe = get_universe_snapshot()
+        tickers = universe['tickers']
+    plan = store.create_plan(split_shards(tickers, num_shards),
+                             universe=snapshot_summary(universe) if universe else None)
+    log(f"🧩 Run {plan['run_id']}: {len(tickers)} tickers en {len(plan['shards'])} shards")
+    return plan
+
+
+def run_shard(run_id, index, fetch_mode=None, auto_merge=True):
+    """
+    Worker: analiza un shard del plan y sube el resultado parcial al bucket
+
+    Args:
+        auto_merge: Si con este shard el run queda completo, reservar la
+                    fusión (merge.claim) y fusionar aquí mismo
+    """
+    store = _require_shard_store()
+    plan = store.load_plan(run_id)
+    tickers = plan['shards'][index]
+    start_time = time.time()
+    log(f"🧩 Shard {index + 1}/{len(plan['shards'])} del run {run_id}: {len(tickers)} tickers")
+
+    analysis = analyze_universe(tickers, fetch_mode=fetch_mode)
+    store.write_partial(run_id, index, tickers, analysis, time.time() - start_time)
+    log(f"✓ Shard {index + 1} guardado ({len(analysis['outcomes'])} outcomes)")
+
+    # El último shard en terminar fusiona (uno solo aunque terminen a la vez)
+    merged = False
+    if auto_merge and store.status(run_id, plan)['complete'] \
+            and store.claim_merge(run_id, f"shard-{index}"):
+        log(f"🧩 Run {run_id} completo: fusionando desde el shard {index + 1}")
+        merged = merge_sharded_run(run_id).get('complete', True)
+    return {
+        'run_id': run_id,
+        'shard': index,
+        'tickers': len(tickers),
+        'survivors': analysis['survivors'],
+        'outcomes': summarize_outcomes(analysis['outcomes']),
+        'elapsed_seconds': round(time.time() - start_time, 2),
+        'merged': merged
+    }
+
+
+def merge_sharded_run(run_id):
+    """
+    Fusiona los parciales de un run en el resultado habitual y lo cachea
+
+    Returns:
+        Resultado completo, o {'complete': False, ...} si faltan shards
+    """
+    store = _require_shard_store()
+    plan = store.load_plan(run_id)
+    status = store.status(run_id, plan)
+    if not status['complete']:
+        return status
+
+    analysis = merge_partials(store.load_partials(run_id, plan))
+    total = sum(len(shard) for shard in plan['shards'])
+    result = build_result(total, analysis, plan['created_ts'], plan.get('universe'))
+    result['sharding'] = {
+        'run_id': run_id,
+        'shards': len(plan['shards']),
+        'shard_seconds': analysis['shard_seconds']
+    }
+    if cache_if_resolved(result) and analysis['screen_inputs'] is not None:
+        save_screen_inputs(screen_inputs_payload(total, analysis, plan.get('universe')))
     return result
 
 # -------- Flask App --------
@@ -532,13 +1721,21 @@ def home():
             "Margen de seguridad calculado vs precio actual"
         ],
         "filters": {
-            "min_market_cap": "5B USD",
+            "min_market_cap": f"{CONFIG['MIN_MARKET_CAP']/1e9:.0f}B USD",
             "min_roic": f"{CONFIG['MIN_ROIC']*100}%",
             "min_piotroski": CONFIG['MIN_PIOTROSKI'],
             "discount_rate": f"{CONFIG['DISCOUNT_RATE']*100}%"
         },
         "endpoints": {
-            "/analyze": "Run analysis (with 24h cache + auto post-processing)",
+            "/analyze": "Run analysis (with 24h cache + auto post-processing). ?mode=threads|async|pipeline&incremental=0|1 "
+                        "&min_roic=&min_piotroski=&discount_rate=&mos_view= (re-screen cached inputs)",
+            "/revalue": "Intraday refresh: batched quotes -> Price, MOS and zones of the cached candidates",
+            "/shard/start": "Sharded run coordinator. ?shards=N&mode=..., POST {\"tickers\": [...]} for universes beyond the default ~520 names (dispatches to SHARD_WORKER_URL, returns 202)",
+            "/shard/run": "Sharded run worker. ?run_id=...&shard=i",
+            "/shard/status": "Completed / pending shards. ?run_id=...",
+            "/shard/merge": "Merge shard partials into the usual result. ?run_id=...",
+            "/sensitivity": "Intrinsic/MOS grid over discount × growth × terminal growth (cached inputs)",
+            "/monte-carlo": "Monte Carlo DCF: intrinsic percentile bands and P(MOS > 0). ?samples=&seed=",
             "/refine": "GET - Portfolio Manager Review (adjust growth by sector)",
             "/follow": "POST - Portfolio Performance Tracker (analyze your portfolio)",
             "/post-process": "POST - Manual post-processing of results",
@@ -550,12 +1747,37 @@ def home():
             "auto_post_processing": POST_PROCESSOR_AVAILABLE,
             "portfolio_refinement": PORTFOLIO_REFINER_AVAILABLE,
             "portfolio_tracking": PORTFOLIO_TRACKER_AVAILABLE,
+            "fundamentals_store": fundamentals_store is not None,
+            "sharding": shard_store is not None,
             "sector_analysis": POST_PROCESSOR_AVAILABLE,
             "portfolio_metrics": POST_PROCESSOR_AVAILABLE,
             "smart_alerts": POST_PROCESSOR_AVAILABLE
         }
     })
 
+def _analysis_response(results):
+    """Post-procesa un resultado de análisis y lo serializa (NaN/Infinity -> null)"""
+    # Post-procesamiento automático
+    if POST_PROCESSOR_AVAILABLE and results.get('candidates_count', 0) > 0:
+        try:
+            log("🔄 Ejecutando post-procesamiento...")
+            processor = ResultsPostProcessor(results)
+            processed_data = processor.process_all()
+            
+            # Agregar datos procesados a la respuesta
+            results['post_processed'] = processed_data
+            log("✅ Post-procesamiento completado")
+        except Exception as e:
+            log(f"⚠️  Error en post-procesamiento: {e}")
+            results['post_processed'] = None
+    
+    response = app.response_class(
+        response=cache_codec.dumps(results),
+        status=200,
+        mimetype='application/json'
+    )
+    return response
+
 @app.route('/analyze')
 def analyze():
     """Endpoint principal de análisis"""
@@ -564,31 +1786,20 @@ def analyze():
         log("📊 Nueva petición de análisis recibida")
         log("="*60)
         
-        results = run_analysis()
+        fetch_mode = request.args.get('mode')
+        if fetch_mode not in (None,) + FETCH_MODES:
+            return jsonify({"error": f"mode must be one of {FETCH_MODES}"}), 400
+        incremental = request.args.get('incremental')
+        if incremental not in (None, '0', '1'):
+            return jsonify({"error": "incremental must be 0 or 1"}), 400
+        try:
+            thresholds = parse_threshold_overrides(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        # Post-procesamiento automático
-        if POST_PROCESSOR_AVAILABLE and results.get('candidates_count', 0) > 0:
-            try:
-                log("🔄 Ejecutando post-procesamiento...")
-                processor = ResultsPostProcessor(results)
-                processed_data = processor.process_all()
-                
-                # Agregar datos procesados a la respuesta
-                results['post_processed'] = processed_data
-                log("✅ Post-procesamiento completado")
-            except Exception as e:
-                log(f"⚠️  Error en post-procesamiento: {e}")
-                results['post_processed'] = None
-        
-        response = app.response_class(
-            response=json.dumps(results, default=str, allow_nan=False)
-                     .replace('NaN', 'null')
-                     .replace('Infinity', 'null')
-                     .replace('-Infinity', 'null'),
-            status=200,
-            mimetype='application/json'
-        )
-        return response
+        results = run_analysis(fetch_mode=fetch_mode, thresholds=thresholds,
+                               incremental=None if incremental is None else incremental == '1')
+        return _analysis_response(results)
         
     except Exception as e:
         log(f"❌ Error en análisis: {str(e)}")
@@ -596,6 +1807,282 @@ def analyze():
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@app.route('/revalue', methods=['GET', 'POST'])
+def revalue():
+    """
+    Refresco intradía: precios en lote + MOS y zonas sobre el último
+    análisis cacheado, guardado como nueva versión del caché
+
+    La escritura va condicionada a la generación leída: si entre medias un
+    análisis completo (de esta u otra instancia) reemplazó el caché, no se
+    pisa y se responde 409. Con un refresco en curso en esta instancia
+    (p.ej. el que lanza leer un caché caducado) se responde 409 sin revalorar.
+    """
+    try:
+        source = {}
+        cached = get_full_cached_data(source)
+        if cached is None or 'results' not in cached:
+            return jsonify({"error": "No cached analysis: run /analyze first"}), 404
+
+        refresh = refresher.status(ANALYSIS_FLIGHT)
+        if refresh['in_flight']:
+            return jsonify({"error": "A full analysis is refreshing the cache: retry /revalue when it finishes",
+                            "refresh": refresh}), 409
+
+        result = revalue_results(cached)
+        if result is None:
+            return jsonify({"error": "Quote provider returned no prices"}), 503
+
+        # El TTL sigue contando desde el análisis completo
+        base = result['revaluation']['base_generated_at']
+        try:
+            save_to_cache(result, cached_at=datetime.fromisoformat(base) if base else None,
+                          if_generation_match=source['generation'])
+        except PreconditionFailed:
+            return jsonify({"error": "Cache was replaced by a newer analysis while revaluing: retry /revalue"}), 409
+        return _analysis_response(result)
+
+    except Exception as e:
+        log(f"❌ Error en revaloración: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/shard/start', methods=['GET', 'POST'])
+def shard_start():
+    """
+    Coordinador del modo por shards
+
+    Query: ?shards=N&mode=threads|async|pipeline
+    Body (opcional): {"tickers": [...]} para analizar una lista propia; sin
+    él se usa el universo por defecto (unión S&P 500 + Nasdaq 100, ~520
+    nombres, límite UNIVERSE_MAX_TICKERS), así que 3.000-5.000 tickers
+    requieren pasar la lista
+    Con SHARD_WORKER_URL lanza los shards en segundo plano y responde 202
+    con el run_id (el último shard en terminar fusiona y cachea); si no,
+    devuelve el plan
+    """
+    if shard_store is None:
+        return jsonify({"error": "Sharding requires a bucket (GCS or LOCAL_BUCKET_DIR)"}), 503
+    try:
+        num_shards = int(request.args.get('shards', CONFIG['SHARDS']))
+        fetch_mode = request.args.get('mode')
+        if num_shards < 1:
+            return jsonify({"error": "shards must be >= 1"}), 400
+        if fetch_mode not in (None,) + FETCH_MODES:
+            return jsonify({"error": f"mode must be one of {FETCH_MODES}"}), 400
+
+        body = request.get_json(silent=True) or {}
+        tickers = body.get('tickers')
+        if tickers is not None:
+            tickers = build_ticker_list([tickers], limit=len(tickers))
+
+        plan = plan_sharded_run(num_shards, tickers=tickers)
+        run_id = plan['run_id']
+        response_data = {
+            "run_id": run_id,
+            "shards": len(plan['shards']),
+            "shard_sizes": [len(shard) for shard in plan['shards']],
+            "universe": plan['universe']
+        }
+        if not SHARD_WORKER_URL:
+            response_data["message"] = "Plan created: call /shard/run?run_id=...&shard=i per shard, then /shard/merge"
+            return jsonify(response_data)
+
+        log(f"📡 Lanzando {len(plan['shards'])} shards contra {SHARD_WORKER_URL}")
+        dispatch_in_background(
+            SHARD_WORKER_URL, run_id, range(len(plan['shards'])),
+            timeout=CONFIG['SHARD_TIMEOUT_SECONDS'], fetch_mode=fetch_mode, log=log
+        )
+        response_data.update({
+            "dispatched": True,
+            "message": "Shards dispatched; the last one to finish merges and caches the result",
+            "status_url": f"/shard/status?run_id={run_id}",
+            "merge_url": f"/shard/merge?run_id={run_id}"
+        })
+        return jsonify(response_data), 202
+
+    except Exception as e:
+        log(f"❌ Error en coordinador de shards: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/shard/run')
+def shard_run():
+    """Worker: analiza un shard (?run_id=...&shard=i&mode=threads|async|pipeline)"""
+    if shard_store is None:
+        return jsonify({"error": "Sharding requires a bucket (GCS or LOCAL_BUCKET_DIR)"}), 503
+    run_id = request.args.get('run_id')
+    fetch_mode = request.args.get('mode')
+    try:
+        index = int(request.args.get('shard', ''))
+    except ValueError:
+        return jsonify({"error": "shard must be an integer"}), 400
+    if not run_id:
+        return jsonify({"error": "run_id is required"}), 400
+    if fetch_mode not in (None,) + FETCH_MODES:
+        return jsonify({"error": f"mode must be one of {FETCH_MODES}"}), 400
+    try:
+        return jsonify(run_shard(run_id, index, fetch_mode=fetch_mode))
+    except (KeyError, IndexError) as e:
+        return jsonify({"error": f"Unknown run or shard: {e}"}), 404
+    except Exception as e:
+        log(f"❌ Error en shard {index} del run {run_id}: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/shard/status')
+def shard_status():
+    """Shards completados y pendientes de un run (?run_id=...)"""
+    if shard_store is None:
+        return jsonify({"error": "Sharding requires a bucket (GCS or LOCAL_BUCKET_DIR)"}), 503
+    try:
+        return jsonify(shard_store.status(request.args.get('run_id', '')))
+    except KeyError as e:
+        return jsonify({"error": str(e)}), 404
+
+@app.route('/shard/merge')
+def shard_merge():
+    """Fusiona los parciales de un run en el resultado habitual (?run_id=...)"""
+    if shard_store is None:
+        return jsonify({"error": "Sharding requires a bucket (GCS or LOCAL_BUCKET_DIR)"}), 503
+    try:
+        results = merge_sharded_run(request.args.get('run_id', ''))
+        if not results.get('complete', True):
+            return jsonify(results), 409
+        return _analysis_response(results)
+    except KeyError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        log(f"❌ Error fusionando shards: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/sensitivity')
+def sensitivity_endpoint():
+    """
+    Sensibilidad del DCF de los candidatos del último análisis cacheado
+    (no descarga nada: usa FCF, Cash, Debt y Shares de cada fila)
+
+    Query params (listas separadas por comas, opcionales):
+        discount_rates, growth_rates, terminal_growths, tickers
+    """
+    try:
+        grid = {axis: parse_axis(request.args.get(axis), default) for axis, default in DEFAULT_GRID.items()}
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    points = int(np.prod([len(values) for values in grid.values()]))
+    if points > MAX_GRID_POINTS:
+        return jsonify({"error": f"Grid too large ({points} points, max {MAX_GRID_POINTS})"}), 400
+
+    data = get_full_cached_data()
+    if not data or not data.get('results'):
+        return jsonify({"error": "No cached analysis results. Run /analyze first."}), 404
+
+    rows = data['results']
+    wanted = request.args.get('tickers')
+    if wanted:
+        wanted = {t.strip().upper() for t in wanted.split(',') if t.strip()}
+        rows = [row for row in rows if row.get('Ticker') in wanted]
+
+    tickers, inputs, missing = split_inputs(rows)
+    if missing:
+        log(f"⚠️  {len(missing)} filas sin entradas del DCF (caché anterior), se omiten")
+
+    start = time.time()
+    intrinsic, mos = sensitivity_grid(inputs, **grid)
+    summary = summarize_grid(mos)
+    compute_seconds = time.time() - start
+    log(f"📐 Sensibilidad: {len(tickers)} tickers × {points} escenarios en {compute_seconds * 1000:.1f} ms")
+
+    return jsonify({
+        "generated_at": data.get('generated_at'),
+        "base_discount_rate": CONFIG['DISCOUNT_RATE'],
+        "grid": dict(grid, axes=['ticker', 'discount_rate', 'growth_rate', 'terminal_growth'],
+                     shape=list(intrinsic.shape)),
+        "tickers": tickers,
+        "intrinsic": to_json_lists(intrinsic, 2),
+        "mos": to_json_lists(mos),
+        "summary": {
+            ticker: {key: to_json_lists(values[i]) for key, values in summary.items()}
+            for i, ticker in enumerate(tickers)
+        },
+        "missing_inputs": missing,
+        "compute_seconds": round(compute_seconds, 4)
+    })
+
+@app.route('/monte-carlo', methods=['GET', 'POST'])
+def monte_carlo_endpoint():
+    """
+    Valoración Monte Carlo de los candidatos del último análisis cacheado
+    (crecimiento, tasa y crecimiento terminal muestreados; sin descargas)
+
+    Parámetros (query o JSON): samples, seed, workers, tickers
+    JSON opcional: distributions, p.ej. {"growth": {"sd": 0.05}}
+    """
+    body = (request.get_json(silent=True) or {}) if request.method == 'POST' else {}
+    if not isinstance(body, dict):
+        return jsonify({"error": "JSON body must be an object"}), 400
+    try:
+        samples = int(body.get('samples', request.args.get('samples', CONFIG['MONTE_CARLO_SAMPLES'])))
+        seed = int(body.get('seed', request.args.get('seed', 0)))
+        workers = body.get('workers', request.args.get('workers'))
+        workers = int(workers) if workers is not None else None
+        distributions = monte_carlo.merge_distributions(body.get('distributions'))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    if not 1 <= samples <= CONFIG['MONTE_CARLO_MAX_SAMPLES']:
+        return jsonify({"error": f"samples must be between 1 and {CONFIG['MONTE_CARLO_MAX_SAMPLES']}"}), 400
+
+    data = get_full_cached_data()
+    if not data or not data.get('results'):
+        return jsonify({"error": "No cached analysis results. Run /analyze first."}), 404
+
+    rows = data['results']
+    wanted = body.get('tickers', request.args.get('tickers'))
+    if wanted:
+        if isinstance(wanted, str):
+            wanted = wanted.split(',')
+        wanted = {str(t).strip().upper() for t in wanted if str(t).strip()}
+        rows = [row for row in rows if row.get('Ticker') in wanted]
+
+    tickers, inputs, missing = split_inputs(rows, monte_carlo.INPUT_COLUMNS)
+    if missing:
+        log(f"⚠️  {len(missing)} filas sin entradas del DCF (caché anterior), se omiten")
+
+    try:
+        start = time.time()
+        simulation = monte_carlo.simulate(tickers, inputs, samples, seed=seed, distributions=distributions, workers=workers)
+        compute_seconds = time.time() - start
+    except Exception as e:
+        log(f"❌ Error en Monte Carlo: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+    log(f"🎲 Monte Carlo: {len(tickers)} tickers × {samples} muestras en {compute_seconds:.2f}s")
+
+    point = {row['Ticker']: row.get('Intrinsic') for row in rows}
+    results = {}
+    for i, ticker in enumerate(tickers):
+        bands = to_json_lists(simulation['percentiles'][i], 2)
+        results[ticker] = {
+            "price": float(inputs['Price'][i]),
+            "point_intrinsic": point.get(ticker),
+            "intrinsic_percentiles": {f"p{p}": v for p, v in zip(monte_carlo.PERCENTILES, bands)},
+            "intrinsic_mean": to_json_lists(simulation['mean'][i], 2),
+            "prob_mos_positive": to_json_lists(simulation['prob_mos_positive'][i])
+        }
+
+    return jsonify({
+        "generated_at": data.get('generated_at'),
+        "samples": samples,
+        "seed": seed,
+        "distributions": distributions,
+        "results": results,
+        "missing_inputs": missing,
+        "compute_seconds": round(compute_seconds, 3)
+    })
+
 @app.route('/cache-status')
 def cache_status():
     """Verifica el estado del caché"""
@@ -606,21 +2093,18 @@ def cache_status():
         })
     
     try:
-        blob = bucket.blob(CACHE_FILE_NAME)
+        # Solo el manifest (metadata del objeto): el JSON no se descarga
+        manifest = get_cache_manifest()
         
-        if not blob.exists():
+        if manifest is None:
             return jsonify({
                 "cache_enabled": True,
                 "cache_exists": False,
-                "message": "No cached data available"
+                "message": "No cached data available",
+                "cache_tiers": results_cache.stats
             })
         
-        cache_content = blob.download_as_string()
-        data = json.loads(cache_content)
-        
-        cache_time = datetime.fromisoformat(data.get("cached_at", ""))
-        expires_at = datetime.fromisoformat(data.get("expires_at", ""))
-        time_remaining = expires_at - datetime.now()
+        time_remaining = manifest["expires_at"] - datetime.now()
         
         is_expired = time_remaining.total_seconds() <= 0
         
@@ -628,12 +2112,18 @@ def cache_status():
             "cache_enabled": True,
             "cache_exists": True,
             "is_expired": is_expired,
-            "cached_at": cache_time.isoformat(),
-            "expires_at": expires_at.isoformat(),
+            "cached_at": manifest["cached_at"].isoformat(),
+            "expires_at": manifest["expires_at"].isoformat(),
+            "generated_at": manifest["generated_at"],
             "time_remaining_hours": round(time_remaining.total_seconds() / 3600, 2),
-            "results_count": data["results"].get("total_analyzed", 0),
-            "candidates_count": data["results"].get("candidates_count", 0),
-            "file_size_kb": round(blob.size / 1024, 2)
+            "results_count": manifest["total_analyzed"],
+            "candidates_count": manifest["candidates_count"],
+            "file_size_kb": round(manifest["size"] / 1024, 2),
+            "codec": manifest["codec"],
+            "generation": manifest["generation"],
+            "cache_tiers": results_cache.stats,
+            "refresh": refresher.status(ANALYSIS_FLIGHT),
+            "refresh_lease": refresh_lease().holder()
         })
         
     except Exception as e:
@@ -646,7 +2136,12 @@ def clear_cache():
         return jsonify({"status": "Cloud Storage not available"}), 503
     
     try:
+        inputs_blob = bucket.blob(SCREEN_INPUTS_FILE_NAME)
+        if inputs_blob.exists():
+            inputs_blob.delete()
+        inputs_cache.invalidate()
         blob = bucket.blob(CACHE_FILE_NAME)
+        results_cache.invalidate()
         if blob.exists():
             blob.delete()
             log("🗑️ Caché limpiado manualmente")
@@ -666,13 +2161,22 @@ def clear_cache():
 @app.route('/health')
 def health():
     """Health check endpoint"""
+    cache_expires_at = None
+    if GCS_AVAILABLE:
+        try:
+            manifest = get_cache_manifest()  # Metadata del objeto, sin descarga
+            cache_expires_at = manifest["expires_at"].isoformat() if manifest else None
+        except Exception as e:
+            log(f"⚠ Error leyendo manifest del caché: {e}")
     return jsonify({
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "cache_available": GCS_AVAILABLE,
+        "cache_expires_at": cache_expires_at,
         "post_processor_available": POST_PROCESSOR_AVAILABLE,
         "portfolio_refiner_available": PORTFOLIO_REFINER_AVAILABLE,
         "portfolio_tracker_available": PORTFOLIO_TRACKER_AVAILABLE,
+        "fundamentals_store_available": fundamentals_store is not None,
         "version": "8.0 - DCF 2-Stage + Quality + Portfolio Manager + Tracker"
     })
 
@@ -854,7 +2358,7 @@ def refine_endpoint():
         candidates_count = len(data_obj.get('results', [])) if isinstance(data_obj.get('results'), list) else data_obj.get('candidates_count', 0)
         log(f"🔍 Refinando {candidates_count} candidatos...")
         
-        refiner = PortfolioRefiner(data_obj)
+        refiner = PortfolioRefiner(data_obj, CONFIG['DISCOUNT_RATE'])
         refined_data = refiner.refine_all()
         
         if refined_data is None:
@@ -875,7 +2379,8 @@ def refine_endpoint():
                 "generated_at": data_obj.get('generated_at'),
                 "total_analyzed": data_obj.get('total_analyzed'),
                 "candidates_count": data_obj.get('candidates_count'),
-                "from_cache": data_obj.get('from_cache', False)
+                "from_cache": data_obj.get('from_cache', False),
+                "stale": data_obj.get('stale', False)
             }
         }
         
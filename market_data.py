@@ -0,0 +1,329 @@
+"""
+market_data.py - Capa de proveedores de datos de mercado
+Todas las llamadas a Yahoo Finance y las descargas HTTP pasan por un proveedor,
+lo que permite grabar respuestas reales y reproducirlas sin conexión
+"""
+
+import os
+import json
+import time
+import pickle
+import random
+import hashlib
+import threading
+from collections import namedtuple
+
+import requests
+import yfinance as yf
+
+# Cotizaciones en lote: símbolos por petición a /v7/finance/quote
+QUOTE_BATCH_SIZE = 200
+QUOTE_URL = "https://query1.finance.yahoo.com/v7/finance/quote"
+
+# Respuesta HTTP mínima (lo único que usa el screener)
+HttpResponse = namedtuple('HttpResponse', ['status_code', 'text', 'headers'])
+
+# Atributos de yf.Ticker para cada estado financiero
+STATEMENT_ATTRS = {
+    'income': 'income_stmt',
+    'balance': 'balance_sheet',
+    'cashflow': 'cashflow'
+}
+
+
+class ProviderError(Exception):
+    """Error devuelto por un proveedor (también se usa al reproducir fallos grabados)"""
+
+
+class ReplayMissError(ProviderError):
+    """La petición no existe en la grabación"""
+
+
+def is_throttle_error(exc):
+    """Indica si un error corresponde a rate-limit / throttling del proveedor"""
+    if exc is None:
+        return False
+    if type(exc).__name__ == 'YFRateLimitError':
+        return True
+    message = str(exc).lower()
+    return any(k in message for k in ('too many requests', 'rate limit', '429'))
+
+
+class MarketDataProvider:
+    """
+    Interfaz común de los proveedores de datos de mercado
+    """
+
+    name = 'base'
+
+    def quote(self, ticker):
+        """Devuelve {'market_cap', 'last_price', 'shares', 'currency'} del ticker"""
+        raise NotImplementedError
+
+    def quotes(self, tickers):
+        """
+        Cotizaciones de muchos tickers: {ticker: quote}
+        Los tickers sin datos no aparecen en el resultado.
+        Implementación por defecto: una llamada a quote() por ticker.
+        """
+        result = {}
+        for ticker in tickers:
+            try:
+                result[ticker] = self.quote(ticker)
+            except Exception:
+                continue
+        return result
+
+    def statement(self, ticker, kind):
+        """Devuelve un estado financiero anual ('income', 'balance' o 'cashflow')"""
+        raise NotImplementedError
+
+    def info(self, ticker):
+        """Devuelve el diccionario de información general del ticker"""
+        raise NotImplementedError
+
+    def history(self, tickers, start, end):
+        """Devuelve precios históricos ajustados (mismo formato que yf.download)"""
+        raise NotImplementedError
+
+    def http_get(self, url, headers=None, timeout=30):
+        """GET HTTP genérico, devuelve un HttpResponse"""
+        raise NotImplementedError
+
+
+class YahooProvider(MarketDataProvider):
+    """
+    Proveedor real: Yahoo Finance vía yfinance + requests
+    """
+
+    name = 'yahoo'
+
+    def quote(self, ticker):
+        fast = yf.Ticker(ticker).fast_info
+        return {
+            'market_cap': fast.market_cap,
+            'last_price': fast.last_price,
+            'shares': fast.shares,
+            'currency': fast.currency
+        }
+
+    def quotes(self, tickers):
+        """Cotizaciones en lote vía /v7/finance/quote (QUOTE_BATCH_SIZE por petición)"""
+        # YfData gestiona cookie + crumb y es un singleton compartido con yfinance
+        from yfinance.data import YfData
+        data = YfData()
+
+        result = {}
+        tickers = list(tickers)
+        for i in range(0, len(tickers), QUOTE_BATCH_SIZE):
+            chunk = tickers[i:i + QUOTE_BATCH_SIZE]
+            try:
+                payload = data.get_raw_json(QUOTE_URL, params={
+                    'symbols': ','.join(chunk),
+                    'formatted': 'false'
+                })
+            except Exception:
+                continue
+
+            for q in (payload.get('quoteResponse') or {}).get('result') or []:
+                if q.get('marketCap') is None or q.get('regularMarketPrice') is None:
+                    continue
+                result[q['symbol']] = {
+                    'market_cap': q['marketCap'],
+                    'last_price': q['regularMarketPrice'],
+                    'shares': q.get('sharesOutstanding'),
+                    'currency': q.get('currency')
+                }
+
+        # Lo que el lote no devolvió (o sin acciones en circulación) va por fast_info
+        missing = [t for t in tickers if t not in result or not result[t].get('shares')]
+        for ticker in missing:
+            try:
+                result[ticker] = self.quote(ticker)
+            except Exception:
+                result.pop(ticker, None)
+        return result
+
+    def statement(self, ticker, kind):
+        return getattr(yf.Ticker(ticker), STATEMENT_ATTRS[kind])
+
+    def info(self, ticker):
+        return yf.Ticker(ticker).info
+
+    def history(self, tickers, start, end):
+        return yf.download(
+            tickers,
+            start=start,
+            end=end,
+            auto_adjust=True,
+            progress=False
+        )
+
+    def http_get(self, url, headers=None, timeout=30):
+        r = requests.get(url, headers=headers, timeout=timeout)
+        return HttpResponse(r.status_code, r.text, dict(r.headers))
+
+
+def _request_key(method, args):
+    """Clave estable de una petición (método + argumentos)"""
+    payload = json.dumps([method, args], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class RecordingProvider(MarketDataProvider):
+    """
+    Envuelve otro proveedor y graba cada respuesta (o error) en disco
+
+    Estructura: <record_dir>/<método>/<sha1 de la petición>.pkl
+    """
+
+    name = 'record'
+
+    def __init__(self, inner, record_dir):
+        self.inner = inner
+        self.record_dir = record_dir
+        self._lock = threading.Lock()
+
+    def _call(self, method, *args):
+        try:
+            value = getattr(self.inner, method)(*args)
+            entry = {'request': [method, list(args)], 'value': value}
+        except Exception as e:
+            entry = {'request': [method, list(args)], 'error': f"{type(e).__name__}: {e}"}
+            self._write(method, args, entry)
+            raise
+        self._write(method, args, entry)
+        return value
+
+    def _write(self, method, args, entry):
+        method_dir = os.path.join(self.record_dir, method)
+        path = os.path.join(method_dir, f"{_request_key(method, list(args))}.pkl")
+        with self._lock:
+            os.makedirs(method_dir, exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(entry, f)
+            os.replace(tmp_path, path)
+
+    def quote(self, ticker):
+        return self._call('quote', ticker)
+
+    def quotes(self, tickers):
+        return self._call('quotes', list(tickers))
+
+    def statement(self, ticker, kind):
+        return self._call('statement', ticker, kind)
+
+    def info(self, ticker):
+        return self._call('info', ticker)
+
+    def history(self, tickers, start, end):
+        return self._call('history', list(tickers), start, end)
+
+    def http_get(self, url, headers=None, timeout=30):
+        return self._call('http_get', url, headers or {})
+
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Sirve respuestas grabadas por RecordingProvider sin tocar la red
+
+    La latencia simulada es determinista: `latency` segundos más un jitter
+    derivado del hash de la petición y de `seed`.
+    """
+
+    name = 'replay'
+
+    def __init__(self, record_dir, latency=0.0, jitter=0.0, seed=0):
+        """
+        Args:
+            record_dir: Directorio con las grabaciones
+            latency: Latencia base por petición (segundos)
+            jitter: Variación máxima adicional (segundos)
+            seed: Semilla del jitter
+        """
+        self.record_dir = record_dir
+        self.latency = latency
+        self.jitter = jitter
+        self.seed = seed
+
+    def _call(self, method, *args):
+        key = _request_key(method, list(args))
+        path = os.path.join(self.record_dir, method, f"{key}.pkl")
+
+        delay = self.latency
+        if self.jitter:
+            delay += random.Random(f"{self.seed}:{key}").uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            raise ReplayMissError(f"Sin grabación para {method}{tuple(args)}")
+
+        if 'error' in entry:
+            raise ProviderError(entry['error'])
+        return entry['value']
+
+    def quote(self, ticker):
+        return self._call('quote', ticker)
+
+    def quotes(self, tickers):
+        return self._call('quotes', list(tickers))
+
+    def statement(self, ticker, kind):
+        return self._call('statement', ticker, kind)
+
+    def info(self, ticker):
+        return self._call('info', ticker)
+
+    def history(self, tickers, start, end):
+        return self._call('history', list(tickers), start, end)
+
+    def http_get(self, url, headers=None, timeout=30):
+        return self._call('http_get', url, headers or {})
+
+
+# -------- Proveedor activo --------
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def create_provider_from_env():
+    """
+    Crea el proveedor según variables de entorno:
+        MARKET_DATA_PROVIDER = yahoo | record | replay
+        MARKET_DATA_DIR      = directorio de grabaciones
+        REPLAY_LATENCY_MS / REPLAY_JITTER_MS / REPLAY_SEED
+    """
+    mode = os.environ.get("MARKET_DATA_PROVIDER", "yahoo").lower()
+    record_dir = os.environ.get("MARKET_DATA_DIR", "/tmp/warren_market_data")
+
+    if mode == 'record':
+        return RecordingProvider(YahooProvider(), record_dir)
+    if mode == 'replay':
+        return ReplayProvider(
+            record_dir,
+            latency=float(os.environ.get("REPLAY_LATENCY_MS", 0)) / 1000,
+            jitter=float(os.environ.get("REPLAY_JITTER_MS", 0)) / 1000,
+            seed=int(os.environ.get("REPLAY_SEED", 0))
+        )
+    return YahooProvider()
+
+
+def get_provider():
+    """Devuelve el proveedor activo (se crea la primera vez desde el entorno)"""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = create_provider_from_env()
+        return _provider
+
+
+def set_provider(provider):
+    """Reemplaza el proveedor activo (benchmarks, pruebas de carga)"""
+    global _provider
+    with _provider_lock:
+        _provider = provider
@@ -0,0 +1,167 @@
+"""
+monte_carlo.py - Valoración DCF por Monte Carlo
+Muestrea crecimiento, tasa de descuento y crecimiento terminal de
+distribuciones configurables y evalúa el DCF de 2 etapas sobre matrices
+(tickers × muestras), repartiendo los bloques de tickers en un pool de
+procesos. Cada ticker tiene su propia semilla derivada de la semilla raíz
+y de su símbolo, así el resultado de un ticker no depende del número de
+procesos, del tamaño de bloque ni de qué otros tickers se simulen
+"""
+
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dcf import STAGE1_YEARS, two_stage_multiple
+from sensitivity import INPUT_COLUMNS as DCF_COLUMNS
+
+# Columnas de la fila del screener que necesita la simulación
+INPUT_COLUMNS = DCF_COLUMNS + ('Growth_Est',)
+
+DEFAULT_SAMPLES = 10_000
+PERCENTILES = (5, 25, 50, 75, 95)
+CHUNK_TICKERS = 25      # Tickers por tarea del pool (25 × 10k muestras ≈ 2 MB por matriz)
+MIN_RATE_SPREAD = 0.01  # Tasa >= crecimiento terminal + 1%: valor terminal siempre definido
+
+# Distribuciones por defecto. Sin 'mean', el crecimiento se centra en el
+# Growth_Est de cada fila (ROIC * 0.5 acotado, la estimación puntual)
+DEFAULT_DISTRIBUTIONS = {
+    'growth': {'dist': 'normal', 'sd': 0.03, 'min': -0.05, 'max': 0.20},
+    'discount_rate': {'dist': 'normal', 'mean': 0.09, 'sd': 0.01, 'min': 0.05, 'max': 0.20},
+    'terminal_growth': {'dist': 'uniform', 'low': 0.01, 'high': 0.03},
+}
+
+DISTRIBUTIONS = ('normal', 'uniform', 'triangular')
+
+
+def merge_distributions(overrides=None):
+    """
+    Combina las distribuciones por defecto con cambios parciales y las valida
+
+    Args:
+        overrides: p.ej. {'growth': {'sd': 0.05}, 'terminal_growth': {'high': 0.025}}
+                   (cambiar 'dist' reemplaza la especificación completa)
+
+    Raises:
+        ValueError: Variable o distribución desconocida, o parámetros incoherentes
+    """
+    distributions = {name: dict(spec) for name, spec in DEFAULT_DISTRIBUTIONS.items()}
+    for name, spec in (overrides or {}).items():
+        if name not in distributions:
+            raise ValueError(f"Unknown variable: {name!r}")
+        if not isinstance(spec, dict):
+            raise ValueError(f"Distribution for {name!r} must be an object")
+        if spec.get('dist', distributions[name]['dist']) != distributions[name]['dist']:
+            distributions[name] = {}
+        distributions[name].update(spec)
+
+    for name, spec in distributions.items():
+        dist = spec.get('dist')
+        if dist not in DISTRIBUTIONS:
+            raise ValueError(f"{name}: dist must be one of {DISTRIBUTIONS}")
+        try:
+            params = {k: float(v) for k, v in spec.items() if k != 'dist'}
+        except (TypeError, ValueError):
+            raise ValueError(f"{name}: parameters must be numeric")
+        if dist == 'normal' and params.get('sd', 0) < 0:
+            raise ValueError(f"{name}: sd must be >= 0")
+        if dist == 'normal' and name != 'growth' and 'mean' not in params:
+            raise ValueError(f"{name}: normal distribution needs a mean")
+        if dist in ('uniform', 'triangular') and not ('low' in params and 'high' in params
+                                                      and params['low'] <= params['high']):
+            raise ValueError(f"{name}: needs low <= high")
+        if params.get('min', -np.inf) > params.get('max', np.inf):
+            raise ValueError(f"{name}: min must be <= max")
+        spec.update(params)
+    return distributions
+
+
+def _sample(rng, spec, size, center=None):
+    """Muestras de una variable; `center` sustituye a la media/moda si la spec no la fija"""
+    dist = spec['dist']
+    if dist == 'normal':
+        values = rng.normal(spec.get('mean', center), spec.get('sd', 0.0), size)
+    elif dist == 'uniform':
+        values = rng.uniform(spec['low'], spec['high'], size)
+    else:
+        low, high = spec['low'], spec['high']
+        mode = min(max(spec.get('mode', center if center is not None else (low + high) / 2), low), high)
+        values = rng.triangular(low, mode, high, size) if high > low else np.full(size, low)
+    if 'min' in spec or 'max' in spec:
+        values = np.clip(values, spec.get('min', -np.inf), spec.get('max', np.inf))
+    return values
+
+
+def _simulate_chunk(task):
+    """
+    Simula un bloque de tickers (nivel de módulo: se ejecuta en el pool)
+
+    Returns:
+        (percentiles (n, len(PERCENTILES)), prob_mos_positive (n,), mean (n,))
+    """
+    inputs, seeds, samples, distributions, years = task
+    n = len(seeds)
+    growth = np.empty((n, samples))
+    rate = np.empty((n, samples))
+    terminal = np.empty((n, samples))
+    for k, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        growth[k] = _sample(rng, distributions['growth'], samples, inputs['Growth_Est'][k])
+        rate[k] = _sample(rng, distributions['discount_rate'], samples)
+        terminal[k] = _sample(rng, distributions['terminal_growth'], samples)
+    rate = np.maximum(rate, terminal + MIN_RATE_SPREAD)
+
+    def column(name):
+        return inputs[name][:, None]
+
+    multiple = two_stage_multiple(growth, rate, terminal, years)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        intrinsic = (column('FCF') * multiple + column('Cash') - column('Debt')) / column('Shares')
+    # MOS > 0  <=>  intrínseco > precio (con precio positivo implica intrínseco > 0)
+    prob_mos_positive = (intrinsic > column('Price')).mean(axis=1)
+    return np.percentile(intrinsic, PERCENTILES, axis=1).T, prob_mos_positive, intrinsic.mean(axis=1)
+
+
+def ticker_seed(seed, ticker):
+    """SeedSequence de un ticker: (semilla raíz, crc32 del símbolo)"""
+    return np.random.SeedSequence(seed, spawn_key=(zlib.crc32(ticker.encode()),))
+
+
+def simulate(tickers, inputs, samples=DEFAULT_SAMPLES, seed=0, distributions=None, workers=None,
+             years=STAGE1_YEARS, chunk_tickers=CHUNK_TICKERS):
+    """
+    Monte Carlo del DCF para n tickers
+
+    Args:
+        tickers: Símbolos (n,), en el orden de `inputs`
+        inputs: {columna: array (n,)} con INPUT_COLUMNS (ver sensitivity.split_inputs)
+        seed: Semilla raíz; misma semilla = mismo resultado con cualquier `workers`
+        distributions: Salida de merge_distributions (None = por defecto)
+        workers: Procesos del pool (None = os.cpu_count(); 1 = en este proceso)
+
+    Returns:
+        {'percentiles': (n, len(PERCENTILES)), 'prob_mos_positive': (n,), 'mean': (n,)}
+    """
+    distributions = distributions or merge_distributions()
+    n = len(tickers)
+    seeds = [ticker_seed(seed, ticker) for ticker in tickers]
+    tasks = [
+        ({col: values[start:start + chunk_tickers] for col, values in inputs.items()},
+         seeds[start:start + chunk_tickers], samples, distributions, years)
+        for start in range(0, n, chunk_tickers)
+    ]
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        parts = [_simulate_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(_simulate_chunk, tasks))
+
+    if not parts:
+        return {'percentiles': np.empty((0, len(PERCENTILES))), 'prob_mos_positive': np.empty(0),
+                'mean': np.empty(0)}
+    percentiles, prob, mean = (np.concatenate(arrays) for arrays in zip(*parts))
+    return {'percentiles': percentiles, 'prob_mos_positive': prob, 'mean': mean}
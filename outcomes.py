@@ -0,0 +1,134 @@
+"""
+outcomes.py - Resultados tipados del análisis por ticker
+Distingue un ticker filtrado de uno sin datos, con error transitorio o
+limitado por rate-limit, y reintenta los transitorios con backoff
+"""
+
+import time
+import random
+
+from market_data import is_throttle_error
+
+# Estados posibles de un análisis
+OK = 'ok'                            # Pasa todos los filtros (genera fila)
+FILTERED = 'filtered'                # Rechazado por capitalización, ROIC, Piotroski, FCF o MOS
+NO_DATA = 'no_data'                  # Yahoo no tiene datos suficientes
+TRANSIENT_ERROR = 'transient_error'  # Error de red / 5xx: reintentable
+THROTTLED = 'throttled'              # Rate-limit: se reintenta en el barrido final
+
+STATUSES = (OK, FILTERED, NO_DATA, TRANSIENT_ERROR, THROTTLED)
+
+# Estados que no deben cachearse como resultado definitivo
+UNRESOLVED = (TRANSIENT_ERROR, THROTTLED)
+
+# Tipos de excepción que indican un fallo de red pasajero
+_TRANSIENT_NAMES = (
+    'ConnectionError', 'ConnectTimeout', 'ReadTimeout', 'Timeout', 'TimeoutError',
+    'ChunkedEncodingError', 'ClientConnectorError', 'ClientOSError',
+    'ServerDisconnectedError', 'RemoteDisconnected', 'IncompleteRead'
+)
+
+
+class AnalysisOutcome:
+    """
+    Resultado del análisis de un ticker
+    """
+
+    __slots__ = ('ticker', 'status', 'row', 'reason', 'attempts', 'calls', 'inputs')
+
+    def __init__(self, ticker, status, row=None, reason=None, attempts=1):
+        self.ticker = ticker
+        self.status = status
+        self.row = row
+        self.reason = reason
+        self.attempts = attempts
+        self.calls = {}  # Llamadas por origen (ver ticker_data.LazyTickerData)
+        self.inputs = None  # Datos reunidos por una etapa de I/O (ver valuation_engine)
+
+    @classmethod
+    def ok(cls, ticker, row):
+        return cls(ticker, OK, row=row)
+
+    @classmethod
+    def gathered(cls, ticker, inputs):
+        """Etapa de I/O completada: datos listos para el motor, aún sin fila"""
+        outcome = cls(ticker, OK)
+        outcome.inputs = inputs
+        return outcome
+
+    @classmethod
+    def filtered(cls, ticker, reason):
+        return cls(ticker, FILTERED, reason=reason)
+
+    @classmethod
+    def no_data(cls, ticker, reason):
+        return cls(ticker, NO_DATA, reason=reason)
+
+    @property
+    def unresolved(self):
+        return self.status in UNRESOLVED
+
+    def to_dict(self):
+        return {
+            'ticker': self.ticker,
+            'status': self.status,
+            'reason': self.reason,
+            'attempts': self.attempts,
+            'calls': self.calls
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Reconstruye un outcome serializado (to_dict + 'row')"""
+        outcome = cls(data['ticker'], data['status'], row=data.get('row'),
+                      reason=data.get('reason'), attempts=data.get('attempts', 1))
+        outcome.calls = data.get('calls') or {}
+        return outcome
+
+    def __repr__(self):
+        return f"AnalysisOutcome({self.ticker!r}, {self.status!r}, reason={self.reason!r})"
+
+
+def classify_error(exc):
+    """Clasifica una excepción en THROTTLED, TRANSIENT_ERROR o NO_DATA"""
+    if is_throttle_error(exc):
+        return THROTTLED
+
+    for cls in type(exc).__mro__:
+        if cls.__name__ in _TRANSIENT_NAMES:
+            return TRANSIENT_ERROR
+
+    message = str(exc).lower()
+    if any(k in message for k in ('timed out', 'timeout', 'connection', 'http 5', ' 502', ' 503', ' 504')):
+        return TRANSIENT_ERROR
+
+    # Errores de formato / campos inesperados: no tiene sentido reintentar
+    return NO_DATA
+
+
+def backoff_delay(attempt, base=1.0, cap=20.0):
+    """Backoff exponencial con jitter: base * 2^attempt * U(0.5, 1.5), acotado"""
+    return min(cap, base * (2 ** attempt)) * random.uniform(0.5, 1.5)
+
+
+def run_with_retries(ticker, func, max_retries=2, backoff_base=1.0):
+    """
+    Ejecuta func() -> AnalysisOutcome reintentando los errores transitorios
+
+    Los THROTTLED no se reintentan aquí (insistir empeora el rate-limit):
+    se devuelven para el barrido final del run.
+    """
+    attempt = 0
+    while True:
+        try:
+            outcome = func()
+        except Exception as e:
+            status = classify_error(e)
+            outcome = AnalysisOutcome(ticker, status, reason=f"{type(e).__name__}: {e}")
+
+        outcome.attempts = attempt + 1
+        if outcome.status != TRANSIENT_ERROR or attempt >= max_retries:
+            return outcome
+
+        time.sleep(backoff_delay(attempt, base=backoff_base))
+        attempt += 1
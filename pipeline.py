@@ -0,0 +1,124 @@
+"""
+pipeline.py - Ejecutor en tubería: descarga y cálculo separados
+Los hilos de I/O solo descargan datos crudos y los dejan en una cola
+acotada; un único hilo de CPU los consume (ordenar periodos, normalizar
+campos, guardar en el almacén) mientras siguen las descargas. El trabajo
+con pandas, que retiene el GIL, ya no compite con N hilos a la vez, y si
+el cálculo se queda atrás la cola llena frena las descargas nuevas
+"""
+
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+_DONE = object()
+
+
+class PipelineExecutor:
+    """
+    Hilos de I/O (concurrencia AIMD) -> cola acotada -> etapa de CPU
+
+    Args:
+        fetch: Función (key, payload) -> item; corre en los hilos de I/O
+               y no debería hacer más que la descarga
+        process: Función (key, payload, item) -> resultado; corre en un
+                 único hilo, en el orden en que terminan las descargas
+        controller: AdaptiveConcurrencyController que limita las descargas en vuelo
+        queue_size: Descargas terminadas que pueden esperar a la etapa de CPU
+        observe: Callback opcional (item, latencia) por descarga (p.ej. controller.record)
+    """
+
+    def __init__(self, fetch, process, controller, queue_size=64, observe=None):
+        self.fetch = fetch
+        self.process = process
+        self.controller = controller
+        self.queue_size = queue_size
+        self.observe = observe
+        self.stats = {}
+
+    def _timed_fetch(self, key, payload):
+        start = time.time()
+        item = self.fetch(key, payload)
+        return key, payload, item, time.time() - start
+
+    def _consume(self, pending, results, errors):
+        """Hilo de CPU: procesa hasta el marcador de fin; un error no detiene el drenaje"""
+        while True:
+            wait_start = time.time()
+            entry = pending.get()
+            self.stats['cpu_idle_seconds'] += time.time() - wait_start
+            if entry is _DONE:
+                return
+            key, payload, item = entry
+            start = time.time()
+            try:
+                results.append(self.process(key, payload, item))
+            except Exception as e:
+                errors.append(e)
+            self.stats['cpu_seconds'] += time.time() - start
+
+    def run(self, tasks):
+        """
+        Args:
+            tasks: {key: payload}
+
+        Returns:
+            Lista de resultados de `process` (orden de llegada a la etapa de CPU)
+
+        Raises:
+            La primera excepción de `process`, una vez drenada la cola
+        """
+        start = time.time()
+        self.stats = {'fetched': 0, 'queue_peak': 0, 'io_blocked_seconds': 0.0,
+                      'cpu_seconds': 0.0, 'cpu_idle_seconds': 0.0}
+        pending = queue.Queue(maxsize=self.queue_size)
+        results = []
+        errors = []
+        consumer = threading.Thread(target=self._consume, args=(pending, results, errors),
+                                    name='pipeline-cpu', daemon=True)
+        consumer.start()
+
+        try:
+            in_flight = set()
+            remaining = iter(tasks.items())
+            exhausted = False
+            with ThreadPoolExecutor(max_workers=self.controller.max_limit,
+                                    thread_name_prefix='pipeline-io') as executor:
+                while True:
+                    while not exhausted and len(in_flight) < self.controller.limit:
+                        try:
+                            key, payload = next(remaining)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                        in_flight.add(executor.submit(self._timed_fetch, key, payload))
+
+                    if not in_flight:
+                        break
+
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        key, payload, item, latency = future.result()
+                        if self.observe:
+                            self.observe(item, latency)
+                        # Cola llena: no se lanzan descargas nuevas hasta que la CPU libere sitio
+                        blocked = time.time()
+                        pending.put((key, payload, item))
+                        self.stats['io_blocked_seconds'] += time.time() - blocked
+                        self.stats['fetched'] += 1
+                        self.stats['queue_peak'] = max(self.stats['queue_peak'], pending.qsize())
+        finally:
+            pending.put(_DONE)
+            consumer.join()
+
+        self.stats.update({
+            'queue_size': self.queue_size,
+            'elapsed_seconds': round(time.time() - start, 2),
+            'io_blocked_seconds': round(self.stats['io_blocked_seconds'], 2),
+            'cpu_seconds': round(self.stats['cpu_seconds'], 2),
+            'cpu_idle_seconds': round(self.stats['cpu_idle_seconds'], 2)
+        })
+        if errors:
+            raise errors[0]
+        return results
@@ -7,10 +7,24 @@ import pandas as pd
 import numpy as np
 import json
 
-def portfolio_manager_review(df_input):
+from dcf import intrinsic_value, margin_of_safety
+
+# Entradas del DCF que el screener incluye en cada fila
+DCF_COLUMNS = ('FCF', 'Cash', 'Debt', 'Shares')
+
+try:
+    from ticker_metadata import get_metadata_index
+except ImportError:
+    get_metadata_index = None
+
+def portfolio_manager_review(df_input, discount_rate=0.09):
     """
     Función EXACTA del script original
     Recibe DataFrame y retorna DataFrame refinado
+
+    Si las filas traen las entradas del DCF (FCF, Cash, Debt, Shares) el
+    ajuste de crecimiento recalcula el DCF con `discount_rate`; si no
+    (resultados antiguos) se aplica el factor de corrección heurístico.
     """
     if df_input is None or df_input.empty:
         print("❌ No hay datos para analizar. Ejecuta el paso anterior primero.")
@@ -18,6 +32,10 @@ def portfolio_manager_review(df_input):
 
     df = df_input.copy()
 
+    # Sectores desconocidos ('N/A') desde el índice local de metadata (sin red)
+    if get_metadata_index is not None:
+        get_metadata_index().fill_sectors(df)
+
     # 1. DEFINIR LÍMITES DE CRECIMIENTO REALISTAS POR SECTOR
     # Un humano sabe que el Cloro no crece al 14%. El código ahora lo sabrá.
     SECTOR_CAPS = {
@@ -34,6 +52,7 @@ def portfolio_manager_review(df_input):
     }
 
     report = []
+    has_dcf_inputs = all(col in df.columns for col in DCF_COLUMNS)
 
     for index, row in df.iterrows():
         ticker = row['Ticker']
@@ -66,17 +85,19 @@ def portfolio_manager_review(df_input):
                 adj_growth = cap
                 reason = f"Crecimiento ajustado de {old_growth:.1%} a {cap:.1%} (Sector)."
 
-                # Recalculamos DCF rápido con el nuevo crecimiento (Simplificado para ajuste)
-                # Asumimos que el Intrinsic es linealmente sensible al crecimiento en el Stage 1
-                # Factor de corrección aproximado:
-                correction_factor = (1 + adj_growth) / (1 + old_growth)
-                # Castigamos el valor intrínseco proporcionalmente (heurístico)
-                new_intrinsic = row['Intrinsic'] * (correction_factor ** 2.5)  # Elevado para ser conservador
-
-                if new_intrinsic > 0:
-                    new_mos = (new_intrinsic - price) / new_intrinsic
+                if has_dcf_inputs and not row[list(DCF_COLUMNS)].isna().any():
+                    # Recalculamos el DCF exacto con el nuevo crecimiento
+                    new_intrinsic = intrinsic_value(row['FCF'], adj_growth, discount_rate,
+                                                    row['Cash'], row['Debt'], row['Shares'])
                 else:
-                    new_mos = -0.99
+                    # Recalculamos DCF rápido con el nuevo crecimiento (Simplificado para ajuste)
+                    # Asumimos que el Intrinsic es linealmente sensible al crecimiento en el Stage 1
+                    # Factor de corrección aproximado:
+                    correction_factor = (1 + adj_growth) / (1 + old_growth)
+                    # Castigamos el valor intrínseco proporcionalmente (heurístico)
+                    new_intrinsic = row['Intrinsic'] * (correction_factor ** 2.5)  # Elevado para ser conservador
+
+                new_mos = margin_of_safety(new_intrinsic, price)
 
             # C. CLASIFICACIÓN FINAL
             if new_mos > 0.15:
@@ -138,12 +159,14 @@ class PortfolioRefiner:
     Wrapper para usar con el endpoint /refine
     """
     
-    def __init__(self, results_data):
+    def __init__(self, results_data, discount_rate=0.09):
         """
         Args:
             results_data: Dict con los resultados del análisis
+            discount_rate: Tasa de descuento para recalcular el DCF
         """
         self.raw_data = results_data
+        self.discount_rate = discount_rate
         self.df = None
         self.refined_df = None
         
@@ -176,7 +199,7 @@ class PortfolioRefiner:
             return None
         
         # Ejecutar refinamiento con la función EXACTA del script original
-        self.refined_df = portfolio_manager_review(self.df)
+        self.refined_df = portfolio_manager_review(self.df, self.discount_rate)
         
         if self.refined_df is None or self.refined_df.empty:
             print("❌ Error en refinamiento")
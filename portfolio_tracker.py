@@ -3,11 +3,11 @@ portfolio_tracker.py - Portfolio Performance Tracker
 Análisis de rendimiento de portfolio basado en el notebook original
 """
 
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import json
+from market_data import get_provider
 
 class PortfolioTracker:
     """
@@ -32,7 +32,7 @@ class PortfolioTracker:
         self.metrics = {}
         
     def download_data(self):
-        """Descarga datos históricos de Yahoo Finance"""
+        """Descarga datos históricos desde el proveedor de mercado (Yahoo por defecto)"""
         print(f"📊 Descargando datos para {len(self.tickers)} acciones...")
         
         # Buffer de 7 días antes para asegurar datos
@@ -40,13 +40,8 @@ class PortfolioTracker:
         today = datetime.today().strftime("%Y-%m-%d")
         
         try:
-            raw = yf.download(
-                self.tickers,
-                start=start_buffer,
-                end=today,
-                auto_adjust=True,  # ← IMPORTANTE: precios ajustados
-                progress=False
-            )
+            # Precios ajustados (auto_adjust) vía el proveedor activo
+            raw = get_provider().history(self.tickers, start_buffer, today)
             
             # Si viene multiíndice (OHLCV), usamos "Close"
             if isinstance(raw.columns, pd.MultiIndex):
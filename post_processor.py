@@ -8,6 +8,11 @@ import numpy as np
 from datetime import datetime
 import json
 
+try:
+    from ticker_metadata import get_metadata_index
+except ImportError:
+    get_metadata_index = None
+
 class ResultsPostProcessor:
     """
     Procesa los resultados del Warren Screener
@@ -26,6 +31,9 @@ class ResultsPostProcessor:
         """Convierte los resultados a DataFrame"""
         if 'results' in self.raw_results:
             self.df = pd.DataFrame(self.raw_results['results'])
+            # Sectores desconocidos ('N/A') desde el índice local de metadata (sin red)
+            if get_metadata_index is not None:
+                get_metadata_index().fill_sectors(self.df)
             print(f"✅ Cargados {len(self.df)} resultados para procesar")
             return True
         else:
@@ -0,0 +1,114 @@
+"""
+refresh.py - Ejecución única por clave (single-flight) para refrescos caros
+Si ya hay una ejecución en curso para una clave, los llamantes concurrentes
+se unen a ella y reciben su resultado en lugar de lanzar otra. Lo usa el
+screener para que, con el caché expirado, todas las peticiones compartan un
+único análisis completo (en primer plano o en segundo plano mientras se
+sirve el resultado caducado)
+"""
+
+import time
+import threading
+from datetime import datetime
+
+
+class _Flight:
+    """Una ejecución en curso: resultado o error y el evento que la cierra"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.started_at = datetime.now()
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Como mucho una ejecución en vuelo por clave (dentro del proceso)
+
+    do(key, fn) ejecuta fn en el hilo llamante o espera a la que ya está en
+    curso; start(key, fn) la lanza en un hilo de fondo sin esperar.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.stats = {'started': 0, 'joined': 0, 'failed': 0}
+        self.last_completed = {}  # key -> {'finished_at', 'seconds', 'error'}
+
+    def _acquire(self, key):
+        """(flight, es_nuevo): registra la ejecución o devuelve la que está en curso"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                self.stats['joined'] += 1
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            self.stats['started'] += 1
+            return flight, True
+
+    def _execute(self, key, flight, fn):
+        start = time.time()
+        try:
+            flight.result = fn()
+        except Exception as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                del self._flights[key]
+                if flight.error is not None:
+                    self.stats['failed'] += 1
+                self.last_completed[key] = {
+                    'finished_at': datetime.now().isoformat(),
+                    'seconds': round(time.time() - start, 2),
+                    'error': None if flight.error is None else str(flight.error)
+                }
+            flight.done.set()
+
+    def do(self, key, fn):
+        """
+        Ejecuta fn, o espera a la ejecución en curso de la misma clave
+
+        Returns:
+            El resultado de fn (compartido entre todos los que se unieron)
+
+        Raises:
+            La excepción de fn, también en los llamantes que se unieron
+        """
+        flight, leader = self._acquire(key)
+        if leader:
+            self._execute(key, flight, fn)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def start(self, key, fn):
+        """
+        Lanza fn en segundo plano si no hay otra ejecución en curso
+
+        Returns:
+            True si se lanzó, False si ya había una en curso
+        """
+        flight, leader = self._acquire(key)
+        if not leader:
+            with self._lock:
+                flight.waiters -= 1  # Nadie espera: solo se comprobó que está en curso
+            return False
+        threading.Thread(target=self._execute, args=(key, flight, fn),
+                         name=f"refresh-{key}", daemon=True).start()
+        return True
+
+    def status(self, key):
+        """Estado de la clave: en curso (desde cuándo, cuántos esperan) y último resultado"""
+        with self._lock:
+            flight = self._flights.get(key)
+            return {
+                'in_flight': flight is not None,
+                'started_at': flight.started_at.isoformat() if flight else None,
+                'waiters': flight.waiters if flight else 0,
+                'last_completed': self.last_completed.get(key)
+            }
@@ -0,0 +1,208 @@
+"""
+result_cache.py - Caché de lectura por capas de objetos JSON del bucket
+Memoria (objeto ya parseado) -> disco local -> GCS, validado por el número
+de generación del blob: mientras la generación no cambie, las peticiones
+repetidas se sirven desde memoria sin descargar ni volver a parsear.
+La metadata del objeto (manifest) se consulta sin descargar el contenido
+"""
+
+import os
+import json
+import time
+import threading
+
+# Capas (para estadísticas)
+MEMORY = 'memory'
+DISK = 'disk'
+BUCKET = 'bucket'
+
+
+class TieredBlobCache:
+    """
+    Caché read-through de un objeto JSON del bucket (GCS o LocalBucket)
+
+    1. Memoria: el objeto parseado y su generación. Durante `revalidate_seconds`
+       tras una comprobación se sirve sin tocar la red; después basta pedir la
+       metadata del blob (get_blob) para saber si sigue vigente.
+    2. Disco local: <cache_dir>/<nombre>.<generación>.cache con los bytes
+       tal como están en el bucket (sobrevive a reinicios de la instancia y
+       evita volver a descargar).
+    3. Bucket: descarga de esa generación exacta + decode.
+
+    head() devuelve solo la metadata del objeto (una llamada de metadata,
+    sin descarga). Las escrituras del propio proceso (put) actualizan las
+    tres capas.
+    Los objetos devueltos se comparten entre peticiones: no modificarlos.
+    """
+
+    def __init__(self, bucket, name, cache_dir=None, revalidate_seconds=5.0, decode=json.loads):
+        """
+        Args:
+            bucket: Bucket de GCS o LocalBucket
+            name: Nombre del blob
+            cache_dir: Directorio de la copia en disco (None = sin capa de disco)
+            revalidate_seconds: Tiempo durante el que la copia en memoria se da
+                                por vigente sin consultar la generación
+            decode: bytes -> objeto (p.ej. cache_codec.decode)
+        """
+        self.bucket = bucket
+        self.name = name
+        self.cache_dir = cache_dir
+        self.revalidate_seconds = revalidate_seconds
+        self.decode = decode
+        self._lock = threading.Lock()
+        self._data = None
+        self._generation = None
+        self._size = None
+        self._metadata = None
+        self._checked_at = 0.0
+        self.stats = {MEMORY: 0, DISK: 0, BUCKET: 0, 'revalidations': 0, 'misses': 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    # -------- Disco --------
+    def _prefix(self):
+        return self.name.replace('/', '_') + '.'
+
+    def _disk_path(self, generation):
+        return os.path.join(self.cache_dir, f"{self._prefix()}{generation}.cache")
+
+    def _read_disk(self, generation):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._disk_path(generation), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, generation, content):
+        """Guarda la generación actual y borra las anteriores"""
+        if not self.cache_dir:
+            return
+        path = self._disk_path(generation)
+        try:
+            tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+            self._drop_disk(keep=path)
+        except OSError:
+            pass
+
+    def _drop_disk(self, keep=None):
+        if not self.cache_dir:
+            return
+        prefix = self._prefix()
+        for filename in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, filename)
+            if filename.startswith(prefix) and path != keep and '.tmp-' not in filename:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    # -------- API --------
+    def _revalidate(self, now):
+        """Consulta la generación actual; olvida el contenido si cambió"""
+        blob = self.bucket.get_blob(self.name)
+        self.stats['revalidations'] += 1
+        if blob is None:
+            self._clear()
+            self.stats['misses'] += 1
+            return None
+        self._checked_at = now
+        if blob.generation != self._generation:
+            self._data = None
+            self._generation = blob.generation
+            self._size = blob.size
+        self._metadata = dict(blob.metadata or {})
+        return blob
+
+    def head(self):
+        """
+        Metadata del objeto sin descargarlo, o None si el blob no existe
+
+        Returns:
+            (metadata, info): info = {'generation', 'size', 'tier'}
+        """
+        with self._lock:
+            now = time.time()
+            if self._metadata is not None and now - self._checked_at < self.revalidate_seconds:
+                self.stats[MEMORY] += 1
+                return self._metadata, self._info(MEMORY)
+            if self._revalidate(now) is None:
+                return None, None
+            return self._metadata, self._info(BUCKET)
+
+    def get(self):
+        """
+        Objeto parseado vigente, o None si el blob no existe
+
+        Returns:
+            (data, info): info = {'generation', 'size', 'tier'}
+        """
+        with self._lock:
+            now = time.time()
+            if self._data is not None and now - self._checked_at < self.revalidate_seconds:
+                self.stats[MEMORY] += 1
+                return self._data, self._info(MEMORY)
+
+            blob = self._revalidate(now)
+            if blob is None:
+                return None, None
+            if self._data is not None:
+                self.stats[MEMORY] += 1
+                return self._data, self._info(MEMORY)
+
+            tier = DISK
+            content = self._read_disk(blob.generation)
+            if content is None:
+                tier = BUCKET
+                # El blob de get_blob descarga exactamente esa generación
+                content = blob.download_as_bytes()
+                self._write_disk(blob.generation, content)
+            self._data = self.decode(content)
+            self._size = len(content)
+            self.stats[tier] += 1
+            return self._data, self._info(tier)
+
+    def put(self, data, content, generation, metadata=None):
+        """
+        Registra una escritura propia (write-through): el objeto recién subido
+        queda en memoria y en disco sin volver a descargarlo
+
+        Args:
+            data: Objeto subido
+            content: Bytes / texto subido
+            generation: blob.generation tras upload_from_string
+            metadata: blob.metadata subida con el objeto
+        """
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        with self._lock:
+            if generation is None:
+                self._clear()
+                return
+            self._data = data
+            self._generation = generation
+            self._size = len(content)
+            self._metadata = dict(metadata or {})
+            self._checked_at = time.time()
+            self._write_disk(generation, content)
+
+    def invalidate(self):
+        """Olvida las copias locales (tras borrar el blob)"""
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._data = None
+        self._generation = None
+        self._size = None
+        self._metadata = None
+        self._checked_at = 0.0
+        self._drop_disk()
+
+    def _info(self, tier):
+        return {'generation': self._generation, 'size': self._size, 'tier': tier}
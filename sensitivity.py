@@ -0,0 +1,120 @@
+"""
+sensitivity.py - Rejilla de sensibilidad del DCF
+Valor intrínseco y MOS de todos los candidatos para cada combinación de
+tasa de descuento × crecimiento × crecimiento terminal, en una sola
+operación con broadcasting sobre las entradas del DCF ya cacheadas
+(FCF, caja, deuda, acciones): sin volver a descargar nada
+"""
+
+import warnings
+
+import numpy as np
+
+from dcf import STAGE1_YEARS, NO_MOS, two_stage_multiple
+
+# Columnas de la fila del screener que necesita la rejilla
+INPUT_COLUMNS = ('Price', 'FCF', 'Cash', 'Debt', 'Shares')
+
+# Rejilla por defecto: 10 tasas × 10 crecimientos × 5 terminales
+DEFAULT_GRID = {
+    'discount_rates': tuple(round(0.06 + 0.01 * i, 4) for i in range(10)),     # 6% .. 15%
+    'growth_rates': tuple(round(0.00 + 0.02 * i, 4) for i in range(10)),       # 0% .. 18%
+    'terminal_growths': tuple(round(0.01 + 0.005 * i, 4) for i in range(5)),   # 1% .. 3%
+}
+
+MAX_GRID_POINTS = 5000
+
+
+def parse_axis(text, default):
+    """
+    Lee un eje de la rejilla ('0.08,0.09,0.1') o devuelve el de por defecto
+
+    Raises:
+        ValueError: Si algún valor no es numérico o el eje queda vacío
+    """
+    if text is None or not text.strip():
+        return tuple(default)
+    try:
+        values = tuple(float(v) for v in text.split(',') if v.strip())
+    except ValueError:
+        values = ()
+    if not values or not all(np.isfinite(values)):
+        raise ValueError(f"Invalid grid axis: {text!r}")
+    return values
+
+
+def split_inputs(rows, columns=INPUT_COLUMNS):
+    """
+    Separa las filas con entradas del DCF de las que no las tienen
+    (resultados cacheados antes de que el screener las incluyera)
+
+    Args:
+        columns: Columnas necesarias (por defecto INPUT_COLUMNS)
+
+    Returns:
+        (tickers, {columna: array float64}, [tickers sin entradas])
+    """
+    tickers = []
+    missing = []
+    values = {col: [] for col in columns}
+    for row in rows:
+        data = [row.get(col) for col in columns]
+        if any(v is None for v in data):
+            missing.append(row.get('Ticker'))
+            continue
+        tickers.append(row['Ticker'])
+        for col, v in zip(columns, data):
+            values[col].append(v)
+    return tickers, {col: np.asarray(v, dtype=float) for col, v in values.items()}, missing
+
+
+def sensitivity_grid(inputs, discount_rates, growth_rates, terminal_growths, years=STAGE1_YEARS):
+    """
+    Valor intrínseco y MOS sobre la rejilla completa
+
+    El múltiplo EV/FCF solo depende de (r, g, tg): se calcula una vez con
+    forma (R, G, T) y se combina con las entradas de cada ticker.
+
+    Args:
+        inputs: {columna: array (n,)} con Price, FCF, Cash, Debt y Shares
+
+    Returns:
+        (intrinsic, mos): arrays (n, R, G, T); NaN donde r <= tg
+    """
+    rates = np.asarray(discount_rates, dtype=float)[:, None, None]
+    growths = np.asarray(growth_rates, dtype=float)[None, :, None]
+    terminals = np.asarray(terminal_growths, dtype=float)[None, None, :]
+    multiple = two_stage_multiple(growths, rates, terminals, years)
+
+    def column(name):
+        return inputs[name][:, None, None, None]
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        intrinsic = (column('FCF') * multiple + column('Cash') - column('Debt')) / column('Shares')
+        mos = np.where(intrinsic > 0, (intrinsic - column('Price')) / intrinsic, NO_MOS)
+    mos[np.isnan(intrinsic)] = np.nan
+    return intrinsic, mos
+
+
+def to_json_lists(values, decimals=4):
+    """Array -> listas anidadas redondeadas con None en lugar de NaN/Infinity"""
+    return np.where(np.isfinite(values), values.round(decimals), None).tolist()
+
+
+def summarize_grid(mos):
+    """
+    Resumen por ticker de la rejilla de MOS (ignora las celdas NaN)
+
+    Returns:
+        {'positive_share', 'min', 'median', 'max'}: arrays (n,)
+    """
+    flat = mos.reshape(len(mos), -1)
+    # Una fila sin celdas válidas (todas con r <= tg) da NaN, sin avisos
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return {
+            'positive_share': (flat > 0).sum(axis=1) / np.isfinite(flat).sum(axis=1),
+            'min': np.nanmin(flat, axis=1),
+            'median': np.nanmedian(flat, axis=1),
+            'max': np.nanmax(flat, axis=1)
+        }
@@ -0,0 +1,283 @@
+"""
+sharding.py - Reparto del screener en shards entre varias instancias
+Un coordinador divide el universo y publica el plan en el bucket, cada
+worker analiza un shard y sube su parcial, y el último shard en terminar
+(o /shard/merge) reconstruye el resultado habitual
+
+Estructura en el bucket:
+    shards/<run_id>/plan.json
+    shards/<run_id>/shard-0000.json ...
+    shards/<run_id>/merge.claim     (quién fusiona: creado con if_generation_match=0)
+
+Uso local (bucket en disco + varios procesos):
+    python sharding.py --shards 4 --bucket-dir /tmp/warren_bucket
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from local_bucket import PreconditionFailed
+from outcomes import AnalysisOutcome
+from valuation_engine import ScreenInputs
+
+SHARD_PREFIX = 'shards/'
+
+
+def split_shards(tickers, num_shards):
+    """
+    Reparte los tickers en `num_shards` listas de forma intercalada
+
+    El reparto intercalado (i, i+n, i+2n...) equilibra los shards aunque el
+    universo venga agrupado por fuente (S&P 500 primero, luego Nasdaq...).
+    """
+    num_shards = max(1, min(int(num_shards), len(tickers) or 1))
+    return [list(tickers[i::num_shards]) for i in range(num_shards)]
+
+
+def _serialize_outcome(outcome):
+    return dict(outcome.to_dict(), row=outcome.row)
+
+
+def merge_partials(partials):
+    """
+    Fusiona los parciales de los shards en el formato de analyze_universe
+
+    Returns:
+        {'survivors', 'outcomes', 'concurrency_profile', 'async_stats',
+         'fetch_mode', 'screen_inputs', 'shard_seconds'}
+        (screen_inputs es None si algún parcial no las trae)
+    """
+    outcomes = []
+    profiles = []
+    async_stats = []
+    fetch_modes = set()
+    screen_inputs = []
+    survivors = 0
+    for partial in partials:
+        survivors += partial['survivors']
+        outcomes.extend(AnalysisOutcome.from_dict(o) for o in partial['outcomes'])
+        profiles.append(partial.get('concurrency_profile'))
+        if partial.get('async_stats'):
+            async_stats.append(partial['async_stats'])
+        fetch_modes.add(partial.get('fetch_mode'))
+        if partial.get('screen_inputs'):
+            screen_inputs.append(ScreenInputs.from_dict(partial['screen_inputs']))
+
+    return {
+        'survivors': survivors,
+        'outcomes': outcomes,
+        'concurrency_profile': {'shards': profiles},
+        'async_stats': async_stats or None,
+        'fetch_mode': fetch_modes.pop() if len(fetch_modes) == 1 else sorted(m for m in fetch_modes if m),
+        'screen_inputs': ScreenInputs.concat(screen_inputs) if len(screen_inputs) == len(partials) else None,
+        'shard_seconds': [p.get('elapsed_seconds') for p in partials]
+    }
+
+
+class ShardStore:
+    """
+    Plan y parciales de los runs por shards en un bucket (GCS o LocalBucket)
+    """
+
+    def __init__(self, bucket, prefix=SHARD_PREFIX):
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _name(self, run_id, filename):
+        return f"{self.prefix}{run_id}/{filename}"
+
+    def _write(self, name, payload):
+        blob = self.bucket.blob(name)
+        blob.upload_from_string(json.dumps(payload, default=str), content_type='application/json')
+
+    def _read(self, name):
+        blob = self.bucket.blob(name)
+        if not blob.exists():
+            return None
+        return json.loads(blob.download_as_text())
+
+    @staticmethod
+    def partial_name(index):
+        return f"shard-{index:04d}.json"
+
+    def create_plan(self, shards, universe=None):
+        """Publica un plan nuevo y lo devuelve"""
+        now = time.time()
+        run_id = f"{datetime.fromtimestamp(now).strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        plan = {
+            'run_id': run_id,
+            'created_at': datetime.fromtimestamp(now).isoformat(),
+            'created_ts': now,
+            'universe': universe,
+            'shards': shards
+        }
+        self._write(self._name(run_id, 'plan.json'), plan)
+        return plan
+
+    def load_plan(self, run_id):
+        plan = self._read(self._name(run_id, 'plan.json'))
+        if plan is None:
+            raise KeyError(f"No existe el run {run_id}")
+        return plan
+
+    def write_partial(self, run_id, index, tickers, analysis, elapsed):
+        """Sube el resultado parcial de un shard"""
+        self._write(self._name(run_id, self.partial_name(index)), {
+            'run_id': run_id,
+            'shard': index,
+            'tickers': tickers,
+            'survivors': analysis['survivors'],
+            'outcomes': [_serialize_outcome(o) for o in analysis['outcomes']],
+            'concurrency_profile': analysis['concurrency_profile'],
+            'async_stats': analysis['async_stats'],
+            'fetch_mode': analysis['fetch_mode'],
+            'screen_inputs': analysis['screen_inputs'].to_dict(),
+            'elapsed_seconds': round(elapsed, 2),
+            'completed_at': datetime.now().isoformat()
+        })
+
+    def load_partials(self, run_id, plan=None):
+        plan = plan or self.load_plan(run_id)
+        partials = []
+        for index in range(len(plan['shards'])):
+            partial = self._read(self._name(run_id, self.partial_name(index)))
+            if partial is None:
+                raise KeyError(f"Falta el shard {index} del run {run_id}")
+            partials.append(partial)
+        return partials
+
+    def status(self, run_id, plan=None):
+        """Shards completados y pendientes de un run"""
+        plan = plan or self.load_plan(run_id)
+        done = [
+            index for index in range(len(plan['shards']))
+            if self.bucket.blob(self._name(run_id, self.partial_name(index))).exists()
+        ]
+        pending = [i for i in range(len(plan['shards'])) if i not in done]
+        return {
+            'run_id': run_id,
+            'shards': len(plan['shards']),
+            'completed': done,
+            'pending': pending,
+            'complete': not pending,
+            'merge_claimed': self.bucket.blob(self._name(run_id, 'merge.claim')).exists()
+        }
+
+    def claim_merge(self, run_id, owner):
+        """
+        Reserva la fusión automática del run (solo la primera llamada gana)
+
+        Returns:
+            True si este llamante debe fusionar
+        """
+        blob = self.bucket.blob(self._name(run_id, 'merge.claim'))
+        try:
+            blob.upload_from_string(json.dumps({'owner': owner, 'claimed_at': datetime.now().isoformat()}),
+                                    content_type='application/json', if_generation_match=0)
+            return True
+        except PreconditionFailed:
+            return False
+
+
+def dispatch_shards(worker_url, run_id, indices, timeout=540, fetch_mode=None):
+    """
+    Lanza cada shard como una petición HTTP independiente a `worker_url`
+    (con --concurrency 1 en los workers cada petición va a otra instancia)
+
+    Args:
+        timeout: Segundos por shard; debe quedar por debajo del --timeout
+                 del servicio de workers
+
+    Returns:
+        {índice: código HTTP o motivo del fallo}
+    """
+    import requests
+
+    def call(index):
+        params = {'run_id': run_id, 'shard': index}
+        if fetch_mode:
+            params['mode'] = fetch_mode
+        try:
+            r = requests.get(f"{worker_url.rstrip('/')}/shard/run", params=params, timeout=timeout)
+            return index, r.status_code
+        except Exception as e:
+            return index, f"{type(e).__name__}: {e}"
+
+    with ThreadPoolExecutor(max_workers=max(1, len(indices))) as executor:
+        return dict(executor.map(call, indices))
+
+
+def dispatch_in_background(worker_url, run_id, indices, timeout=540, fetch_mode=None, log=print):
+    """
+    dispatch_shards en un hilo de fondo: el coordinador responde en cuanto
+    publica el plan y no espera a los shards (la fusión la hace el último
+    shard en terminar)
+
+    Returns:
+        El hilo lanzado
+    """
+    def run():
+        codes = dispatch_shards(worker_url, run_id, indices, timeout=timeout, fetch_mode=fetch_mode)
+        failed = {i: c for i, c in codes.items() if c != 200}
+        if failed:
+            log(f"⚠️  Run {run_id}: shards con error {failed} (relanzar con /shard/run y fusionar con /shard/merge)")
+        else:
+            log(f"✓ Run {run_id}: {len(codes)} shards completados")
+
+    thread = threading.Thread(target=run, name=f"shards-{run_id}", daemon=True)
+    thread.start()
+    return thread
+
+
+def _run_local_shard(run_id, index, fetch_mode):
+    import main
+    # La CLI fusiona al final ella misma
+    return main.run_shard(run_id, index, fetch_mode=fetch_mode, auto_merge=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Screener por shards en local")
+    parser.add_argument('--shards', type=int, default=4)
+    parser.add_argument('--processes', type=int, default=None,
+                        help="Procesos en paralelo (por defecto uno por shard)")
+    parser.add_argument('--bucket-dir', default=os.environ.get('LOCAL_BUCKET_DIR', '/tmp/warren_bucket'))
+    parser.add_argument('--mode', default=None, help="threads | async | pipeline (FETCH_MODES de main.py)")
+    parser.add_argument('--tickers', default=None,
+                        help="Fichero con un ticker por línea (necesario para universos de más de "
+                             "~520 tickers: el universo por defecto es S&P 500 + Nasdaq 100)")
+    args = parser.parse_args(argv)
+
+    # Todos los procesos comparten el bucket en disco (antes de importar main)
+    os.environ['LOCAL_BUCKET_DIR'] = args.bucket_dir
+    import main as screener
+    if args.mode not in (None,) + screener.FETCH_MODES:
+        parser.error(f"--mode debe ser uno de {', '.join(screener.FETCH_MODES)}")
+
+    tickers = None
+    if args.tickers:
+        with open(args.tickers) as f:
+            tickers = [line.strip() for line in f if line.strip()]
+
+    plan = screener.plan_sharded_run(args.shards, tickers=tickers)
+    run_id = plan['run_id']
+    processes = args.processes or len(plan['shards'])
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(_run_local_shard, run_id, i, args.mode) for i in range(len(plan['shards']))]
+        for future in futures:
+            summary = future.result()
+            print(f"   -> shard {summary['shard']}: {summary['outcomes']} ({summary['elapsed_seconds']}s)")
+
+    result = screener.merge_sharded_run(run_id)
+    print(json.dumps({k: v for k, v in result.items() if k != 'results'}, indent=2, default=str))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
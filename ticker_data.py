@@ -0,0 +1,172 @@
+"""
+ticker_data.py - Carga perezosa de datos por ticker
+Los estados financieros y la metadata se piden solo cuando el análisis los
+necesita, en orden de dependencia, y se cuentan las llamadas por origen
+"""
+
+from market_data import STATEMENT_ATTRS
+from financial_fields import normalize_statement
+
+# Orígenes de un dato
+NETWORK = 'network'   # Proveedor (llamada síncrona)
+STORE = 'store'       # Almacén local de fundamentales
+ASYNC = 'async'       # Descargado previamente por el motor async
+
+
+class StatementDeferred(Exception):
+    """
+    El análisis necesita estados que no están disponibles localmente
+    (solo en modo diferido: el llamador los descarga en lote y reintenta)
+    """
+
+    def __init__(self, kinds):
+        super().__init__(f"Estados pendientes: {', '.join(kinds)}")
+        self.kinds = list(kinds)
+
+
+class LazyTickerData:
+    """
+    Acceso perezoso a los datos de un ticker
+
+    Args:
+        ticker: Símbolo
+        provider: Proveedor de datos de mercado
+        store: FundamentalsStore (o None)
+        prefetched: {kind: DataFrame} ya descargados por el motor async
+        defer_missing: Si True, no descarga nada: lanza StatementDeferred
+        on_save_error: Callback(ticker, kind, exc) si falla el guardado en el almacén
+    """
+
+    def __init__(self, ticker, provider, store=None, prefetched=None,
+                 defer_missing=False, on_save_error=None):
+        self.ticker = ticker
+        self.provider = provider
+        self.store = store
+        self.prefetched = prefetched or {}
+        self.defer_missing = defer_missing
+        self.on_save_error = on_save_error
+        self._frames = {}
+        self._fields = {}
+        self._info = None
+        self.calls = {}
+
+    def _count(self, source, name):
+        bucket = self.calls.setdefault(source, {})
+        bucket[name] = bucket.get(name, 0) + 1
+
+    def _local(self, kind):
+        """Busca un estado sin red: prefetched y luego almacén"""
+        if kind in self.prefetched:
+            self._count(ASYNC, kind)
+            return self.prefetched[kind]
+        if self.store is not None:
+            stored = self.store.load(self.ticker, kind)
+            if stored is not None:
+                self._count(STORE, kind)
+                return stored
+        return None
+
+    def require(self, *kinds):
+        """
+        Garantiza que los estados indicados están cargados
+        En modo diferido lanza StatementDeferred con todos los que falten
+        """
+        missing = []
+        for kind in kinds:
+            if kind in self._frames:
+                continue
+            df = self._local(kind)
+            if df is not None:
+                self._frames[kind] = self._sorted(df)
+            else:
+                missing.append(kind)
+
+        if missing and self.defer_missing:
+            raise StatementDeferred(missing)
+
+        for kind in missing:
+            df = self.provider.statement(self.ticker, kind)
+            self._count(NETWORK, kind)
+            if self.store is not None:
+                try:
+                    self.store.save(self.ticker, kind, df)
+                except Exception as e:
+                    if self.on_save_error:
+                        self.on_save_error(self.ticker, kind, e)
+            self._frames[kind] = self._sorted(df)
+
+    @staticmethod
+    def _sorted(df):
+        """Ordena las columnas (periodos) de la más reciente a la más antigua"""
+        if df is None or df.empty:
+            return df
+        return df[sorted(df.columns, reverse=True)]
+
+    def statement(self, kind):
+        """Devuelve un estado financiero cargándolo si hace falta"""
+        if kind not in STATEMENT_ATTRS:
+            raise ValueError(f"Tipo de estado no válido: {kind}")
+        self.require(kind)
+        return self._frames[kind]
+
+    def fields(self, kind):
+        """Campos canónicos del estado (normalizado una sola vez por ticker)"""
+        if kind not in self._fields:
+            self._fields[kind] = normalize_statement(self.statement(kind), kind)
+        return self._fields[kind]
+
+    @property
+    def income(self):
+        return self.statement('income')
+
+    @property
+    def balance(self):
+        return self.statement('balance')
+
+    @property
+    def cashflow(self):
+        return self.statement('cashflow')
+
+    def quote(self):
+        self._count(NETWORK, 'quote')
+        return self.provider.quote(self.ticker)
+
+    def info(self):
+        """Información general (la llamada más pesada de Yahoo): solo bajo demanda"""
+        if self._info is None:
+            self._count(NETWORK, 'info')
+            self._info = self.provider.info(self.ticker)
+        return self._info
+
+    @property
+    def network_calls(self):
+        return sum(self.calls.get(NETWORK, {}).values())
+
+
+def merge_calls(*call_maps):
+    """Suma varios contadores de llamadas {origen: {nombre: n}}"""
+    merged = {}
+    for calls in call_maps:
+        for source, counts in (calls or {}).items():
+            bucket = merged.setdefault(source, {})
+            for name, n in counts.items():
+                bucket[name] = bucket.get(name, 0) + n
+    return merged
+
+
+def summarize_calls(call_maps):
+    """
+    Agrega los contadores de llamadas de muchos tickers
+
+    Returns:
+        {'network': {...}, 'store': {...}, 'async': {...},
+         'tickers': n, 'network_per_ticker': x}
+    """
+    totals = {NETWORK: {}, STORE: {}, ASYNC: {}}
+    totals.update(merge_calls(*call_maps))
+
+    n = len(call_maps)
+    network_total = sum(totals[NETWORK].values())
+    totals['tickers'] = n
+    totals['network_per_ticker'] = round(network_total / n, 2) if n else 0
+    return totals
@@ -0,0 +1,139 @@
+"""
+ticker_metadata.py - Índice local de metadata por ticker
+Sector, acciones en circulación y divisa casi nunca cambian: se guardan
+como efecto secundario del análisis y se leen sin llamadas de red
+"""
+
+import os
+import json
+import threading
+from datetime import datetime, timedelta
+
+METADATA_PATH = os.environ.get("METADATA_PATH", "/tmp/warren_metadata/ticker_metadata.json")
+METADATA_TTL_DAYS = int(os.environ.get("METADATA_TTL_DAYS", 90))
+
+FIELDS = ('sector', 'shares', 'currency')
+
+
+class TickerMetadataIndex:
+    """
+    Índice {ticker: {sector, shares, currency, updated_at, field_updated_at}}
+    persistido en JSON
+
+    Cada campo caduca por su cuenta (field_updated_at[campo]): las acciones
+    y la divisa se reescriben en cada run desde la cotización, y eso no debe
+    mantener vigente un sector que solo se escribe al consultar info.
+    Las entradas anteriores sin field_updated_at usan updated_at.
+    """
+
+    def __init__(self, path, ttl_days=METADATA_TTL_DAYS):
+        """
+        Args:
+            path: Fichero JSON del índice
+            ttl_days: Días tras los que una entrada se considera caducada
+        """
+        self.path = path
+        self.ttl = timedelta(days=ttl_days)
+        self._lock = threading.Lock()
+        self._entries = None
+        self._dirty = False
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path) as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _is_fresh(self, entry, field, now):
+        updated_at = (entry.get('field_updated_at') or {}).get(field) or entry.get('updated_at')
+        try:
+            return now - datetime.fromisoformat(updated_at) <= self.ttl
+        except (TypeError, ValueError):
+            return False
+
+    def get(self, ticker):
+        """Campos vigentes del ticker ({campo: valor}) o None si no hay ninguno"""
+        with self._lock:
+            entry = self._load().get(ticker)
+        if not entry:
+            return None
+        now = datetime.now()
+        fresh = {f: entry[f] for f in FIELDS if f in entry and self._is_fresh(entry, f, now)}
+        return fresh or None
+
+    def get_sector(self, ticker):
+        entry = self.get(ticker)
+        sector = entry.get('sector') if entry else None
+        return sector if sector and sector != 'N/A' else None
+
+    def get_shares(self, ticker):
+        entry = self.get(ticker)
+        return entry.get('shares') if entry else None
+
+    def update(self, ticker, **fields):
+        """Actualiza campos del ticker (se ignoran los valores vacíos); solo renueva la fecha de esos campos"""
+        values = {k: v for k, v in fields.items() if k in FIELDS and v not in (None, '', 'N/A')}
+        if not values:
+            return
+        now = datetime.now().isoformat()
+        with self._lock:
+            entries = self._load()
+            entry = dict(entries.get(ticker) or {})
+            field_updated_at = dict(entry.get('field_updated_at') or {})
+            if entry.get('updated_at'):
+                # Entrada anterior: sus campos conservan la fecha común
+                for field in FIELDS:
+                    if field in entry:
+                        field_updated_at.setdefault(field, entry['updated_at'])
+            entry.update(values)
+            field_updated_at.update({field: now for field in values})
+            entry['field_updated_at'] = field_updated_at
+            entry['updated_at'] = now
+            entries[ticker] = entry
+            self._dirty = True
+
+    def fill_sectors(self, df, column='Sector'):
+        """Completa en un DataFrame los sectores vacíos o 'N/A' desde el índice"""
+        if df is None or df.empty or 'Ticker' not in df.columns:
+            return df
+        if column not in df.columns:
+            df[column] = 'N/A'
+        missing = df[column].isna() | (df[column] == 'N/A')
+        if missing.any():
+            df.loc[missing, column] = [
+                self.get_sector(t) or 'N/A' for t in df.loc[missing, 'Ticker']
+            ]
+        return df
+
+    def flush(self):
+        """Escribe el índice a disco si hubo cambios"""
+        with self._lock:
+            if not self._dirty:
+                return False
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+            return True
+
+    def __len__(self):
+        with self._lock:
+            return len(self._load())
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_metadata_index():
+    """Índice compartido por el proceso (screener, refiner y post-processor)"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = TickerMetadataIndex(METADATA_PATH)
+        return _index
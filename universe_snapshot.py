@@ -0,0 +1,273 @@
+"""
+universe_snapshot.py - Snapshots versionados del universo de tickers
+El universo se guarda con orden estable y un hash de su contenido; las
+fuentes se refrescan con peticiones condicionales (ETag / Last-Modified)
+"""
+
+import os
+import json
+import hashlib
+from datetime import datetime, timedelta
+
+from local_bucket import PreconditionFailed
+
+UNIVERSE_DIR = os.environ.get("UNIVERSE_DIR", "/tmp/warren_universe")
+UNIVERSE_REFRESH_HOURS = float(os.environ.get("UNIVERSE_REFRESH_HOURS", 12))
+# Por encima de la unión S&P 500 + Nasdaq 100 (~520): el límite es una salvaguarda, no un recorte
+UNIVERSE_MAX_TICKERS = int(os.environ.get("UNIVERSE_MAX_TICKERS", 600))
+
+# Estados de una fuente en un refresco
+MODIFIED = 'modified'            # 200: contenido nuevo
+NOT_MODIFIED = 'not_modified'    # 304: se reutilizan los símbolos del snapshot anterior
+REUSED = 'reused'                # Falló la descarga: se reutilizan los símbolos anteriores
+FAILED = 'failed'                # Falló y no había símbolos anteriores
+BACKUP = 'backup'                # Lista de respaldo manual
+
+
+def normalize_symbols(symbols):
+    """Formato Yahoo ('BRK.B' -> 'BRK-B'), sin vacíos y sin duplicados"""
+    cleaned = (str(s).strip().upper().replace('.', '-') for s in symbols)
+    return sorted({s for s in cleaned if s})
+
+
+def build_ticker_list(source_symbols, limit=UNIVERSE_MAX_TICKERS):
+    """
+    Unión ordenada alfabéticamente de todas las fuentes, recortada a `limit`
+
+    Se deduplica y ordena la unión antes de recortar: con el recorte por
+    fuente el S&P 500 (~503 símbolos) llenaba el límite y ningún símbolo
+    solo del Nasdaq 100 llegaba al universo. El resultado depende solo del
+    contenido (no del orden de las fuentes ni del CSV).
+    """
+    return normalize_symbols(s for symbols in source_symbols for s in symbols)[:limit]
+
+
+def snapshot_hash(tickers):
+    """Hash del contenido del universo (sha256 de la lista ordenada)"""
+    return hashlib.sha256('\n'.join(tickers).encode('utf-8')).hexdigest()[:16]
+
+
+def _header(headers, name):
+    """Cabecera HTTP sin distinguir mayúsculas"""
+    name = name.lower()
+    for key, value in (headers or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def conditional_headers(validators, headers=None):
+    """Añade If-None-Match / If-Modified-Since a partir de los validadores guardados"""
+    result = dict(headers or {})
+    if validators.get('etag'):
+        result['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        result['If-Modified-Since'] = validators['last_modified']
+    return result
+
+
+def fetch_source(provider, urls, parser, previous=None, log=print):
+    """
+    Descarga una fuente del universo con petición condicional
+
+    Args:
+        provider: Proveedor de datos (usa provider.http_get)
+        urls: [(url, headers)] alternativas por orden de preferencia
+        parser: Función texto -> lista de símbolos
+        previous: Entrada de la fuente en el snapshot anterior (o None)
+
+    Returns:
+        Entrada {'status', 'url', 'etag', 'last_modified', 'symbols'}
+    """
+    previous = previous or {}
+    for url, headers in urls:
+        # Los validadores solo valen para la misma URL
+        validators = previous if previous.get('url') == url and previous.get('symbols') else {}
+        try:
+            r = provider.http_get(url, headers=conditional_headers(validators, headers), timeout=30)
+            if r.status_code == 304 and validators:
+                return dict(previous, status=NOT_MODIFIED)
+            if r.status_code != 200:
+                raise ValueError(f"HTTP {r.status_code}")
+            symbols = normalize_symbols(parser(r.text))
+            if not symbols:
+                raise ValueError("respuesta sin símbolos")
+            return {
+                'status': MODIFIED,
+                'url': url,
+                'etag': _header(r.headers, 'ETag'),
+                'last_modified': _header(r.headers, 'Last-Modified'),
+                'symbols': symbols
+            }
+        except Exception as e:
+            log(f"   ⚠️ Fallo {url}: {e}")
+
+    if previous.get('symbols'):
+        return dict(previous, status=REUSED)
+    return {'status': FAILED, 'url': None, 'etag': None, 'last_modified': None, 'symbols': []}
+
+
+class UniverseSnapshotStore:
+    """
+    Persistencia de snapshots del universo
+
+    Estructura local:
+        <base_dir>/current.json             snapshot vigente
+        <base_dir>/universe-v0001.json      histórico inmutable por versión
+    Si se pasa un bucket de GCS se replica con el prefijo `prefix`. Con
+    varias instancias el bucket manda: la versión siguiente se calcula sobre
+    su current.json y cada universe-vNNNN.json se crea con
+    if_generation_match=0, así un número nunca se publica con dos listas.
+    """
+
+    def __init__(self, base_dir, bucket=None, prefix='universe/',
+                 refresh_hours=UNIVERSE_REFRESH_HOURS):
+        self.base_dir = base_dir
+        self.bucket = bucket
+        self.prefix = prefix
+        self.refresh_interval = timedelta(hours=refresh_hours)
+
+    @staticmethod
+    def version_name(version):
+        return f"universe-v{version:04d}.json"
+
+    def _read_local(self, name):
+        try:
+            with open(os.path.join(self.base_dir, name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_local(self, name, snapshot):
+        os.makedirs(self.base_dir, exist_ok=True)
+        path = os.path.join(self.base_dir, name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f, indent=1)
+        os.replace(tmp_path, path)
+
+    def _read_bucket(self, name):
+        return self._read_bucket_generation(name)[0]
+
+    def _read_bucket_generation(self, name):
+        """(snapshot, generación) del bucket: (None, 0) si no existe, (None, None) si falla la lectura"""
+        if self.bucket is None:
+            return None, None
+        try:
+            blob = self.bucket.get_blob(self.prefix + name)
+            if blob is None:
+                return None, 0
+            return json.loads(blob.download_as_text()), blob.generation
+        except Exception:
+            return None, None
+
+    def _write_bucket(self, name, snapshot, if_generation_match=None):
+        if self.bucket is None:
+            return
+        blob = self.bucket.blob(self.prefix + name)
+        blob.upload_from_string(json.dumps(snapshot), content_type='application/json',
+                                if_generation_match=if_generation_match)
+
+    def _publish_version(self, snapshot):
+        """
+        Crea universe-vNNNN.json en el bucket sin pisar otro: si el número ya
+        existe con el mismo contenido se adopta esa versión, y si el contenido
+        es otro se prueba el número siguiente
+        """
+        while True:
+            name = self.version_name(snapshot['version'])
+            try:
+                self._write_bucket(name, snapshot, if_generation_match=0)
+                return snapshot
+            except PreconditionFailed:
+                existing = self._read_bucket(name)
+                if existing and existing.get('hash') == snapshot['hash']:
+                    snapshot['created_at'] = existing.get('created_at', snapshot['created_at'])
+                    return snapshot
+                snapshot['version'] += 1
+
+    def _publish_current(self, snapshot, generation):
+        """
+        Sube current.json condicionado a la generación leída; si otra
+        instancia lo cambió entre medias no se retrocede a una versión menor
+        """
+        while True:
+            try:
+                self._write_bucket('current.json', snapshot, if_generation_match=generation)
+                return
+            except PreconditionFailed:
+                published, generation = self._read_bucket_generation('current.json')
+                if published and published.get('version', 0) > snapshot['version']:
+                    return
+
+    def current(self):
+        """Snapshot vigente (local y, si no existe, el del bucket)"""
+        snapshot = self._read_local('current.json')
+        if snapshot is None:
+            snapshot = self._read_bucket('current.json')
+            if snapshot is not None:
+                self._write_local('current.json', snapshot)
+        return snapshot
+
+    def load_version(self, version):
+        """Snapshot de una versión concreta (para reproducir un run)"""
+        name = self.version_name(version)
+        return self._read_local(name) or self._read_bucket(name)
+
+    def is_fresh(self, snapshot, now=None):
+        """True si el snapshot se comprobó hace menos de refresh_hours"""
+        try:
+            checked_at = datetime.fromisoformat(snapshot['checked_at'])
+        except (KeyError, TypeError, ValueError):
+            return False
+        return (now or datetime.now()) - checked_at < self.refresh_interval
+
+    def commit(self, tickers, sources, previous=None):
+        """
+        Registra el resultado de un refresco
+
+        Si el contenido no cambió se conserva la versión (solo se actualizan
+        validadores y checked_at); si cambió se crea una versión nueva. El
+        número parte del current.json del bucket si otra instancia publicó
+        una versión posterior a la que esta conoce.
+
+        Returns:
+            (snapshot, changed)
+        """
+        now = datetime.now().isoformat()
+        digest = snapshot_hash(tickers)
+        published, generation = self._read_bucket_generation('current.json')
+        if published and published.get('version', 0) > (previous or {}).get('version', 0):
+            previous = published
+        changed = previous is None or previous.get('hash') != digest
+
+        snapshot = {
+            'version': (previous or {}).get('version', 0) + (1 if changed else 0),
+            'hash': digest,
+            'count': len(tickers),
+            'created_at': now if changed else previous.get('created_at', now),
+            'checked_at': now,
+            'tickers': tickers,
+            'sources': sources
+        }
+
+        if changed:
+            if self.bucket is not None:
+                snapshot = self._publish_version(snapshot)
+            self._write_local(self.version_name(snapshot['version']), snapshot)
+        self._write_local('current.json', snapshot)
+        if self.bucket is not None:
+            self._publish_current(snapshot, generation)
+        return snapshot, changed
+
+
+def snapshot_summary(snapshot):
+    """Resumen del snapshot para el resultado del análisis"""
+    return {
+        'version': snapshot.get('version'),
+        'hash': snapshot.get('hash'),
+        'count': snapshot.get('count'),
+        'created_at': snapshot.get('created_at'),
+        'checked_at': snapshot.get('checked_at'),
+        'sources': {name: s.get('status') for name, s in (snapshot.get('sources') or {}).items()}
+    }
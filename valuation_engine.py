@@ -0,0 +1,365 @@
+"""
+valuation_engine.py - Motor vectorizado de calidad y valoración
+Calcula ROIC, Piotroski, crecimiento estimado, valor intrínseco (DCF 2 etapas)
+y MOS de todo el universo de una vez sobre arrays NumPy alineados
+(ticker × campo × periodo), separado de la descarga de datos
+"""
+
+import numpy as np
+
+from dcf import intrinsic_value, margin_of_safety
+from outcomes import AnalysisOutcome, OK, FILTERED, NO_DATA
+
+# Campos que usa el motor (nombres canónicos de financial_fields)
+QUALITY_FIELDS = ('net_income', 'ebit', 'equity', 'total_debt', 'cash')
+CASHFLOW_FIELDS = ('operating_cash_flow', 'capex')
+FIELDS = QUALITY_FIELDS + CASHFLOW_FIELDS
+FIELD_INDEX = {field: i for i, field in enumerate(FIELDS)}
+
+# Periodos usados: el último ejercicio y el anterior
+PERIODS = 2
+
+# Estado intermedio: supera ROIC y la cota de Piotroski, falta el cashflow
+PENDING = 'pending'
+
+TAX_FACTOR = 0.79          # EBIT * (1 - 21%)
+GROWTH_ROIC_FACTOR = 0.5   # Crecimiento estimado = ROIC * 0.5
+MAX_GROWTH = 0.14
+MIN_GROWTH = 0.03
+FALLBACK_PIOTROSKI = 5     # Beneficio de la duda si solo hay un ejercicio
+HIGH_PIOTROSKI = 7         # Por encima se muestra aunque el MOS sea bajo
+
+
+# Arrays por ticker de FundamentalsBatch (concat / subset)
+ARRAY_ATTRS = ('values', 'counts', 'price', 'shares', 'cashflow_loaded')
+
+
+class FundamentalsBatch:
+    """
+    Datos de entrada del motor para n tickers
+
+    Attributes:
+        values: float64 (n, campos, PERIODS), NaN donde no hay dato
+        counts: int (n, campos) periodos disponibles de cada campo
+                (0 = el estado no tiene la fila, como una Series vacía)
+        price / shares: float64 (n,)
+        cashflow_loaded: bool (n,) el cashflow se descargó (solo se pide
+                         para los que superan screen_quality)
+    """
+
+    def __init__(self, tickers):
+        self.tickers = list(tickers)
+        self.index = {ticker: i for i, ticker in enumerate(self.tickers)}
+        n = len(self.tickers)
+        self.values = np.full((n, len(FIELDS), PERIODS), np.nan)
+        self.counts = np.zeros((n, len(FIELDS)), dtype=np.int64)
+        self.price = np.full(n, np.nan)
+        self.shares = np.full(n, np.nan)
+        self.cashflow_loaded = np.zeros(n, dtype=bool)
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def set_quote(self, ticker, quote):
+        i = self.index[ticker]
+        self.price[i] = quote['last_price']
+        self.shares[i] = quote['shares']
+
+    def set_fields(self, ticker, fields):
+        """
+        Carga los campos de un ticker
+
+        Args:
+            fields: {campo canónico: Series por periodo (más reciente primero)}
+                    p.ej. financial_fields.CanonicalFields
+        """
+        i = self.index[ticker]
+        for field, series in fields.items():
+            f = FIELD_INDEX.get(field)
+            if f is None:
+                continue
+            to_numpy = getattr(series, 'to_numpy', None)
+            row = to_numpy(dtype=float) if to_numpy else np.asarray(series, dtype=float)
+            self.counts[i, f] = len(row)
+            k = min(len(row), PERIODS)
+            self.values[i, f, :k] = row[:k]
+
+    def field(self, name, period=0):
+        return self.values[:, FIELD_INDEX[name], period]
+
+    def has(self, name, periods=1):
+        return self.counts[:, FIELD_INDEX[name]] >= periods
+
+    def to_dict(self):
+        """Serializable a JSON (NaN -> None)"""
+        def clean(array):
+            return np.where(np.isfinite(array), array, None).tolist()
+        return {
+            'tickers': self.tickers,
+            'fields': list(FIELDS),
+            'values': clean(self.values),
+            'counts': self.counts.tolist(),
+            'price': clean(self.price),
+            'shares': clean(self.shares),
+            'cashflow_loaded': self.cashflow_loaded.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Reconstruye un lote serializado (los campos se casan por nombre)"""
+        batch = cls(data['tickers'])
+        if not batch.tickers:
+            return batch
+        values = np.array(data['values'], dtype=float)
+        counts = np.array(data['counts'], dtype=np.int64)
+        for k, field in enumerate(data['fields']):
+            f = FIELD_INDEX.get(field)
+            if f is not None:
+                batch.values[:, f, :] = values[:, k, :PERIODS]
+                batch.counts[:, f] = counts[:, k]
+        batch.price[:] = np.array(data['price'], dtype=float)
+        batch.shares[:] = np.array(data['shares'], dtype=float)
+        batch.cashflow_loaded[:] = data['cashflow_loaded']
+        return batch
+
+    @classmethod
+    def concat(cls, batches):
+        """Une varios lotes (p.ej. los de cada shard) en uno"""
+        batch = cls([ticker for b in batches for ticker in b.tickers])
+        if batches:
+            for name in ARRAY_ATTRS:
+                setattr(batch, name, np.concatenate([getattr(b, name) for b in batches]))
+        return batch
+
+    def subset(self, tickers):
+        """Lote con solo `tickers`, en ese orden (p.ej. los reutilizables de un run incremental)"""
+        rows = np.array([self.index[ticker] for ticker in tickers], dtype=np.int64)
+        batch = FundamentalsBatch(tickers)
+        for name in ARRAY_ATTRS:
+            setattr(batch, name, getattr(self, name)[rows])
+        return batch
+
+
+class ScreenInputs:
+    """
+    Entradas del motor de un run antes de aplicar los umbrales: permiten
+    re-evaluar ROIC, Piotroski, DCF y MOS con otros parámetros sin red
+
+    Attributes:
+        batch: FundamentalsBatch de los tickers con income + balance
+        sectors: {ticker: sector} de las filas que ya se resolvieron
+        cashflow_failures: {ticker: AnalysisOutcome} de la etapa de cashflow
+        periods: {ticker: 'YYYY-MM-DD'} último periodo fiscal de los estados usados
+    """
+
+    def __init__(self, batch, sectors=None, cashflow_failures=None, periods=None):
+        self.batch = batch
+        self.sectors = dict(sectors or {})
+        self.cashflow_failures = dict(cashflow_failures or {})
+        self.periods = dict(periods or {})
+
+    def to_dict(self):
+        return {
+            'batch': self.batch.to_dict(),
+            'sectors': self.sectors,
+            'cashflow_failures': {t: o.to_dict() for t, o in self.cashflow_failures.items()},
+            'periods': self.periods
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            FundamentalsBatch.from_dict(data['batch']),
+            data.get('sectors'),
+            {t: AnalysisOutcome.from_dict(o) for t, o in (data.get('cashflow_failures') or {}).items()},
+            data.get('periods')
+        )
+
+    @classmethod
+    def concat(cls, parts):
+        merged = cls(FundamentalsBatch.concat([p.batch for p in parts]))
+        for part in parts:
+            merged.sectors.update(part.sectors)
+            merged.cashflow_failures.update(part.cashflow_failures)
+            merged.periods.update(part.periods)
+        return merged
+
+    def subset(self, tickers):
+        """Entradas de solo `tickers` (deben estar en el lote)"""
+        keep = set(tickers)
+        return ScreenInputs(
+            self.batch.subset(tickers),
+            {t: s for t, s in self.sectors.items() if t in keep},
+            {t: o for t, o in self.cashflow_failures.items() if t in keep},
+            {t: p for t, p in self.periods.items() if t in keep}
+        )
+
+
+def _debt_not_increasing(batch, curr_debt):
+    """Punto de Piotroski por deuda: existe el año anterior y la deuda no sube"""
+    return batch.has('total_debt', 2) & (curr_debt <= batch.field('total_debt', 1))
+
+
+def screen_quality(batch, min_roic, min_piotroski):
+    """
+    Etapa 1 (income + balance): ROIC y cota superior de Piotroski
+
+    La cota suma los puntos de income/balance más los 2 de cashflow como
+    máximo: si ni así llega a min_piotroski no hace falta el cashflow.
+
+    Returns:
+        Dict de arrays: status (PENDING / FILTERED / NO_DATA), reason, roic,
+        curr_debt, curr_cash
+    """
+    n = len(batch)
+    status = np.full(n, PENDING, dtype=object)
+    reason = np.full(n, None, dtype=object)
+
+    ni0 = batch.field('net_income', 0)
+    ni1 = batch.field('net_income', 1)
+    curr_ebit = np.where(batch.has('ebit'), batch.field('ebit'), ni0)
+    curr_eq = batch.field('equity')
+    curr_debt = np.where(batch.has('total_debt'), batch.field('total_debt'), 0.0)
+    curr_cash = np.where(batch.has('cash'), batch.field('cash'), 0.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        invested_cap = curr_eq + curr_debt - curr_cash
+        roic = np.where(invested_cap > 0, (curr_ebit * TAX_FACTOR) / invested_cap, 0.0)
+
+    missing = ~(batch.has('net_income') & batch.has('equity'))
+    low_roic = ~missing & (roic < min_roic)
+
+    partial = (
+        (ni0 > 0).astype(int)
+        + (ni0 > ni1)
+        + _debt_not_increasing(batch, curr_debt)
+    )
+    low_piotroski = ~missing & ~low_roic & batch.has('net_income', 2) & (partial + 2 < min_piotroski)
+
+    status[missing] = NO_DATA
+    reason[missing] = 'faltan Net Income / Equity'
+    status[low_roic] = FILTERED
+    reason[low_roic] = 'roic'
+    status[low_piotroski] = FILTERED
+    reason[low_piotroski] = 'piotroski'
+
+    return {
+        'status': status,
+        'reason': reason,
+        'roic': roic,
+        'curr_debt': curr_debt,
+        'curr_cash': curr_cash
+    }
+
+
+def value_batch(batch, quality, min_piotroski, discount_rate, mos_view):
+    """
+    Etapa 2 (cashflow): Piotroski completo, FCF, DCF, MOS y filtro de salida
+    Solo se evalúan los tickers que quedaron PENDING en screen_quality.
+
+    Returns:
+        Dict de arrays: status (OK / FILTERED / NO_DATA), reason, roic,
+        piotroski, growth, intrinsic, mos, fcf, curr_cash, curr_debt
+    """
+    status = quality['status'].copy()
+    reason = quality['reason'].copy()
+    pending = status == PENDING
+    roic = quality['roic']
+    curr_debt = quality['curr_debt']
+    curr_cash = quality['curr_cash']
+
+    ni0 = batch.field('net_income', 0)
+    ni1 = batch.field('net_income', 1)
+    ocf0 = batch.field('operating_cash_flow', 0)
+
+    no_ocf = pending & ~batch.has('operating_cash_flow')
+    status[no_ocf] = NO_DATA
+    reason[no_ocf] = 'falta Operating Cash Flow'
+    pending &= ~no_ocf
+
+    # Piotroski rápido
+    points = (
+        (ni0 > 0).astype(int)
+        + (ocf0 > 0)
+        + (ni0 > ni1)
+        + (ocf0 > ni0)
+        + _debt_not_increasing(batch, curr_debt)
+    )
+    piotroski = np.where(batch.has('net_income', 2), points, FALLBACK_PIOTROSKI)
+
+    low_piotroski = pending & (piotroski < min_piotroski)
+    status[low_piotroski] = FILTERED
+    reason[low_piotroski] = 'piotroski'
+    pending &= ~low_piotroski
+
+    # Valoración (DCF 2 etapas)
+    cpx_val = np.where(batch.has('capex'), np.abs(batch.field('capex')), 0.0)
+    fcf = ocf0 - cpx_val
+
+    # Sin FCF positivo no hay DCF
+    no_fcf = pending & (fcf <= 0)
+    status[no_fcf] = FILTERED
+    reason[no_fcf] = 'fcf'
+    pending &= ~no_fcf
+
+    growth = np.maximum(np.minimum(roic * GROWTH_ROIC_FACTOR, MAX_GROWTH), MIN_GROWTH)
+    valid_fcf = fcf > 0
+    intrinsic = np.where(valid_fcf, intrinsic_value(fcf, growth, discount_rate, curr_cash, curr_debt,
+                                                    batch.shares), 0.0)
+    mos = margin_of_safety(intrinsic, batch.price)
+
+    # Filtro de salida
+    low_mos = pending & (mos < mos_view) & (piotroski < HIGH_PIOTROSKI)
+    status[low_mos] = FILTERED
+    reason[low_mos] = 'mos'
+    pending &= ~low_mos
+
+    # FCF no numérico (NaN): no hay crecimiento ni valoración que mostrar
+    nan_fcf = pending & ~valid_fcf
+    status[nan_fcf] = NO_DATA
+    reason[nan_fcf] = 'FCF no numérico'
+    pending &= ~nan_fcf
+
+    status[pending] = OK
+
+    return {
+        'status': status,
+        'reason': reason,
+        'roic': roic,
+        'piotroski': piotroski,
+        'growth': growth,
+        'intrinsic': intrinsic,
+        'mos': mos,
+        'fcf': fcf,
+        'curr_cash': curr_cash,
+        'curr_debt': curr_debt
+    }
+
+
+def records(batch, valuation, sectors=None):
+    """
+    Filas de resultado (mismo formato que el screener) de los tickers OK
+
+    Returns:
+        {ticker: fila} sin 'Sector' si no se pasa `sectors`
+    """
+    rows = {}
+    for i in np.flatnonzero(valuation['status'] == OK):
+        ticker = batch.tickers[i]
+        row = {
+            'Ticker': ticker,
+            'Price': round(float(batch.price[i]), 2),
+            'Sector': (sectors or {}).get(ticker, 'N/A'),
+            'ROIC': float(valuation['roic'][i]),
+            'Piotroski': int(valuation['piotroski'][i]),
+            'Growth_Est': float(valuation['growth'][i]),
+            'Intrinsic': float(valuation['intrinsic'][i]),
+            'MOS': float(valuation['mos'][i]),
+            # Entradas del DCF: permiten revalorar la fila sin volver a descargar
+            'FCF': float(valuation['fcf'][i]),
+            'Cash': float(valuation['curr_cash'][i]),
+            'Debt': float(valuation['curr_debt'][i]),
+            'Shares': float(batch.shares[i])
+        }
+        rows[ticker] = row
+    return rows
@@ -14,6 +14,26 @@ REQUIRED_FILES=(
     "portfolio_refiner.py"
     "post_processor.py"
     "portfolio_tracker.py"
+    "fundamentals_store.py"
+    "market_data.py"
+    "concurrency.py"
+    "async_fetch.py"
+    "pipeline.py"
+    "outcomes.py"
+    "ticker_data.py"
+    "ticker_metadata.py"
+    "universe_snapshot.py"
+    "local_bucket.py"
+    "result_cache.py"
+    "cache_codec.py"
+    "refresh.py"
+    "lease.py"
+    "sharding.py"
+    "financial_fields.py"
+    "valuation_engine.py"
+    "dcf.py"
+    "sensitivity.py"
+    "monte_carlo.py"
     "requirements.txt"
     "Dockerfile"
     "deploy.sh"
@@ -40,6 +60,26 @@ if [ "$ALL_OK" = true ]; then
     echo "  📄 portfolio_refiner.py - Portfolio Manager Review"
     echo "  📄 post_processor.py - Post-procesamiento"
     echo "  📄 portfolio_tracker.py - Portfolio Performance Tracker"
+    echo "  📄 fundamentals_store.py - Almacén local de fundamentales"
+    echo "  📄 market_data.py - Proveedores de datos de mercado (Yahoo / grabación / replay)"
+    echo "  📄 concurrency.py - Controlador AIMD de concurrencia del screener"
+    echo "  📄 async_fetch.py - Motor asyncio (aiohttp) de descarga de estados financieros"
+    echo "  📄 pipeline.py - Ejecutor en tubería: hilos de I/O -> cola acotada -> etapa de CPU"
+    echo "  📄 outcomes.py - Outcomes tipados, clasificación de fallos y reintentos"
+    echo "  📄 ticker_data.py - Carga perezosa de estados financieros por ticker"
+    echo "  📄 ticker_metadata.py - Índice local de metadata (sector, acciones, divisa)"
+    echo "  📄 universe_snapshot.py - Snapshots versionados del universo"
+    echo "  📄 local_bucket.py - Bucket en disco (sustituto local de GCS)"
+    echo "  📄 result_cache.py - Caché de lectura por capas (memoria / disco / bucket)"
+    echo "  📄 cache_codec.py - Codificación versionada y comprimida de los objetos de caché"
+    echo "  📄 refresh.py - Single-flight: un único análisis completo en curso por proceso"
+    echo "  📄 lease.py - Lease distribuido en el bucket (un único análisis entre instancias)"
+    echo "  📄 sharding.py - Modo por shards (coordinador / workers)"
+    echo "  📄 financial_fields.py - Esquema canónico de campos financieros"
+    echo "  📄 valuation_engine.py - Motor vectorizado de ROIC, Piotroski, DCF y MOS"
+    echo "  📄 dcf.py - Núcleo DCF de 2 etapas en forma cerrada"
+    echo "  📄 sensitivity.py - Rejilla de sensibilidad del DCF"
+    echo "  📄 monte_carlo.py - Valoración DCF por Monte Carlo"
     echo "  📄 requirements.txt - Dependencias"
     echo "  📄 Dockerfile - Configuración de contenedor"
     echo ""
@@ -3,6 +3,25 @@
 Script de verificación: Compara la lógica del screener original vs la implementación
 """
 
+import sys
+
+import numpy as np
+
+from dcf import two_stage_ev, intrinsic_value, margin_of_safety
+from universe_snapshot import build_ticker_list, UNIVERSE_MAX_TICKERS
+
+
+def loop_two_stage_ev(fcf, growth, discount_rate, terminal_growth=0.03, years=5):
+    """DCF de 2 etapas con el bucle por año del script original (referencia)"""
+    future_cash = 0
+    for i in range(1, years + 1):
+        val = fcf * ((1 + growth) ** i)
+        future_cash += val / ((1 + discount_rate) ** i)
+    terminal_fcf = fcf * ((1 + growth) ** years)
+    term_val = (terminal_fcf * (1 + terminal_growth)) / (discount_rate - terminal_growth)
+    return future_cash + term_val / ((1 + discount_rate) ** years)
+
+
 print("=" * 80)
 print("VERIFICACIÓN DE LÓGICA - Warren Screener v8")
 print("=" * 80)
@@ -78,13 +97,14 @@ print(f"   FCF Year 5 = ${terminal_fcf:,.2f}")
 print(f"   Terminal Value = ${term_val:,.2f}")
 print(f"   Terminal PV = ${term_val_pv:,.2f}")
 
-ev = future_cash + term_val_pv
-print(f"\n✅ Enterprise Value = Stage 1 + Stage 2")
+ev = two_stage_ev(fcf, growth_proxy, discount_rate)
+print(f"\n✅ Enterprise Value = Stage 1 + Stage 2 (núcleo dcf.py, forma cerrada)")
 print(f"   EV = ${future_cash:,.2f} + ${term_val_pv:,.2f} = ${ev:,.2f}")
+print(f"   {'✅' if np.isclose(ev, future_cash + term_val_pv, rtol=1e-12) else '❌'} Coincide con el bucle por año")
 
 equity_val = ev + test_cash - test_debt
 shares = 100
-intrinsic = equity_val / shares
+intrinsic = intrinsic_value(fcf, growth_proxy, discount_rate, test_cash, test_debt, shares)
 
 print(f"\n✅ Intrinsic Value per Share:")
 print(f"   Equity Value = ${ev:,.2f} + ${test_cash} - ${test_debt} = ${equity_val:,.2f}")
@@ -92,7 +112,7 @@ print(f"   Intrinsic = ${equity_val:,.2f} / {shares} = ${intrinsic:.2f}")
 
 # MOS
 price = 50
-mos = (intrinsic - price) / intrinsic
+mos = margin_of_safety(intrinsic, price)
 
 print(f"\n✅ Margen de Seguridad (MOS):")
 print(f"   Price = ${price}")
@@ -122,7 +142,8 @@ print(f"   Resultado: {'PASA' if pasa else 'NO PASA'}")
 print("\n4. VERIFICACIÓN DE CAMPOS DE SALIDA:")
 print("-" * 80)
 
-campos_esperados = ['Ticker', 'Price', 'Sector', 'ROIC', 'Piotroski', 'Growth_Est', 'Intrinsic', 'MOS']
+campos_esperados = ['Ticker', 'Price', 'Sector', 'ROIC', 'Piotroski', 'Growth_Est', 'Intrinsic', 'MOS',
+                    'FCF', 'Cash', 'Debt', 'Shares']
 print("Campos del diccionario de retorno:")
 for campo in campos_esperados:
     print(f"   ✅ {campo}")
@@ -133,6 +154,80 @@ print("✅ Resultados ordenados por: MOS (descendente)")
 print("   - Mayor MOS primero (mejores oportunidades)")
 print("   - Valores NaN al final")
 
+print("\n6. PROPIEDADES DEL NÚCLEO DCF (forma cerrada vs bucle):")
+print("-" * 80)
+
+rng = np.random.default_rng(42)
+n_cases = 5000
+fcfs = rng.lognormal(20, 2, n_cases)
+growths = rng.uniform(-0.10, 0.30, n_cases)
+rates = rng.uniform(0.04, 0.20, n_cases)
+terminals = rng.uniform(0.0, 0.035, n_cases)
+years_cases = rng.integers(1, 16, n_cases)
+
+loop_values = np.array([
+    loop_two_stage_ev(f, g, r, tg, int(n))
+    for f, g, r, tg, n in zip(fcfs, growths, rates, terminals, years_cases)
+])
+closed_values = np.array([
+    two_stage_ev(f, g, r, tg, int(n))
+    for f, g, r, tg, n in zip(fcfs, growths, rates, terminals, years_cases)
+])
+max_rel = float(np.max(np.abs(closed_values - loop_values) / np.abs(loop_values)))
+ok_random = max_rel < 1e-12
+print(f"{'✅' if ok_random else '❌'} {n_cases} casos aleatorios (g, r, tg, años): máx. diferencia relativa {max_rel:.1e}")
+
+# g = r (q = 1) y g muy cerca de r: la serie geométrica no se degrada
+edge = [(1000, 0.09, 0.09), (1000, 0.09 + 1e-12, 0.09), (1000, 0.09 - 1e-9, 0.09), (1000, 0.0, 0.09)]
+ok_edge = all(np.isclose(two_stage_ev(f, g, r), loop_two_stage_ev(f, g, r), rtol=1e-12) for f, g, r in edge)
+print(f"{'✅' if ok_edge else '❌'} Crecimiento igual o casi igual a la tasa (q ≈ 1)")
+
+# Arrays (broadcasting) == escalares, elemento a elemento
+head = slice(0, 500)
+array_values = two_stage_ev(fcfs[head], growths[head], 0.09)
+scalar_values = np.array([two_stage_ev(f, g, 0.09) for f, g in zip(fcfs[head], growths[head])])
+ok_broadcast = np.array_equal(array_values, scalar_values)
+grid = two_stage_ev(1000, growths[:4, None, None], rates[None, :3, None], terminals[None, None, :2])
+ok_broadcast &= grid.shape == (4, 3, 2)
+print(f"{'✅' if ok_broadcast else '❌'} Arrays y escalares dan el mismo valor; rejilla {grid.shape} por broadcasting")
+
+# EV crece con el FCF y el crecimiento, y cae con la tasa
+ok_monotonic = (two_stage_ev(1000, 0.05, 0.09) < two_stage_ev(1000, 0.06, 0.09) < two_stage_ev(1000, 0.06, 0.08)
+                and np.isclose(two_stage_ev(2000, 0.05, 0.09), 2 * two_stage_ev(1000, 0.05, 0.09), rtol=1e-15))
+print(f"{'✅' if ok_monotonic else '❌'} Lineal en el FCF, creciente en g, decreciente en r")
+
+ok_terminal = np.isnan(two_stage_ev(1000, 0.05, 0.03)) and np.isnan(two_stage_ev(1000, 0.05, 0.02))
+print(f"{'✅' if ok_terminal else '❌'} Tasa <= crecimiento terminal: NaN (Gordon no definido)")
+
+dcf_checks = {
+    'casos aleatorios': ok_random,
+    'q ≈ 1': ok_edge,
+    'broadcasting': ok_broadcast,
+    'monotonía': ok_monotonic,
+    'Gordon no definido': ok_terminal
+}
+failed = [name for name, ok in dcf_checks.items() if not ok]
+if failed:
+    print(f"\n❌ Fallan las propiedades del núcleo DCF: {', '.join(failed)}")
+    sys.exit(1)
+
+print("\n7. UNIVERSO (unión de fuentes y límite):")
+print("-" * 80)
+
+# S&P 500 con ~503 símbolos (incluidos los del final del alfabeto) + Nasdaq 100 con solapamiento
+sp500 = [f"S{i:03d}" for i in range(501)] + ['ZBRA', 'ZTS']
+nasdaq100 = ['AAPL', 'ASML', 'AZN', 'S000', 'S001']
+universe = build_ticker_list([sp500, nasdaq100])
+ok_nasdaq = {'ASML', 'AZN', 'ZBRA', 'ZTS'} <= set(universe)
+print(f"{'✅' if ok_nasdaq else '❌'} Símbolos solo del Nasdaq 100 y final del S&P sobreviven al límite "
+      f"({len(universe)} de {len(set(sp500) | set(nasdaq100))}, límite {UNIVERSE_MAX_TICKERS})")
+ok_union = (universe == sorted(set(universe)) and universe == build_ticker_list([nasdaq100, sp500])
+            and build_ticker_list([sp500, nasdaq100], limit=3) == ['AAPL', 'ASML', 'AZN'])
+print(f"{'✅' if ok_union else '❌'} Unión deduplicada y ordenada antes de recortar (no depende del orden de las fuentes)")
+if not (ok_nasdaq and ok_union):
+    print("\n❌ Falla la construcción del universo")
+    sys.exit(1)
+
 print("\n" + "=" * 80)
 print("VERIFICACIÓN COMPLETA")
 print("=" * 80)